@@ -0,0 +1,48 @@
+import time
+from datetime import date
+from typing import Dict, Hashable, Tuple
+from loguru import logger
+from app.config import settings
+
+
+class AvailabilityCache:
+    """
+    Short-TTL cache of the month availability (free slots per day), kept separately for every restaurant.
+    Keys are (scope, year, month), where scope is ("table", id) or ("capacity", n).
+    """
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._data: Dict[int, Dict[Tuple[Hashable, int, int], Tuple[float, Dict[date, int]]]] = {}
+
+    def get(self, restaurant_id: int, scope: Hashable, year: int, month: int) -> Dict[date, int] | None:
+        restaurant_data = self._data.get(restaurant_id, {})
+        entry = restaurant_data.get((scope, year, month))
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            restaurant_data.pop((scope, year, month), None)
+            return None
+        return value
+
+    def set(self, restaurant_id: int, scope: Hashable, year: int, month: int, value: Dict[date, int]) -> None:
+        self._data.setdefault(restaurant_id, {})[(scope, year, month)] = (time.monotonic() + self._ttl, value)
+
+    def invalidate(self, booking_date: date | None = None, restaurant_id: int | None = None) -> None:
+        """
+        Drops the cached months of the given date, or every month if the date is unknown,
+        of the given restaurant, or of every restaurant.
+        """
+        restaurants = [self._data.get(restaurant_id, {})] if restaurant_id is not None else self._data.values()
+        for restaurant_data in restaurants:
+            if booking_date is None:
+                restaurant_data.clear()
+            else:
+                for key in [k for k in restaurant_data if k[1:] == (booking_date.year, booking_date.month)]:
+                    restaurant_data.pop(key, None)
+        logger.debug(f"Availability cache invalidated for {booking_date or 'all dates'} "
+                     f"of {restaurant_id or 'all'} restaurants")
+
+
+availability_cache = AvailabilityCache(ttl=settings.AVAILABILITY_CACHE_TTL)
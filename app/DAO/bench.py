@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import timeit
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+from loguru import logger
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.bot.replay import percentiles
+from app.DAO.database import engine
+from app.DAO.dao import BookingDAO, SlotInfo, TableDAO, TableInfo
+from app.DAO.serializers import _convert, to_json_bytes
+from app.DAO.singleflight import SingleFlight
+
+# Benchmarks of the availability queries over a synthetic history. They run against the database of the
+# settings (migrated with `alembic upgrade head`) in one transaction that is rolled back at the end,
+# the synthetic restaurant never becomes visible to the bot. The serializers and single-flight commands
+# run in memory and need no database.
+BENCH_USERS = 1000
+BENCH_USER_ID = 9_000_000_000  # far above the Telegram ids in use
+
+
+@asynccontextmanager
+async def synthetic_history(tables: int, slots: int, history_days: int, future_days: int,
+                            future_fill: float) -> AsyncIterator[tuple[AsyncSession, int]]:
+    """
+    A restaurant with `tables` tables, `slots` one-hour slots from 10:00 and bookings on every table
+    and slot: `history_days` of finished and canceled ones, and `future_fill` of the next `future_days` days booked.
+    Yields a session of the transaction and the restaurant id.
+    """
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        session = AsyncSession(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            restaurant_id = await session.scalar(text(
+                "INSERT INTO restaurants (id, name) SELECT coalesce(max(id), 0) + 1, 'bench' FROM restaurants "
+                "RETURNING id"))
+            await session.execute(text(
+                "INSERT INTO users (id, first_name) SELECT :first + n, 'bench' FROM generate_series(0, :count - 1) n"
+            ), {"first": BENCH_USER_ID, "count": BENCH_USERS})
+            await session.execute(text(
+                "INSERT INTO tables (restaurant_id, capacity, description) "
+                "SELECT :rid, 2 + n % 5 * 2, 'bench ' || n FROM generate_series(1, :count) n"
+            ), {"rid": restaurant_id, "count": tables})
+            await session.execute(text(
+                "INSERT INTO time_slots (restaurant_id, start_time, end_time) "
+                "SELECT :rid, time '10:00' + n * interval '1 hour', time '11:00' + n * interval '1 hour' "
+                "FROM generate_series(0, :count - 1) n"
+            ), {"rid": restaurant_id, "count": min(slots, 14)})
+            today = date.today()
+            await session.execute(text(
+                "INSERT INTO bookings (restaurant_id, user_id, table_id, time_slot_id, date, start_time, end_time, "
+                "status) "
+                "SELECT :rid, :first + (random() * (:users - 1))::int, t.id, s.id, d::date, s.start_time, s.end_time, "
+                "CASE WHEN d < :today THEN (CASE WHEN random() < 0.1 THEN 'canceled' ELSE 'completed' END) "
+                "ELSE 'booked' END "
+                "FROM tables t JOIN time_slots s ON s.restaurant_id = t.restaurant_id "
+                "CROSS JOIN generate_series(:start, :end, interval '1 day') d "
+                "WHERE t.restaurant_id = :rid AND (d < :today OR random() < :fill)"
+            ), {"rid": restaurant_id, "first": BENCH_USER_ID, "users": BENCH_USERS, "today": today,
+                "start": today - timedelta(days=history_days), "end": today + timedelta(days=future_days),
+                "fill": future_fill})
+            count = await session.scalar(text("SELECT count(*) FROM bookings WHERE restaurant_id = :rid"),
+                                         {"rid": restaurant_id})
+            await session.execute(text("ANALYZE bookings"))
+            logger.info(f"Synthetic restaurant {restaurant_id}: {tables} tables, {min(slots, 14)} slots, "
+                        f"{count} bookings")
+            yield session, restaurant_id
+        finally:
+            await session.close()
+            await transaction.rollback()
+
+
+async def measure(name: str, repeat: int, call: Callable[[], Awaitable]) -> None:
+    latencies: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+    logger.info(f"{name:>24}: " + ", ".join(f"{key} {value:.1f} ms" for key, value in percentiles(latencies).items()))
+
+
+async def bench_nearest(args: argparse.Namespace) -> None:
+    """
+    find_nearest_available (one query) against what the guest did before it: walking the days and the
+    suitable tables and asking for the free slots of each, until the first free slot shows up.
+    """
+    history = synthetic_history(args.tables, args.slots, args.history_days, args.days, args.fill)
+    async with history as (session, rid):
+        dao = BookingDAO(session)
+        tables = [table for table in await TableDAO(session).find_all() if table.restaurant_id == rid]
+        suitable = sorted((table for table in tables if table.capacity >= args.capacity), key=lambda t: t.capacity)
+
+        async def walk() -> tuple[TableInfo, SlotInfo, date] | None:
+            today = datetime.now().date()
+            for offset in range(args.days):
+                day = today + timedelta(days=offset)
+                for table in suitable:
+                    slots = await dao.get_available_time_slots(table.id, day)
+                    if slots:
+                        return table, slots[0], day
+            return None
+
+        found = await dao.find_nearest_available(args.capacity, args.days, rid, 1)
+        walked = await walk()
+        logger.info(f"nearest: {found[0][2] if found else None}, walk: {walked[2] if walked else None}")
+        await measure("find_nearest_available", args.repeat,
+                      lambda: dao.find_nearest_available(args.capacity, args.days, rid))
+        await measure("per table and day walk", args.repeat, walk)
+
+
+async def bench_slot_times(args: argparse.Namespace) -> None:
+    """
+    The TIME columns and the `during` period against the "HH:MM" strings they replaced: the free slots of
+    a table for a day and the completion sweep, each as the old code ran it on a copy of the data with
+    string times, and as the DAO runs it now.
+    """
+    history = synthetic_history(args.tables, args.slots, args.history_days, args.days, args.fill)
+    async with history as (session, rid):
+        await session.execute(text(
+            "CREATE TEMP TABLE old_time_slots ON COMMIT DROP AS "
+            "SELECT id, to_char(start_time, 'HH24:MI') AS start_time, to_char(end_time, 'HH24:MI') AS end_time "
+            "FROM time_slots WHERE restaurant_id = :rid"), {"rid": rid})
+        await session.execute(text(
+            "CREATE TEMP TABLE old_bookings ON COMMIT DROP AS "
+            "SELECT id, table_id, time_slot_id, date, status FROM bookings WHERE restaurant_id = :rid"), {"rid": rid})
+        await session.execute(text("CREATE INDEX ON old_bookings (table_id, date, time_slot_id)"))
+        await session.execute(text("ANALYZE old_time_slots"))
+        await session.execute(text("ANALYZE old_bookings"))
+        dao = BookingDAO(session)
+        table_id = await session.scalar(text("SELECT min(id) FROM tables WHERE restaurant_id = :rid"), {"rid": rid})
+        day = date.today() + timedelta(days=1)
+
+        async def old_free_slots():
+            # the baseline get_available_time_slots: the booked slot ids, then the slots not among them
+            booked = await session.execute(text(
+                "SELECT time_slot_id, status FROM old_bookings WHERE table_id = :table_id AND date = :day"),
+                {"table_id": table_id, "day": day})
+            booked_ids = [row.time_slot_id for row in booked if row.status == "booked"] or [0]
+            result = await session.execute(text("SELECT * FROM old_time_slots WHERE id <> ALL(:ids)"),
+                                           {"ids": booked_ids})
+            return result.all()
+
+        async def old_sweep():
+            # the baseline complete_past_bookings lookup, comparing the start time strings
+            now = datetime.now()
+            result = await session.execute(text(
+                "SELECT b.id FROM old_bookings b WHERE b.date > :today AND b.status = 'booked' "
+                "UNION ALL SELECT b.id FROM old_bookings b JOIN old_time_slots s ON s.id = b.time_slot_id "
+                "WHERE b.date = :today AND s.start_time > :now AND b.status = 'booked'"),
+                {"today": now.date(), "now": now.strftime("%H:%M")})
+            return len(result.all())
+
+        async def sweep():
+            return await session.scalar(text(
+                "SELECT count(*) FROM bookings WHERE restaurant_id = :rid AND status = 'booked' "
+                "AND date <= :today AND upper(during) <= :now"),
+                {"rid": rid, "today": date.today(), "now": datetime.now()})
+
+        logger.info(f"bookings to complete: {await old_sweep()} by the string comparison, {await sweep()} by "
+                    f"the period (the old lookup picked the future bookings)")
+        await measure("free slots, strings", args.repeat, old_free_slots)
+        await measure("free slots, periods", args.repeat, lambda: dao.get_available_time_slots(table_id, day))
+        await measure("sweep, strings", args.repeat, old_sweep)
+        await measure("sweep, periods", args.repeat, sweep)
+
+
+def inspecting_to_dict(obj, exclude_none: bool = False) -> Dict[str, Any]:
+    """Base.to_dict as it was before the compiled serializers."""
+    result = {}
+    for column in inspect(obj.__class__).columns:
+        value = _convert(getattr(obj, column.key))
+        if not exclude_none or value is not None:
+            result[column.key] = value
+    return result
+
+
+async def bench_serializers(args: argparse.Namespace) -> None:
+    """
+    Serializes `args.objects` time slots and tables, as a getter does on every render,
+    with the inspecting to_dict and with the compiled serializer. Needs no database.
+    """
+    from app.DAO.models import Table, TimeSlot
+
+    now = datetime.now()
+    items = [TimeSlot(id=index, restaurant_id=1, start_time=dtime(10 + index % 12), end_time=dtime(11 + index % 12),
+                      is_active=True, created_at=now, updated_at=now) for index in range(args.objects)]
+    items += [Table(id=index, restaurant_id=1, capacity=2 + index % 8, description=f"Table {index}",
+                    is_active=True, created_at=now, updated_at=now) for index in range(args.objects)]
+    for name, to_dict in (("inspect", inspecting_to_dict), ("compiled", lambda obj: obj.to_dict())):
+        seconds = min(timeit.repeat(lambda: [to_dict(item) for item in items], number=1, repeat=args.repeat))
+        logger.info(f"{name:>8}: {seconds * 1e6 / len(items):.2f} us per object")
+    rows = items[:args.objects]
+    seconds = min(timeit.repeat(lambda: [to_json_bytes(row) for row in rows], number=1, repeat=args.repeat))
+    logger.info(f"{'json':>8}: {seconds * 1e6 / len(rows):.2f} us per time slot, to_json_bytes")
+
+
+async def bench_single_flight(args: argparse.Namespace) -> None:
+    """
+    Hundreds of identical concurrent reads against a query taking `args.latency` seconds on a pool
+    of `args.pool_size` connections, with and without coalescing. The database is simulated,
+    only the query count and the time matter here.
+    """
+
+    class Session:
+        bind = None
+
+    for enabled in (False, True):
+        flights = SingleFlight(enabled)
+        pool = asyncio.Semaphore(args.pool_size)
+        queries = 0
+
+        class DAO:
+            _session = Session()
+
+            @flights.coalesce
+            async def get_available_time_slots(self, table_id, booking_date):
+                nonlocal queries
+                queries += 1
+                async with pool:
+                    await asyncio.sleep(args.latency)
+                return [table_id, booking_date]
+
+        started = time.perf_counter()
+        await asyncio.gather(*(DAO().get_available_time_slots(1, "2026-10-18") for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        stats = flights.stats()
+        logger.info(f"single-flight {'on' if enabled else 'off'}: {args.requests} requests, {queries} queries, "
+                    f"{elapsed:.3f}s, coalescing ratio {stats['coalescing_ratio']:.3f}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        await args.run(args)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Availability query benchmarks over a synthetic history")
+    parser.add_argument("--tables", type=int, default=40)
+    parser.add_argument("--slots", type=int, default=12, help="one-hour slots from 10:00, 14 at most")
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--fill", type=float, default=0.97, help="booked share of the future slots")
+    parser.add_argument("--repeat", type=int, default=50)
+    commands = parser.add_subparsers(dest="command", required=True)
+    nearest = commands.add_parser("nearest", help="the nearest free slot search")
+    nearest.add_argument("--capacity", type=int, default=6)
+    nearest.add_argument("--days", type=int, default=14)
+    nearest.set_defaults(run=bench_nearest)
+    slot_times = commands.add_parser("slot-times", help="TIME columns and periods against string times")
+    slot_times.add_argument("--days", type=int, default=30, help="days of future bookings")
+    slot_times.set_defaults(run=bench_slot_times)
+    serializers = commands.add_parser("serializers", help="compiled serializers against the inspecting to_dict")
+    serializers.add_argument("--objects", type=int, default=1000, help="time slots and as many tables")
+    serializers.set_defaults(run=bench_serializers)
+    single_flight = commands.add_parser("single-flight", help="identical concurrent reads with and without coalescing")
+    single_flight.add_argument("--requests", type=int, default=500)
+    single_flight.add_argument("--latency", type=float, default=0.02, help="seconds per query")
+    single_flight.add_argument("--pool-size", type=int, default=15)  # SQLAlchemy's default pool_size + max_overflow
+    single_flight.set_defaults(run=bench_single_flight)
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments))
@@ -0,0 +1,81 @@
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Set, Tuple
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.DAO.models import Table
+
+
+class TableCatalog:
+    """
+    In-memory catalog of the tables of every restaurant sorted by capacity.
+    Used for best-fit lookups without querying the tables on every assignment.
+    Restaurants are loaded and invalidated independently.
+    Every process has its own catalog while the catalog sync runs in the owner process and the admins edit
+    the tables in any of them: a catalog older than `ttl` seconds is read again, a changed one gets a new version.
+    """
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._entries: Dict[int, List[Tuple[int, int]]] = {}  # restaurant_id -> [(capacity, table_id)], sorted
+        self._loaded_at: Dict[int, float] = {}
+        self._fingerprints: Dict[int, int] = {}
+        # bumped on every catalog change, a part of the render cache keys
+        self._versions: Dict[int, int] = {}
+        self._epoch = 0
+
+    def loaded(self, restaurant_id: int) -> bool:
+        return restaurant_id in self._entries
+
+    def version(self, restaurant_id: int) -> Tuple[int, int]:
+        return self._epoch, self._versions.get(restaurant_id, 0)
+
+    def load(self, restaurant_id: int, tables: Iterable[Tuple[int, int, str | None]]) -> None:
+        """Loads the (capacity, table_id, description) rows of the active tables of the restaurant."""
+        tables = sorted(tables, key=lambda table: table[:2])
+        # the description is rendered in the dialog, its change makes a new version as well
+        fingerprint = hash(tuple(tables))
+        previous = self._fingerprints.get(restaurant_id)
+        if previous is not None and previous != fingerprint:
+            self._versions[restaurant_id] = self._versions.get(restaurant_id, 0) + 1
+            logger.info(f"Table catalog of restaurant {restaurant_id} changed")
+        self._entries[restaurant_id] = [(capacity, table_id) for capacity, table_id, _ in tables]
+        self._fingerprints[restaurant_id] = fingerprint
+        self._loaded_at[restaurant_id] = time.monotonic()
+        logger.info(f"Table catalog of restaurant {restaurant_id} loaded: {len(self._entries[restaurant_id])} tables")
+
+    def invalidate(self, restaurant_id: int | None = None) -> None:
+        """Drops the catalog of the restaurant, or of every restaurant."""
+        if restaurant_id is None:
+            self._entries.clear()
+            self._loaded_at.clear()
+            self._fingerprints.clear()
+            self._epoch += 1
+        else:
+            self._entries.pop(restaurant_id, None)
+            self._loaded_at.pop(restaurant_id, None)
+            self._fingerprints.pop(restaurant_id, None)
+            self._versions[restaurant_id] = self._versions.get(restaurant_id, 0) + 1
+
+    async def ensure_loaded(self, session: AsyncSession, restaurant_id: int) -> None:
+        """Loads the catalog of the restaurant if it isn't loaded or is older than the TTL."""
+        loaded_at = self._loaded_at.get(restaurant_id)
+        if loaded_at is not None and time.monotonic() - loaded_at < self._ttl:
+            return
+        result = await session.execute(select(Table.capacity, Table.id, Table.description)
+                                       .where(Table.restaurant_id == restaurant_id, Table.is_active))
+        self.load(restaurant_id, result.tuples().all())
+
+    def best_fit(self, restaurant_id: int, capacity: int, occupied: Set[int]) -> int | None:
+        """Returns the id of the smallest table with at least `capacity` seats that is not occupied."""
+        entries = self._entries.get(restaurant_id, [])
+        start = bisect_left(entries, (capacity, -1))
+        for _, table_id in entries[start:]:
+            if table_id not in occupied:
+                return table_id
+        return None
+
+
+table_catalog = TableCatalog(ttl=settings.CATALOG_TTL)
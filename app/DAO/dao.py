@@ -1,11 +1,81 @@
-from datetime import date, datetime, tzinfo
-from typing import Dict
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import AsyncIterator, Dict, List, NamedTuple
 from loguru import logger
-from sqlalchemy import select, update, delete, func
-from sqlalchemy.exc import SQLAlchemyError
+from pydantic import BaseModel
+from sqlalchemy import (select, update, delete, insert, func, exists, cast, literal, or_, true, tuple_, case, text,
+                        extract, union_all, Date, Row)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import joinedload
+from app.config import settings
 from app.DAO.base import BaseDAO
-from app.DAO.models import User, Table, Booking, TimeSlot
+from app.DAO.availability import availability_cache
+from app.DAO.catalog import table_catalog
+from app.DAO.database_middleware import after_commit
+from app.DAO.holds import slot_holds
+from app.DAO.serializers import serializer_for
+from app.DAO.singleflight import SingleFlight
+from app.DAO.models import User, Table, Booking, TimeSlot, BookingArchive, BookingStats, WaitlistEntry
+
+
+def slot_period(booking_date):
+    """
+    Period covered by the time slot on the given date (a date or a date SQL expression),
+    computed the same way as Booking.during
+    """
+    day = cast(literal(booking_date), Date) if isinstance(booking_date, date) else booking_date
+    end_shift = case((TimeSlot.end_time <= TimeSlot.start_time, timedelta(days=1)), else_=timedelta(0))
+    return func.tsrange(day + TimeSlot.start_time, day + TimeSlot.end_time + end_shift)
+
+
+def invalidate_availability(session, booking_date: date, restaurant_id: int) -> None:
+    """
+    Drops the cached availability of the month once the transaction is committed: dropped before,
+    a concurrent read could cache the state without the change again for the whole TTL.
+    """
+    async def invalidate():
+        availability_cache.invalidate(booking_date, restaurant_id)
+
+    after_commit(session, invalidate)
+
+
+# identical concurrent reads of the opted-in methods share one query
+single_flight = SingleFlight(settings.SINGLE_FLIGHT)
+
+
+class TableInfo(NamedTuple):
+    """
+    Immutable copy of a table. The coalesced reads return these instead of ORM instances:
+    their result is shared by several sessions.
+    """
+    id: int
+    restaurant_id: int
+    capacity: int
+    description: str | None
+    is_active: bool
+
+    @classmethod
+    def of(cls, table: Table) -> "TableInfo":
+        return cls(table.id, table.restaurant_id, table.capacity, table.description, table.is_active)
+
+    def to_dict(self) -> dict:
+        return serializer_for(Table, self._fields)(self)
+
+
+class SlotInfo(NamedTuple):
+    """Immutable copy of a time slot, see TableInfo."""
+    id: int
+    restaurant_id: int
+    start_time: time
+    end_time: time
+    is_active: bool
+
+    @classmethod
+    def of(cls, slot: TimeSlot) -> "SlotInfo":
+        return cls(slot.id, slot.restaurant_id, slot.start_time, slot.end_time, slot.is_active)
+
+    def to_dict(self) -> dict:
+        return serializer_for(TimeSlot, self._fields)(self)
 
 
 class UserDAO(BaseDAO[User]):
@@ -18,58 +88,321 @@ class TimeSlotUserDAO(BaseDAO[TimeSlot]):
 class TableDAO(BaseDAO[Table]):
     model = Table
 
+    @single_flight.coalesce
+    async def find_all(self, filters: BaseModel | None = None) -> List[TableInfo]:
+        return [TableInfo.of(table) for table in await super().find_all(filters)]
+
 
 class BookingDAO(BaseDAO[Booking]):
     model = Booking
-    async def check_available_bookings(self, table_id: int, booking_date: date, time_slot_id: int):
+
+    async def add(self, values: BaseModel):
+        booking = await super().add(values)
+        invalidate_availability(self._session, booking.date, booking.restaurant_id)
+        return booking
+
+    def _overlapping_booking(self, table_id, booking_date):
+        """EXISTS over the active bookings of the table overlapping the time slot (uses the GiST index)"""
+        return exists().where(
+            self.model.table_id == table_id,
+            self.model.status == "booked",
+            self.model.during.op("&&")(slot_period(booking_date))
+        )
+
+    async def check_available_bookings(self, table_id: int, booking_date: date, time_slot_id: int,
+                                       user_id: int | None = None):
         '''Check for available reservations at the specified date and time slot'''
         try:
-            stmt = select(self.model).filter_by(table_id=table_id, date=booking_date, time_slot_id=time_slot_id)
+            if user_id is not None and time_slot_id in await slot_holds.held_slots(table_id, booking_date, user_id):
+                return False
+            stmt = select(TimeSlot.id).where(TimeSlot.id == time_slot_id,
+                                             TimeSlot.is_active,
+                                             ~self._overlapping_booking(table_id, booking_date))
             result = await self._session.execute(stmt)
-            if not result.scalars().all():
-                return True
-            for booking in result.scalars().all():
-                if booking.status == "booked":
-                    return False
-                continue
-            return True
+            return result.scalar_one_or_none() is not None
         except SQLAlchemyError as e:
             logger.error(f"Error checking reservation availability: {e}")
 
 
-    async def get_available_time_slots(self, table_id: int, booking_date: date):
+    async def get_available_time_slots(self, table_id: int, booking_date: date,
+                                       user_id: int | None = None) -> List[SlotInfo] | None:
         """
-        Acquiring all free time slots for the table on the specified date
+        Acquiring all free time slots for the table on the specified date.
+        Slots held by other guests (see holds.py) are not free either
         """
         try:
-            booking_stmt = select(self.model).filter_by(table_id=table_id, date=booking_date)
-            booking_result = await self._session.execute(booking_stmt)
-            #create a set of occupied tables
-            booked_slots = {booking.time_slot_id for booking in booking_result.scalars().all() if booking.status == "booked"}
-            #acquiring all free slots, excluding occupied ones
-            free_slots_stmt = select(TimeSlot).filter(~TimeSlot.id.in_(booked_slots))
-            free_slots_result = await self._session.execute(free_slots_stmt)
-            return free_slots_result.scalars().all()
+            slots = await self._unbooked_time_slots(table_id, booking_date)
+            held = await slot_holds.held_slots(table_id, booking_date, user_id)
+            return [slot for slot in slots if slot.id not in held]
         except SQLAlchemyError as e:
             logger.error(f"Error acquiring available time slots for the date {e}")
 
-    async def get_bookings_with_details(self, user_id: int):
+    @single_flight.coalesce
+    async def _unbooked_time_slots(self, table_id: int, booking_date: date) -> List[SlotInfo]:
+        """The slots of the table without a booking, the same for every guest (the holds are applied after)"""
+        table_restaurant = select(Table.restaurant_id).where(Table.id == table_id).scalar_subquery()
+        stmt = (select(TimeSlot)
+                .where(TimeSlot.restaurant_id == table_restaurant,
+                       TimeSlot.is_active,
+                       ~self._overlapping_booking(table_id, booking_date))
+                .order_by(TimeSlot.start_time))
+        result = await self._session.execute(stmt)
+        return [SlotInfo.of(slot) for slot in result.scalars().all()]
+
+    @single_flight.coalesce
+    async def get_available_time_slots_for_capacity(self, capacity: int, booking_date: date,
+                                                    restaurant_id: int) -> List[SlotInfo] | None:
+        """
+        Acquiring the time slots of the restaurant on the specified date in which at least one table
+        with the given capacity or bigger is free
+        """
+        try:
+            free_table = exists().where(Table.restaurant_id == restaurant_id,
+                                        Table.is_active,
+                                        Table.capacity >= capacity,
+                                        ~self._overlapping_booking(Table.id, booking_date))
+            stmt = (select(TimeSlot)
+                    .where(TimeSlot.restaurant_id == restaurant_id, TimeSlot.is_active, free_table)
+                    .order_by(TimeSlot.start_time))
+            result = await self._session.execute(stmt)
+            return [SlotInfo.of(slot) for slot in result.scalars().all()]
+        except SQLAlchemyError as e:
+            logger.error(f"Error acquiring available time slots for capacity {capacity}: {e}")
+
+    async def _occupied_table_ids(self, booking_date: date, time_slot_id: int):
+        stmt = select(self.model.table_id).join(TimeSlot, TimeSlot.id == time_slot_id).where(
+            self.model.status == "booked",
+            self.model.during.op("&&")(slot_period(booking_date))
+        )
+        result = await self._session.execute(stmt)
+        return set(result.scalars().all())
+
+    async def find_best_table(self, capacity: int, booking_date: date, time_slot_id: int,
+                              user_id: int | None = None):
+        """
+        Picking the smallest free table with at least `capacity` seats for the date and time slot,
+        among the tables of the slot's restaurant. Tables held by other guests are skipped
+        :return: Table object or None if every suitable table is occupied
+        """
+        try:
+            slot = await self._session.get(TimeSlot, time_slot_id)
+            await table_catalog.ensure_loaded(self._session, slot.restaurant_id)
+            occupied = await self._occupied_table_ids(booking_date, time_slot_id)
+            occupied |= await slot_holds.held_tables(booking_date, time_slot_id, user_id)
+            table_id = table_catalog.best_fit(slot.restaurant_id, capacity, occupied)
+            return await self._session.get(Table, table_id) if table_id is not None else None
+        except SQLAlchemyError as e:
+            logger.error(f"Error picking the best table for {capacity} guests: {e}")
+            raise
+
+    async def assign_best_table(self, user_id: int, capacity: int, booking_date: date, time_slot_id: int):
+        """
+        Booking the smallest free table with at least `capacity` seats.
+        Assignments for the same date and time slot are serialized with a transaction-level
+        advisory lock, so concurrent guests never get the same table.
+        :return: the new Booking object or None if every suitable table is occupied
+        """
+        try:
+            await self._session.execute(
+                select(func.pg_advisory_xact_lock(booking_date.toordinal(), time_slot_id))
+            )
+            table = await self.find_best_table(capacity, booking_date, time_slot_id, user_id)
+            if table is None:
+                logger.info(f"No free table for {capacity} guests on {booking_date}, slot {time_slot_id}")
+                return None
+            slot = await self._session.get(TimeSlot, time_slot_id)
+            booking = self.model(restaurant_id=table.restaurant_id, user_id=user_id, table_id=table.id,
+                                 time_slot_id=time_slot_id, date=booking_date, start_time=slot.start_time,
+                                 end_time=slot.end_time, status="booked")
+            self._session.add(booking)
+            await self._session.flush()
+            invalidate_availability(self._session, booking_date, table.restaurant_id)
+            logger.info(f"Table №{table.id} assigned to user {user_id} on {booking_date}, slot {time_slot_id}")
+            return booking
+        except SQLAlchemyError as e:
+            logger.error(f"Error assigning a table for {capacity} guests: {e}")
+            await self._session.rollback()
+            raise
+
+    @single_flight.coalesce
+    async def find_nearest_available(self, capacity: int, days: int, restaurant_id: int, limit: int = 10):
+        """
+        Searching the first free slots of the restaurant for the given number of guests over the next days
+        :params capacity: number of guests
+        :params days: how many days ahead (today included) to look at
+        :params limit: maximum number of results
+        :return: A list of (TableInfo, SlotInfo, date) rows ranked by date, time and table fit
+        """
+        try:
+            now = datetime.now()
+            offsets = func.generate_series(0, days - 1).table_valued("value").render_derived(name="offsets")
+            day = cast(literal(now.date(), Date) + offsets.c.value, Date)
+            stmt = (
+                select(Table, TimeSlot, day.label("day"))
+                .join(TimeSlot, TimeSlot.restaurant_id == Table.restaurant_id)
+                .join(offsets, true())
+                .where(
+                    Table.restaurant_id == restaurant_id,
+                    Table.is_active,
+                    TimeSlot.is_active,
+                    Table.capacity >= capacity,
+                    or_(offsets.c.value > 0, TimeSlot.start_time > now.time()),
+                    ~self._overlapping_booking(Table.id, day)
+                )
+                .order_by(day, TimeSlot.start_time, Table.capacity - capacity, Table.id)
+                .limit(limit)
+            )
+            result = await self._session.execute(stmt)
+            return [(TableInfo.of(table), SlotInfo.of(slot), day) for table, slot, day in result.all()]
+        except SQLAlchemyError as e:
+            logger.error(f"Error searching the nearest available slots: {e}")
+            return []
+
+    @single_flight.coalesce
+    async def get_month_availability(self, year: int, month: int, restaurant_id: int, table_id: int | None = None,
+                                     capacity: int | None = None) -> Dict[date, int]:
+        """
+        Counting free slots per day of the month for a table, or for all tables of the restaurant
+        with at least `capacity` seats. The result is cached for a short time.
+        :return: {date: free slots} for the days having bookings; other days are completely free
+        """
+        scope = ("table", table_id) if table_id is not None else ("capacity", capacity)
+        cached = availability_cache.get(restaurant_id, scope, year, month)
+        if cached is not None:
+            return cached
+        try:
+            first_day = date(year, month, 1)
+            next_month = date(year + month // 12, month % 12 + 1, 1)
+            slots_total = (select(func.count(TimeSlot.id))
+                           .where(TimeSlot.restaurant_id == restaurant_id, TimeSlot.is_active)
+                           .scalar_subquery())
+            if table_id is not None:
+                free = slots_total - func.count(self.model.time_slot_id.distinct())
+                table_filter = self.model.table_id == table_id
+            else:
+                suitable_tables = select(Table.id).where(Table.restaurant_id == restaurant_id,
+                                                         Table.is_active,
+                                                         Table.capacity >= capacity)
+                tables_total = select(func.count()).select_from(suitable_tables.subquery()).scalar_subquery()
+                free = (tables_total * slots_total
+                        - func.count(tuple_(self.model.table_id, self.model.time_slot_id).distinct()))
+                table_filter = self.model.table_id.in_(suitable_tables)
+            stmt = (
+                select(self.model.date, free)
+                .where(table_filter,
+                       self.model.date >= first_day,
+                       self.model.date < next_month,
+                       self.model.status == "booked")
+                .group_by(self.model.date)
+            )
+            result = await self._session.execute(stmt)
+            availability = dict(result.tuples().all())
+            availability_cache.set(restaurant_id, scope, year, month, availability)
+            return availability
+        except SQLAlchemyError as e:
+            logger.error(f"Error counting free slots for {year}-{month:02d}: {e}")
+            return {}
+
+    async def get_bookings_with_details(self, user_id: int, restaurant_id: int, limit: int | None = None,
+                                        offset: int = 0):
         """
-        Acquire the list of all user's reservations with details
+        Acquire the list of user's reservations in the restaurant with details, the newest first.
+        The archive is read only when the page goes past the reservations kept in `bookings`
         :params user_id:  user's ID
-        :return: A list of the Booking objects with uploaded data about table and time information
+        :params limit: page size, all reservations if None
+        :params offset: number of reservations to skip
+        :return: A list of the Booking (and BookingArchive) objects with uploaded data about table and time information
         """
         try:
             stmt = select(self.model).options(
                 joinedload(self.model.table),
                 joinedload(self.model.time_slot)
-            ).filter_by(user_id=user_id)
-            result = await self._session.execute(stmt)
-            return result.scalars().all()
+            ).filter_by(restaurant_id=restaurant_id, user_id=user_id).order_by(self.model.date.desc(),
+                                                                                self.model.id.desc())
+            result = await self._session.execute(stmt.offset(offset).limit(limit))
+            bookings = list(result.scalars().all())
+            if limit is not None and len(bookings) == limit:
+                return bookings
+
+            if bookings or offset == 0:
+                live_total = offset + len(bookings)
+            else:
+                live_total = await self._session.scalar(
+                    select(func.count(self.model.id)).filter_by(restaurant_id=restaurant_id, user_id=user_id)
+                )
+            archive_stmt = select(BookingArchive).options(
+                joinedload(BookingArchive.table),
+                joinedload(BookingArchive.time_slot)
+            ).filter_by(restaurant_id=restaurant_id, user_id=user_id).order_by(BookingArchive.date.desc(),
+                                                                                BookingArchive.id.desc())
+            archive_limit = None if limit is None else limit - len(bookings)
+            archive_result = await self._session.execute(
+                archive_stmt.offset(max(offset - live_total, 0)).limit(archive_limit)
+            )
+            bookings.extend(archive_result.scalars().all())
+            return bookings
         except SQLAlchemyError as e:
             logger.error(f"Error acquiring reservations with details: {e}")
             return []
 
+    async def stream_bookings(self, date_from: date | None = None, date_to: date | None = None,
+                              statuses: List[str] | None = None,
+                              restaurant_id: int | None = None) -> AsyncIterator[Row]:
+        """
+        Stream reservations (the archive included) matching the filters from a server-side cursor,
+        without loading the whole result into memory
+        """
+        selects = []
+        for model in (self.model, BookingArchive):
+            stmt = select(model.id, model.restaurant_id, model.user_id, model.table_id, model.time_slot_id, model.date,
+                          model.start_time, model.end_time, model.status, model.created_at)
+            if date_from:
+                stmt = stmt.where(model.date >= date_from)
+            if date_to:
+                stmt = stmt.where(model.date <= date_to)
+            if statuses:
+                stmt = stmt.where(model.status.in_(statuses))
+            if restaurant_id is not None:
+                stmt = stmt.where(model.restaurant_id == restaurant_id)
+            selects.append(stmt)
+        try:
+            result = await self._session.stream(
+                union_all(*selects).execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+            )
+            async for row in result:
+                yield row
+        except SQLAlchemyError as e:
+            logger.error(f"Error streaming reservations: {e}")
+            raise
+
+    async def archive_finished_bookings(self, before: date) -> int:
+        """
+        Move 'completed' and 'canceled' reservations older than the given date
+        into the archive in one statement
+        :return: number of archived reservations
+        """
+        columns = ["id", "restaurant_id", "user_id", "table_id", "time_slot_id", "date", "start_time", "end_time",
+                   "status", "created_at", "updated_at"]
+        try:
+            # moving rows to the archive doesn't change the booking stats
+            await self._session.execute(text("SET LOCAL app.booking_stats_skip = 'on'"))
+            moved = (delete(self.model)
+                     .where(self.model.status.in_(["completed", "canceled"]), self.model.date < before)
+                     .returning(*[getattr(self.model, column) for column in columns])
+                     .cte("moved"))
+            stmt = (insert(BookingArchive)
+                    .from_select(columns, select(*[moved.c[column] for column in columns]))
+                    .returning(BookingArchive.id))
+            result = await self._session.execute(stmt)
+            archived = len(result.scalars().all())
+            await self._session.commit()
+            logger.info(f"{archived} reservations older than {before} moved to the archive")
+            return archived
+        except SQLAlchemyError as e:
+            logger.error(f"Error archiving finished reservations: {e}")
+            await self._session.rollback()
+            raise
+
     async def complete_past_bookings(self):
         """
         Update the booking status to 'completed'
@@ -77,76 +410,133 @@ class BookingDAO(BaseDAO[Booking]):
         """
         try:
             now = datetime.now()
-            sub_stmt = select(TimeSlot.start_time).where(TimeSlot.id == self.model.time_slot_id).scalar_subquery()
-            stmt = select(Booking.id).where(
-                Booking.date > now.date(),
-                            self.model.status == "booked"
-            ).union_all(
-                select(Booking.id).where(self.model.date == now.date(),
-                                         sub_stmt > now.time(),
-                                         self.model.status == "booked"
-                                         )
-            )
-            result = await self._session.execute(stmt)
-            reservation_ids_to_update = result.scalars().all()
-            if reservation_ids_to_update:
-                #form statement to update booking status
-                update_stmt = (update(Booking)
-                               .where(Booking.id.in_(reservation_ids_to_update))
-                               .values(status="completed")
-                               )
-                #Executing an update query
-                await self._session.execute(update_stmt)
-
+            #form statement to update booking status, the period is compared by the database;
+            #a finished booking started today at the latest, the date lets the planner skip the future partitions
+            update_stmt = (update(Booking)
+                           .where(Booking.status == "booked", Booking.date <= now.date(),
+                                  func.upper(Booking.during) <= now)
+                           .values(status="completed")
+                           )
+            #Executing an update query
+            result = await self._session.execute(update_stmt)
+            if result.rowcount:
                 #Commit the change
                 await self._session.commit()
-                logger.info(f"Status for {len(reservation_ids_to_update)} reservations changed to 'completed'")
+                logger.info(f"Status for {result.rowcount} reservations changed to 'completed'")
             else:
                 logger.info("No reservations to update status")
         except SQLAlchemyError as e:
             logger.error(f"Error updating reservations' status to 'completed': {e}")
 
-    async def cancel_reservation(self, book_id: int):
+    def _closure_filter(self, restaurant_id: int, date_from: date, date_to: date, table_ids: List[int] | None = None):
+        conditions = [self.model.restaurant_id == restaurant_id, self.model.status == "booked",
+                      self.model.date.between(date_from, date_to)]
+        if table_ids:
+            conditions.append(self.model.table_id.in_(table_ids))
+        return conditions
+
+    async def count_closure(self, restaurant_id: int, date_from: date, date_to: date,
+                            table_ids: List[int] | None = None) -> int:
+        """
+        Counting the active bookings a closure of the restaurant's dates (and tables) would cancel
+        """
+        try:
+            stmt = (select(func.count()).select_from(self.model)
+                    .where(*self._closure_filter(restaurant_id, date_from, date_to, table_ids)))
+            return await self._session.scalar(stmt)
+        except SQLAlchemyError as e:
+            logger.error(f"Error counting bookings from {date_from} to {date_to}: {e}")
+            raise
+
+    async def cancel_range(self, restaurant_id: int, date_from: date, date_to: date,
+                           table_ids: List[int] | None = None):
+        """
+        Canceling every active booking of the restaurant's dates (and tables) with one UPDATE, the date range
+        limits it to the matching partitions
+        :return: list of the canceled (user_id, table_id, date, start_time, end_time) rows
+        """
         try:
             stmt = (update(self.model)
-                    .filter_by(id=book_id)
+                    .where(*self._closure_filter(restaurant_id, date_from, date_to, table_ids))
                     .values(status="canceled")
+                    .returning(self.model.user_id, self.model.table_id, self.model.date,
+                               self.model.start_time, self.model.end_time)
+                    .execution_options(synchronize_session=False))
+            result = await self._session.execute(stmt)
+            canceled = result.all()
+            await self._session.commit()
+            availability_cache.invalidate(restaurant_id=restaurant_id)
+            logger.info(f"{len(canceled)} bookings of restaurant {restaurant_id} from {date_from} to {date_to} "
+                        f"canceled (tables: {table_ids or 'all'})")
+            return canceled
+        except SQLAlchemyError as e:
+            logger.error(f"Error canceling bookings from {date_from} to {date_to}: {e}")
+            await self._session.rollback()
+            raise
+
+    async def cancel_reservation(self, book_id: int, restaurant_id: int):
+        """
+        Cancels the booking of the restaurant if it is still active
+        :return: list of the freed (table_id, date, time_slot_id) rows, used to promote the waitlist
+        """
+        try:
+            stmt = (update(self.model)
+                    .filter_by(id=book_id, restaurant_id=restaurant_id, status="booked")
+                    .values(status="canceled")
+                    .returning(self.model.table_id, self.model.date, self.model.time_slot_id)
                     .execution_options(synchronize_session="fetch")
             )
             result = await self._session.execute(stmt)
+            freed = result.all()
             await self._session.flush()
-            return result.rowcount
+            for _, booking_date, _ in freed:
+                invalidate_availability(self._session, booking_date, restaurant_id)
+            return freed
         except SQLAlchemyError as e:
             logger.error(f"Error canceling the booking with id {book_id}: {e}")
             await self._session.rollback()
             raise
 
-    async def delete_booking(self, book_id: int):
+    async def delete_booking(self, book_id: int, restaurant_id: int):
+        """
+        Deletes the booking of the restaurant
+        :return: list of the freed (table_id, date, time_slot_id) rows, used to promote the waitlist;
+        a canceled or completed booking frees nothing
+        """
         try:
-            stmt = delete(self.model).filter_by(id=book_id)
+            stmt = (delete(self.model)
+                    .filter_by(id=book_id, restaurant_id=restaurant_id)
+                    .returning(self.model.table_id, self.model.date, self.model.time_slot_id, self.model.status))
             result = await self._session.execute(stmt)
-            logger.info(f"{result.rowcount} records are deleted")
+            deleted = result.all()
+            logger.info(f"{len(deleted)} records are deleted")
+            freed = [(table_id, booking_date, time_slot_id)
+                     for table_id, booking_date, time_slot_id, status in deleted if status == "booked"]
             await self._session.flush()
-            return result.rowcount
+            for _, booking_date, _ in freed:
+                invalidate_availability(self._session, booking_date, restaurant_id)
+            return freed
         except SQLAlchemyError as e:
             logger.info(f"Error deleting records: {e}")
             await self._session.rollback()
             raise
 
-    async def entries_count(self) -> Dict[str, int]:
+    @single_flight.coalesce
+    async def entries_count(self, restaurant_id: int) -> Dict[str, int]:
         """
-        Counting the number of entries by status ('booked', 'completed', 'canceled')
+        Counting the number of entries of the restaurant by status ('booked', 'completed', 'canceled')
         """
         try:
             entries_count = {}
             states = ["booked", "completed", "canceled"]
             for st in states:
-                stmt = select(func.count(self.model.id)).where(self.model.status == st)
+                stmt = select(func.count(self.model.id)).where(self.model.restaurant_id == restaurant_id,
+                                                               self.model.status == st)
                 result = await self._session.execute(stmt)
                 count = result.scalar()
                 entries_count[st] = count
                 logger.info(f"{count} entries with status {st} found")
-            total_stmt = select(func.count(self.model.id))
+            total_stmt = select(func.count(self.model.id)).where(self.model.restaurant_id == restaurant_id)
             total_res = await self._session.execute(total_stmt)
             total_count = total_res.scalar()
             entries_count["total"] = total_count
@@ -157,3 +547,193 @@ class BookingDAO(BaseDAO[Booking]):
             raise
 
 
+class BookingStatsDAO(BaseDAO[BookingStats]):
+    model = BookingStats
+
+    async def refresh(self, since: date):
+        """
+        Recalculating the rollup from `bookings` for the dates starting from `since`,
+        corrects any drift of the incremental updates
+        """
+        try:
+            await self._session.execute(delete(self.model).where(self.model.date >= since))
+            totals = (select(Booking.date, Booking.table_id, Booking.time_slot_id, Booking.status, func.count())
+                      .where(Booking.date >= since)
+                      .group_by(Booking.date, Booking.table_id, Booking.time_slot_id, Booking.status))
+            await self._session.execute(
+                insert(self.model).from_select(["date", "table_id", "time_slot_id", "status", "count"], totals)
+            )
+            await self._session.commit()
+            logger.info(f"Booking stats recalculated since {since}")
+        except SQLAlchemyError as e:
+            logger.error(f"Error recalculating booking stats: {e}")
+            await self._session.rollback()
+
+    def _of_restaurant(self, restaurant_id: int):
+        """The rollup has no restaurant column, the rows are picked by the restaurant's tables"""
+        return self.model.table_id.in_(select(Table.id).where(Table.restaurant_id == restaurant_id))
+
+    async def daily_counts(self, restaurant_id: int, since: date, until: date) -> Dict[date, Dict[str, int]]:
+        """
+        Counting bookings of the restaurant per day and status for the period
+        """
+        try:
+            stmt = (select(self.model.date, self.model.status, func.sum(self.model.count))
+                    .where(self._of_restaurant(restaurant_id), self.model.date.between(since, until))
+                    .group_by(self.model.date, self.model.status)
+                    .order_by(self.model.date))
+            result = await self._session.execute(stmt)
+            daily = {}
+            for day, status, count in result.tuples().all():
+                daily.setdefault(day, {})[status] = count
+            return daily
+        except SQLAlchemyError as e:
+            logger.error(f"Error counting daily bookings: {e}")
+            raise
+
+    async def table_utilization(self, restaurant_id: int, since: date, until: date) -> Dict[int, float]:
+        """
+        Share of the time slots of each table of the restaurant taken by not canceled bookings for the period
+        """
+        try:
+            days = (until - since).days + 1
+            slots_count = await self._session.scalar(select(func.count(TimeSlot.id))
+                                                     .where(TimeSlot.restaurant_id == restaurant_id,
+                                                            TimeSlot.is_active))
+            stmt = (select(self.model.table_id, func.sum(self.model.count))
+                    .where(self._of_restaurant(restaurant_id), self.model.date.between(since, until),
+                           self.model.status != "canceled")
+                    .group_by(self.model.table_id))
+            result = await self._session.execute(stmt)
+            table_ids = (await self._session.execute(select(Table.id)
+                                                     .where(Table.restaurant_id == restaurant_id, Table.is_active)
+                                                     .order_by(Table.id))).scalars().all()
+            taken = dict(result.tuples().all())
+            return {table_id: taken.get(table_id, 0) / (slots_count * days) if slots_count else 0
+                    for table_id in table_ids}
+        except SQLAlchemyError as e:
+            logger.error(f"Error calculating table utilization: {e}")
+            raise
+
+    async def cancellation_by_weekday(self, restaurant_id: int, since: date, until: date) -> Dict[int, float]:
+        """
+        Cancellation rate of the restaurant by ISO weekday (1 - Monday) for the period
+        """
+        try:
+            weekday = extract("isodow", self.model.date)
+            stmt = (select(weekday,
+                           func.sum(self.model.count).filter(self.model.status == "canceled"),
+                           func.sum(self.model.count))
+                    .where(self._of_restaurant(restaurant_id), self.model.date.between(since, until))
+                    .group_by(weekday))
+            result = await self._session.execute(stmt)
+            return {int(day): (canceled or 0) / total for day, canceled, total in result.tuples().all() if total}
+        except SQLAlchemyError as e:
+            logger.error(f"Error calculating cancellation rate: {e}")
+            raise
+
+
+class WaitlistDAO(BaseDAO[WaitlistEntry]):
+    model = WaitlistEntry
+
+    async def join(self, restaurant_id: int, user_id: int, capacity: int, booking_date: date, time_slot_id: int,
+                   table_id: int | None = None) -> bool:
+        """
+        Putting the guest on the waitlist of the restaurant's slot
+        :return: False if the guest is already waiting for this slot
+        """
+        try:
+            stmt = (pg_insert(self.model)
+                    .values(restaurant_id=restaurant_id, user_id=user_id, capacity=capacity, date=booking_date,
+                            time_slot_id=time_slot_id, table_id=table_id, status="waiting")
+                    .on_conflict_do_nothing(index_elements=["user_id", "date", "time_slot_id"],
+                                            index_where=self.model.status == "waiting")
+                    .returning(self.model.id))
+            entry_id = await self._session.scalar(stmt)
+            logger.info(f"User {user_id} {'joined' if entry_id else 'is already on'} the waitlist "
+                        f"for {booking_date}, slot {time_slot_id}")
+            return entry_id is not None
+        except SQLAlchemyError as e:
+            logger.error(f"Error adding user {user_id} to the waitlist: {e}")
+            await self._session.rollback()
+            raise
+
+    async def promote(self, table_id: int, booking_date: date, time_slot_id: int):
+        """
+        Booking the freed slot for the first eligible waiting guest: waiting for this very table,
+        or for any table not bigger than the freed one. The lookup is a single query on the partial index,
+        the entry is locked so that concurrent cancellations promote different guests.
+        :return: (WaitlistEntry, Booking) or None if nobody could be promoted
+        """
+        now = datetime.now()
+        if booking_date < now.date():
+            return None
+        try:
+            slot = await self._session.get(TimeSlot, time_slot_id)
+            if not slot.is_active or (booking_date == now.date() and slot.start_time <= now.time()):
+                # the slot has already started, nobody is promoted into it
+                return None
+            freed_capacity = select(Table.capacity).where(Table.id == table_id).scalar_subquery()
+            stmt = (select(self.model)
+                    .where(self.model.status == "waiting",
+                           self.model.restaurant_id == slot.restaurant_id,
+                           self.model.date == booking_date,
+                           self.model.time_slot_id == time_slot_id,
+                           or_(self.model.table_id == table_id,
+                               (self.model.table_id.is_(None)) & (self.model.capacity <= freed_capacity)))
+                    .order_by(self.model.created_at)
+                    .limit(1)
+                    .with_for_update(skip_locked=True))
+            entry = await self._session.scalar(stmt)
+            if entry is None:
+                return None
+            # the same lock as assign_best_table, so that the freed table isn't handed out twice
+            await self._session.execute(
+                select(func.pg_advisory_xact_lock(booking_date.toordinal(), time_slot_id))
+            )
+            booking_dao = BookingDAO(self._session)
+            if entry.table_id is None:
+                table = await booking_dao.find_best_table(entry.capacity, booking_date, time_slot_id, entry.user_id)
+                target_id = table.id if table is not None else None
+            else:
+                # tables held by other guests confirming a booking are not handed out
+                available = await booking_dao.check_available_bookings(entry.table_id, booking_date, time_slot_id,
+                                                                       entry.user_id)
+                target_id = entry.table_id if available else None
+            if target_id is None:
+                return None
+            booking = Booking(restaurant_id=slot.restaurant_id, user_id=entry.user_id, table_id=target_id,
+                              time_slot_id=time_slot_id, date=booking_date, start_time=slot.start_time,
+                              end_time=slot.end_time, status="booked")
+            try:
+                # a guest booking the table at this very moment wins, the cancellation itself is kept
+                async with self._session.begin_nested():
+                    self._session.add(booking)
+                    await self._session.flush()
+            except IntegrityError:
+                logger.info(f"Waitlist promotion for {booking_date}, slot {time_slot_id} lost the race")
+                return None
+            entry.status = "promoted"
+            entry.booking_id = booking.id
+            await self._session.flush()
+            invalidate_availability(self._session, booking_date, slot.restaurant_id)
+            logger.info(f"User {entry.user_id} promoted from the waitlist to table №{target_id} "
+                        f"on {booking_date}, slot {time_slot_id}")
+            return entry, booking
+        except SQLAlchemyError as e:
+            logger.error(f"Error promoting the waitlist for {booking_date}, slot {time_slot_id}: {e}")
+            raise
+
+    async def depth(self, restaurant_id: int | None = None) -> int:
+        """
+        Counting the guests still waiting for the upcoming slots, of one restaurant or of all of them
+        """
+        try:
+            stmt = select(func.count(self.model.id)).where(self.model.status == "waiting",
+                                                           self.model.date >= date.today())
+            if restaurant_id is not None:
+                stmt = stmt.where(self.model.restaurant_id == restaurant_id)
+            return await self._session.scalar(stmt)
+        except SQLAlchemyError as e:
+            logger.error(f"Error counting the waitlist: {e}")
+            raise
@@ -1,10 +1,9 @@
-import uuid
 from datetime import datetime
-from decimal import Decimal
-from sqlalchemy import inspect, TIMESTAMP, func
+from sqlalchemy import TIMESTAMP, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine, AsyncSession
 from app.config import settings
+from app.DAO.serializers import serializer_for
 
 engine = create_async_engine(url=settings.DB_URL)
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession)
@@ -26,6 +25,7 @@ class Base(AsyncAttrs, DeclarativeBase):
     def to_dict(self, exclude_none: bool = False):
         """
         Преобразует объект модели в словарь.
+        Использует сериализатор, скомпилированный один раз для класса модели.
 
         Args:
             exclude_none (bool): Исключать ли None значения из результата
@@ -33,20 +33,4 @@ class Base(AsyncAttrs, DeclarativeBase):
         Returns:
             dict: Словарь с данными объекта
         """
-        result = {}
-        for column in inspect(self.__class__).columns:
-            value = getattr(self, column.key)
-
-            # Преобразование специальных типов данных
-            if isinstance(value, datetime):
-                value = value.isoformat()
-            elif isinstance(value, Decimal):
-                value = float(value)
-            elif isinstance(value, uuid.UUID):
-                value = str(value)
-
-            # Добавляем значение в результат
-            if not exclude_none or value is not None:
-                result[column.key] = value
-
-        return result
\ No newline at end of file
+        return serializer_for(self.__class__)(self, exclude_none)
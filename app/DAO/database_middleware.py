@@ -1,7 +1,18 @@
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
+from loguru import logger
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from app.DAO.database import async_session_maker
+from app.DAO.replicas import replica_router
+
+
+def after_commit(session, callback: Callable[[], Awaitable[Any]]) -> None:
+    """
+    Runs the callback once the transaction of the handler is committed by DatabaseMiddlewareWithCommit.
+    Nothing runs if the handler fails and the transaction is rolled back.
+    """
+    session.info.setdefault("after_commit", []).append(callback)
 
 
 class BaseDatabaseMiddleware(BaseMiddleware):
@@ -11,11 +22,11 @@ class BaseDatabaseMiddleware(BaseMiddleware):
             event: Message | CallbackQuery,
             data: Dict[str, Any]
     ) -> Any:
-        async with async_session_maker() as session:
+        async with self.get_session_maker(data)() as session:
             self.set_session(data, session)
             try:
                 result = await handler(event, data)
-                await self.after_handler(session)
+                await self.after_handler(session, data)
                 return result
             except Exception as e:
                 await session.rollback()
@@ -23,16 +34,29 @@ class BaseDatabaseMiddleware(BaseMiddleware):
             finally:
                 await session.close()
 
+    def get_session_maker(self, data: Dict[str, Any]) -> async_sessionmaker:
+        """Method for choosing the database the session is opened on."""
+        return async_session_maker
+
     def set_session(self, data: Dict[str, Any], session) -> None:
         """Method for setting a session in the data dictionary."""
         raise NotImplementedError("Этот метод должен быть реализован в подклассах.")
 
-    async def after_handler(self, session) -> None:
+    async def after_handler(self, session, data: Dict[str, Any]) -> None:
         """Method for additional actions after the handler is called (e.g, commit)."""
         pass
 
 
+def _user_id(data: Dict[str, Any]) -> int | None:
+    user = data.get("event_from_user")
+    return user.id if user else None
+
+
 class DatabaseMiddlewareWithoutCommit(BaseDatabaseMiddleware):
+    def get_session_maker(self, data: Dict[str, Any]) -> async_sessionmaker:
+        # read-only sessions may go to a replica
+        return replica_router.session_maker_for(_user_id(data))
+
     def set_session(self, data: Dict[str, Any], session) -> None:
         data['session_without_commit'] = session
 
@@ -41,5 +65,13 @@ class DatabaseMiddlewareWithCommit(BaseDatabaseMiddleware):
     def set_session(self, data: Dict[str, Any], session) -> None:
         data['session_with_commit'] = session
 
-    async def after_handler(self, session) -> None:
-        await session.commit()
\ No newline at end of file
+    async def after_handler(self, session, data: Dict[str, Any]) -> None:
+        await session.commit()
+        if session.info.get("has_writes") and replica_router.enabled:
+            # the user reads from the primary until the replicas have caught up with the write
+            replica_router.mark_write(_user_id(data))
+        for callback in session.info.pop("after_commit", []):
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"Error in an after-commit callback: {e}")
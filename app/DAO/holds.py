@@ -0,0 +1,246 @@
+import asyncio
+import math
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Set, Tuple
+from loguru import logger
+from sqlalchemy import delete, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import settings
+from app.DAO.database import async_session_maker
+from app.DAO.models import SlotHold
+
+HoldKey = Tuple[int, date, int]  # (table_id, date, time_slot_id)
+
+
+class Hold(NamedTuple):
+    user_id: int
+    expires: float  # time.monotonic()
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: keys are put into the bucket of their deadline, every tick empties one bucket.
+    Scheduling and expiring cost O(1) whatever the number of holds.
+    """
+
+    def __init__(self, tick: float, horizon: float):
+        self.tick = tick
+        self._buckets: List[Set] = [set() for _ in range(math.ceil(horizon / tick) + 1)]
+        self._cursor = 0
+
+    def schedule(self, key, delay: float) -> None:
+        steps = min(max(1, math.ceil(delay / self.tick)), len(self._buckets) - 1)
+        self._buckets[(self._cursor + steps) % len(self._buckets)].add(key)
+
+    def advance(self) -> Set:
+        """Moves to the next bucket and returns its keys."""
+        self._cursor = (self._cursor + 1) % len(self._buckets)
+        due, self._buckets[self._cursor] = self._buckets[self._cursor], set()
+        return due
+
+
+class SlotHolds:
+    """
+    Leases on (table, date, slot) taken when a guest picks a slot and released on confirmation,
+    cancellation or expiry. Held slots are not offered to the other guests.
+    Without `shared` the holds live in this process only. With it they are also written to `slot_holds`,
+    so that every instance (and dispatch worker) sees them.
+    """
+
+    def __init__(self, ttl: float, tick: float, shared: bool = False):
+        self._ttl = ttl
+        self._shared = shared
+        self._holds: Dict[HoldKey, Hold] = {}
+        self._by_user: Dict[int, HoldKey] = {}
+        self._wheel = TimerWheel(tick, ttl)
+        self._task: asyncio.Task | None = None
+        self.placed = 0
+        self.converted = 0
+        self.expired = 0
+        self.released = 0
+
+    def _active(self, key: HoldKey) -> Hold | None:
+        hold = self._holds.get(key)
+        return hold if hold is not None and hold.expires > time.monotonic() else None
+
+    def _drop(self, key: HoldKey) -> Hold | None:
+        hold = self._holds.pop(key, None)
+        if hold is not None and self._by_user.get(hold.user_id) == key:
+            del self._by_user[hold.user_id]
+        return hold
+
+    async def place(self, user_id: int, table_id: int, booking_date: date, time_slot_id: int) -> bool:
+        """
+        Holds the slot for the user, replacing the previous hold of the user.
+        :return: False if the slot is held by another guest
+        """
+        key = (table_id, booking_date, time_slot_id)
+        hold = self._active(key)
+        if hold is not None and hold.user_id != user_id:
+            return False
+        if self._shared and not await self._place_shared(user_id, key):
+            return False
+        previous = self._by_user.get(user_id)
+        if previous is not None and previous != key:
+            await self._release_key(previous)
+        self._holds[key] = Hold(user_id, time.monotonic() + self._ttl)
+        self._by_user[user_id] = key
+        self._wheel.schedule(key, self._ttl)
+        if previous != key:
+            self.placed += 1
+        return True
+
+    async def convert(self, user_id: int) -> None:
+        """The hold became a booking."""
+        if await self._release_user(user_id):
+            self.converted += 1
+
+    async def release(self, user_id: int) -> None:
+        """The guest left the dialog."""
+        if await self._release_user(user_id):
+            self.released += 1
+
+    async def _release_user(self, user_id: int) -> bool:
+        """
+        Drops the hold of the user, returns whether there was one. The shared hold is deleted whatever
+        this process knows: with several processes the slot was often picked in another one.
+        """
+        key = self._by_user.get(user_id)
+        if key is not None:
+            self._drop(key)
+        if self._shared:
+            deleted = await self._delete_user_shared(user_id)
+            if deleted is not None:
+                return deleted
+        return key is not None
+
+    async def _release_key(self, key: HoldKey) -> None:
+        hold = self._drop(key)
+        if self._shared and hold is not None:
+            await self._delete_shared(key, hold.user_id)
+
+    async def held_slots(self, table_id: int, booking_date: date, user_id: int | None = None) -> Set[int]:
+        """Ids of the time slots of the table held by other guests on the date."""
+        if self._shared:
+            return await self._read_shared(
+                select(SlotHold.time_slot_id).where(SlotHold.table_id == table_id, SlotHold.date == booking_date,
+                                                    *self._others_active(user_id)))
+        return {key[2] for key, hold in list(self._holds.items())
+                if key[:2] == (table_id, booking_date) and hold.user_id != user_id and self._active(key)}
+
+    async def held_tables(self, booking_date: date, time_slot_id: int, user_id: int | None = None) -> Set[int]:
+        """Ids of the tables held by other guests for the date and slot."""
+        if self._shared:
+            return await self._read_shared(
+                select(SlotHold.table_id).where(SlotHold.date == booking_date, SlotHold.time_slot_id == time_slot_id,
+                                                *self._others_active(user_id)))
+        return {key[0] for key, hold in list(self._holds.items())
+                if key[1:] == (booking_date, time_slot_id) and hold.user_id != user_id and self._active(key)}
+
+    @staticmethod
+    async def _read_shared(stmt) -> Set[int]:
+        """
+        Reads the shared holds on the primary, whatever the session of the caller: slot_holds is unlogged,
+        a hot standby can't read it.
+        """
+        try:
+            async with async_session_maker() as session:
+                return set((await session.execute(stmt)).scalars().all())
+        except SQLAlchemyError as e:
+            # the hold is an optimization, the slots are offered as if nothing was held
+            logger.error(f"Error reading the slot holds: {e}")
+            return set()
+
+    @staticmethod
+    def _others_active(user_id: int | None):
+        conditions = [SlotHold.expires_at > datetime.now()]
+        if user_id is not None:
+            conditions.append(SlotHold.user_id != user_id)
+        return conditions
+
+    async def _place_shared(self, user_id: int, key: HoldKey) -> bool:
+        table_id, booking_date, time_slot_id = key
+        expires_at = datetime.now() + timedelta(seconds=self._ttl)
+        stmt = (insert(SlotHold)
+                .values(table_id=table_id, date=booking_date, time_slot_id=time_slot_id, user_id=user_id,
+                        expires_at=expires_at)
+                .on_conflict_do_update(
+                    index_elements=["table_id", "date", "time_slot_id"],
+                    set_={"user_id": user_id, "expires_at": expires_at},
+                    # taken over only when expired or already ours
+                    where=or_(SlotHold.expires_at <= datetime.now(), SlotHold.user_id == user_id))
+                .returning(SlotHold.user_id))
+        try:
+            async with async_session_maker() as session:
+                holder = await session.scalar(stmt)
+                if holder is not None:
+                    # one hold per guest, the previous one may have been placed by another process
+                    await session.execute(delete(SlotHold).where(
+                        SlotHold.user_id == user_id,
+                        tuple_(SlotHold.table_id, SlotHold.date, SlotHold.time_slot_id) != key))
+                await session.commit()
+                return holder is not None
+        except SQLAlchemyError as e:
+            # the hold is an optimization, the booking itself is still checked on confirmation
+            logger.error(f"Error placing the slot hold {key}: {e}")
+            return True
+
+    async def _delete_shared(self, key: HoldKey, user_id: int) -> None:
+        table_id, booking_date, time_slot_id = key
+        try:
+            async with async_session_maker() as session:
+                await session.execute(delete(SlotHold).where(SlotHold.table_id == table_id,
+                                                             SlotHold.date == booking_date,
+                                                             SlotHold.time_slot_id == time_slot_id,
+                                                             SlotHold.user_id == user_id))
+                await session.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Error releasing the slot hold {key}: {e}")
+
+    @staticmethod
+    async def _delete_user_shared(user_id: int) -> bool | None:
+        """Deletes the shared hold of the user, returns whether there was one, None if it is unknown."""
+        try:
+            async with async_session_maker() as session:
+                result = await session.execute(delete(SlotHold).where(SlotHold.user_id == user_id)
+                                               .returning(SlotHold.table_id))
+                deleted = bool(result.all())
+                await session.commit()
+                return deleted
+        except SQLAlchemyError as e:
+            logger.error(f"Error releasing the slot hold of the user {user_id}: {e}")
+            return None
+
+    async def _expire(self) -> None:
+        while True:
+            await asyncio.sleep(self._wheel.tick)
+            now = time.monotonic()
+            for key in self._wheel.advance():
+                hold = self._holds.get(key)
+                if hold is None:
+                    continue
+                if hold.expires > now:
+                    # renewed since it was scheduled
+                    self._wheel.schedule(key, hold.expires - now)
+                    continue
+                await self._release_key(key)
+                self.expired += 1
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._expire())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        return {"active": len(self._holds), "placed": self.placed, "converted": self.converted,
+                "expired": self.expired, "released": self.released,
+                "conversion_rate": self.converted / self.placed if self.placed else 0}
+
+
+slot_holds = SlotHolds(ttl=settings.HOLD_TTL, tick=settings.HOLD_TICK, shared=settings.HOLDS_SHARED)
@@ -1,34 +1,140 @@
+import hashlib
 import json
+import time as timer
+from datetime import time
+from typing import List, NamedTuple, Set, Tuple
+from loguru import logger
+from sqlalchemy import select, update, insert, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.config import settings
-from app.DAO.dao import TableDAO, TimeSlotUserDAO
+from app.config import settings, DEFAULT_RESTAURANT_ID
 from app.DAO.database import async_session_maker
+from app.DAO.models import Table, TimeSlot, CatalogSource
+from app.DAO.availability import availability_cache
+from app.DAO.catalog import table_catalog
 from pydantic import BaseModel
 
+CATALOG_SYNC_LOCK = 0x7ab1e5  # advisory lock namespace, workers starting together sync one at a time
+
 
 class TableBase(BaseModel):
+    id: int
     capacity: int
     description: str
 
 
 class TimeSlotBase(BaseModel):
-    start_time: str
-    end_time: str
+    start_time: time
+    end_time: time
 
 
-async def add_tables_to_db(session: AsyncSession):
-    with open(settings.TABLES_JSON, "r", encoding='utf-8') as file:
-        tables_data = json.load(file)
-    await TableDAO(session).add_many([TableBase(**table) for table in tables_data])
+class SyncReport(NamedTuple):
+    inserted: int = 0
+    updated: int = 0
+    deactivated: int = 0
 
-async def add_time_slots_to_db(session: AsyncSession):
-    with open(settings.SLOTS_JSON, 'r', encoding='utf-8') as file:
-        tables_data = json.load(file)
-    await TimeSlotUserDAO(session).add_many([TimeSlotBase(**table) for table in tables_data])
 
+def read_sources(*paths: str) -> Tuple[str, List[list]]:
+    """Returns the sha256 of the source files together and their parsed content."""
+    digest = hashlib.sha256()
+    sources = []
+    for path in paths:
+        with open(path, "rb") as file:
+            raw = file.read()
+        digest.update(raw)
+        sources.append(json.loads(raw))
+    return digest.hexdigest(), sources
 
-async def init_db():
+
+async def sync_tables(session: AsyncSession, restaurant_id: int, tables: List[TableBase]) -> SyncReport:
+    """Tables are matched by id: new ones are inserted, changed ones updated, missing ones deactivated."""
+    result = await session.execute(select(Table.id, Table.capacity, Table.description, Table.is_active)
+                                   .where(Table.restaurant_id == restaurant_id))
+    current = {row.id: row for row in result.all()}
+    wanted = {table.id: table for table in tables}
+    new = [{"id": t.id, "restaurant_id": restaurant_id, "capacity": t.capacity, "description": t.description}
+           for table_id, t in wanted.items() if table_id not in current]
+    changed = [{"id": t.id, "capacity": t.capacity, "description": t.description, "is_active": True}
+               for table_id, t in wanted.items() if table_id in current
+               and (current[table_id].capacity, current[table_id].description, current[table_id].is_active)
+               != (t.capacity, t.description, True)]
+    removed = [table_id for table_id, row in current.items() if table_id not in wanted and row.is_active]
+    if new:
+        await session.execute(insert(Table), new)
+        # the ids come from the source, the sequence has to catch up for the rows added later
+        await session.execute(text("SELECT setval(pg_get_serial_sequence('tables', 'id'), max(id)) FROM tables"))
+    if changed:
+        await session.execute(update(Table), changed)
+    if removed:
+        await session.execute(update(Table).where(Table.id.in_(removed)).values(is_active=False))
+    return SyncReport(len(new), len(changed), len(removed))
+
+
+async def sync_time_slots(session: AsyncSession, restaurant_id: int, slots: List[TimeSlotBase]) -> SyncReport:
+    """
+    Time slots are matched by their times. Of the duplicates left by the old blind inserts
+    the oldest row is kept, the others are deactivated.
+    """
+    result = await session.execute(select(TimeSlot.id, TimeSlot.start_time, TimeSlot.end_time, TimeSlot.is_active)
+                                   .where(TimeSlot.restaurant_id == restaurant_id)
+                                   .order_by(TimeSlot.id))
+    kept: Set[Tuple[time, time]] = set()
+    wanted = {(slot.start_time, slot.end_time) for slot in slots}
+    reactivated, removed = [], []
+    for row in result.all():
+        key = (row.start_time, row.end_time)
+        if key in wanted and key not in kept:
+            kept.add(key)
+            if not row.is_active:
+                reactivated.append(row.id)
+        elif row.is_active:
+            removed.append(row.id)
+    new = [{"restaurant_id": restaurant_id, "start_time": start_time, "end_time": end_time}
+           for start_time, end_time in sorted(wanted - kept)]
+    if new:
+        await session.execute(insert(TimeSlot), new)
+    if reactivated:
+        await session.execute(update(TimeSlot).where(TimeSlot.id.in_(reactivated)).values(is_active=True))
+    if removed:
+        await session.execute(update(TimeSlot).where(TimeSlot.id.in_(removed)).values(is_active=False))
+    return SyncReport(len(new), len(reactivated), len(removed))
+
+
+async def sync_catalog(restaurant_id: int = DEFAULT_RESTAURANT_ID) -> None:
+    """
+    Brings the restaurant's tables and time slots in line with tables.json and slots.json.
+    Skipped when the sources haven't changed since the last sync, otherwise only the difference
+    is written, in one transaction. Removed rows are deactivated, the bookings keep referencing them.
+    """
+    started = timer.perf_counter()
+    source_hash, (tables_data, slots_data) = read_sources(settings.TABLES_JSON, settings.SLOTS_JSON)
     async with async_session_maker() as session:
-        await add_tables_to_db(session)
-        await add_time_slots_to_db(session)
-        await session.commit()
\ No newline at end of file
+        try:
+            await session.execute(select(func.pg_advisory_xact_lock(CATALOG_SYNC_LOCK, restaurant_id)))
+            synced_hash = await session.scalar(select(CatalogSource.source_hash)
+                                               .where(CatalogSource.restaurant_id == restaurant_id))
+            if synced_hash == source_hash:
+                logger.info(f"Catalog of restaurant {restaurant_id} is up to date, sync skipped "
+                            f"({timer.perf_counter() - started:.3f}s)")
+                return
+            tables = await sync_tables(session, restaurant_id, [TableBase(**table) for table in tables_data])
+            slots = await sync_time_slots(session, restaurant_id, [TimeSlotBase(**slot) for slot in slots_data])
+            await session.execute(pg_insert(CatalogSource)
+                                  .values(restaurant_id=restaurant_id, source_hash=source_hash)
+                                  .on_conflict_do_update(index_elements=[CatalogSource.restaurant_id],
+                                                         set_={"source_hash": source_hash,
+                                                               "updated_at": func.now()}))
+            await session.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Error syncing the catalog of restaurant {restaurant_id}: {e}")
+            await session.rollback()
+            raise
+    table_catalog.invalidate(restaurant_id)
+    availability_cache.invalidate(restaurant_id=restaurant_id)
+    logger.info(f"Catalog of restaurant {restaurant_id} synced in {timer.perf_counter() - started:.3f}s: "
+                f"tables {tables._asdict()}, time slots {slots._asdict()}")
+
+
+async def init_db():
+    await sync_catalog()
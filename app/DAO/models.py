@@ -1,7 +1,8 @@
-from datetime import datetime
-from sqlalchemy import BigInteger, String
-from sqlalchemy.dialects.postgresql import TIMESTAMP
+from datetime import datetime, time
+from sqlalchemy import BigInteger, Index, Time, Computed, text, func
+from sqlalchemy.dialects.postgresql import TIMESTAMP, TSRANGE, Range, ExcludeConstraint
 
+from app.config import DEFAULT_RESTAURANT_ID
 from app.DAO.database import Base
 from sqlalchemy import Integer, Date, ForeignKey
 from sqlalchemy.orm import relationship, Mapped, mapped_column
@@ -17,21 +18,52 @@ class User(Base):
     bookings: Mapped[list["Booking"]] = relationship("Booking", back_populates="user")
 
 
+class Restaurant(Base):
+    """A venue served by its own bot. Tables, time slots and bookings belong to one restaurant."""
+    __tablename__ = "restaurants"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str]
+
+
+# existing rows and the seeded data belong to the first restaurant
+RESTAURANT_ID_DEFAULT = text(str(DEFAULT_RESTAURANT_ID))
+
+
+class CatalogSource(Base):
+    """Hash of the tables.json and slots.json last synced into the restaurant's tables and time slots."""
+    __tablename__ = "catalog_sources"
+
+    restaurant_id: Mapped[int] = mapped_column(Integer, ForeignKey("restaurants.id"), primary_key=True)
+    source_hash: Mapped[str]
+
+
 class Table(Base):
     __tablename__ = "tables"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    restaurant_id: Mapped[int] = mapped_column(Integer, ForeignKey("restaurants.id"),
+                                               server_default=RESTAURANT_ID_DEFAULT)
     capacity: Mapped[int]
     description: Mapped[str | None]
+    # removed from the catalog source, kept for the bookings referencing it
+    is_active: Mapped[bool] = mapped_column(server_default=text("true"))
     bookings: Mapped[list["Booking"]] = relationship("Booking", back_populates="table")
 
+    __table_args__ = (
+        Index("ix_tables_restaurant_capacity", "restaurant_id", "capacity"),
+    )
+
 
 class TimeSlot(Base):
     __tablename__ = "time_slots"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    start_time: Mapped[str] = mapped_column(String(5), nullable=False)  # формат: HH:MM
-    end_time: Mapped[str] = mapped_column(String(5), nullable=False)  # формат: HH:MM
+    restaurant_id: Mapped[int] = mapped_column(Integer, ForeignKey("restaurants.id"),
+                                               server_default=RESTAURANT_ID_DEFAULT)
+    start_time: Mapped[time] = mapped_column(Time, nullable=False)
+    end_time: Mapped[time] = mapped_column(Time, nullable=False)  # 00:00 means the midnight of the next day
+    is_active: Mapped[bool] = mapped_column(server_default=text("true"))
 
     bookings: Mapped[list["Booking"]] = relationship(
         "Booking",
@@ -39,20 +71,152 @@ class TimeSlot(Base):
         cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        Index("ix_time_slots_restaurant_start", "restaurant_id", "start_time"),
+    )
+
     def __repr__(self) -> str:
-        return f"TimeSlot(id={self.id}, {self.start_time}-{self.end_time})"
+        return f"TimeSlot(id={self.id}, {self.start_time:%H:%M}-{self.end_time:%H:%M})"
+
+
+# Period covered by a booking. A slot ending at or before its start (e.g. 22:00-00:00) ends the next day
+BOOKING_PERIOD_SQL = (
+    "tsrange(date + start_time, date + end_time + "
+    "CASE WHEN end_time <= start_time THEN interval '1 day' ELSE interval '0' END)"
+)
 
 
 class Booking(Base):
     __tablename__ = "bookings"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # partitioned by month on `date`, so the partition key is a part of the primary key
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    restaurant_id: Mapped[int] = mapped_column(Integer, ForeignKey("restaurants.id"),
+                                               server_default=RESTAURANT_ID_DEFAULT)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
     table_id: Mapped[int] = mapped_column(Integer, ForeignKey("tables.id"))
     time_slot_id: Mapped[int] = mapped_column(Integer, ForeignKey("time_slots.id"))
-    date: Mapped[datetime] = mapped_column(Date)
+    date: Mapped[datetime] = mapped_column(Date, primary_key=True)
+    start_time: Mapped[time] = mapped_column(Time)
+    end_time: Mapped[time] = mapped_column(Time)
+    during: Mapped[Range[datetime]] = mapped_column(TSRANGE, Computed(BOOKING_PERIOD_SQL, persisted=True))
     status: Mapped[str]
 
     user: Mapped["User"] = relationship("User", back_populates="bookings")
     table: Mapped["Table"] = relationship("Table", back_populates="bookings")
-    time_slot: Mapped["TimeSlot"] = relationship("TimeSlot", back_populates="bookings")
\ No newline at end of file
+    time_slot: Mapped["TimeSlot"] = relationship("TimeSlot", back_populates="bookings")
+
+    __table_args__ = (
+        Index("ix_bookings_table_date_slot", "table_id", "date", "time_slot_id"),
+        Index("ix_bookings_restaurant_user_date", "restaurant_id", "user_id", "date"),
+        # one table can't have two overlapping active bookings
+        # (the partition key has to be a part of the constraint on a partitioned table)
+        ExcludeConstraint(("table_id", "="), ("date", "="), ("during", "&&"), name="ex_bookings_table_during",
+                          using="gist", where=text("status = 'booked'")),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
+
+
+class BookingConflict(Base):
+    """
+    A double booking canceled when the overlap constraint was added (migration 8d41e6c0b2f7).
+    Kept for the staff to contact the guest, `conflicting_booking_id` is the older booking of the table.
+    """
+    __tablename__ = "booking_conflicts"
+
+    booking_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    conflicting_booking_id: Mapped[int] = mapped_column(Integer)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    table_id: Mapped[int] = mapped_column(Integer)
+    date: Mapped[datetime] = mapped_column(Date)
+    start_time: Mapped[time] = mapped_column(Time)
+    end_time: Mapped[time] = mapped_column(Time)
+
+
+class BookingArchive(Base):
+    """Finished bookings moved out of `bookings` after the retention window."""
+    __tablename__ = "bookings_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    restaurant_id: Mapped[int] = mapped_column(Integer, ForeignKey("restaurants.id"),
+                                               server_default=RESTAURANT_ID_DEFAULT)
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
+    table_id: Mapped[int] = mapped_column(Integer, ForeignKey("tables.id"))
+    time_slot_id: Mapped[int] = mapped_column(Integer, ForeignKey("time_slots.id"))
+    date: Mapped[datetime] = mapped_column(Date)
+    start_time: Mapped[time] = mapped_column(Time)
+    end_time: Mapped[time] = mapped_column(Time)
+    status: Mapped[str]
+    archived_at: Mapped[datetime] = mapped_column(TIMESTAMP, server_default=func.now())
+
+    table: Mapped["Table"] = relationship("Table", viewonly=True)
+    time_slot: Mapped["TimeSlot"] = relationship("TimeSlot", viewonly=True)
+
+    __table_args__ = (
+        Index("ix_bookings_archive_restaurant_user_date", "restaurant_id", "user_id", "date"),
+    )
+
+
+class BookingStats(Base):
+    """
+    Number of bookings per day, table, time slot and status.
+    Maintained by a trigger on `bookings` and corrected by the periodic sweep.
+    """
+    __tablename__ = "booking_stats"
+
+    date: Mapped[datetime] = mapped_column(Date, primary_key=True)
+    table_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    time_slot_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    status: Mapped[str] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class ProcessedUpdate(Base):
+    """Telegram update ids already accepted by one of the bot instances (shared deduplication)."""
+    __tablename__ = "processed_updates"
+
+    # update ids are counted per bot
+    restaurant_id: Mapped[int] = mapped_column(Integer, primary_key=True, server_default=RESTAURANT_ID_DEFAULT)
+    update_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+
+    __table_args__ = (
+        Index("ix_processed_updates_created_at", "created_at"),
+    )
+
+
+class WaitlistEntry(Base):
+    """
+    A guest waiting for a taken slot: for a particular table, or for any table
+    with at least `capacity` seats when `table_id` is empty.
+    """
+    __tablename__ = "waitlist"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    restaurant_id: Mapped[int] = mapped_column(Integer, ForeignKey("restaurants.id"),
+                                               server_default=RESTAURANT_ID_DEFAULT)
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
+    table_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("tables.id"), nullable=True)
+    capacity: Mapped[int]
+    time_slot_id: Mapped[int] = mapped_column(Integer, ForeignKey("time_slots.id"))
+    date: Mapped[datetime] = mapped_column(Date)
+    status: Mapped[str] = mapped_column(default="waiting")  # waiting, promoted, canceled
+    booking_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    __table_args__ = (
+        # the promotion lookup: the oldest waiting guest for the freed date and slot
+        Index("ix_waitlist_waiting", "date", "time_slot_id", "created_at",
+              postgresql_where=text("status = 'waiting'")),
+        Index("uq_waitlist_user_slot", "user_id", "date", "time_slot_id", unique=True,
+              postgresql_where=text("status = 'waiting'")),
+    )
+
+
+class SlotHold(Base):
+    """Short lease on a table and slot taken while the guest confirms the booking (shared holds mode)."""
+    __tablename__ = "slot_holds"
+
+    table_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    date: Mapped[datetime] = mapped_column(Date, primary_key=True)
+    time_slot_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    expires_at: Mapped[datetime] = mapped_column(TIMESTAMP)
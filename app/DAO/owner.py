@@ -0,0 +1,64 @@
+import asyncio
+from typing import Awaitable, Callable
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.config import settings
+from app.DAO.database import engine
+
+OWNER_LOCK = 0x0e1ec7  # advisory lock key of the process running the deployment-wide work
+
+
+class OwnerLock:
+    """
+    Elects the one process of the deployment (uvicorn workers and instances alike) that creates the partitions,
+    syncs the catalog and runs the scheduler. The owner keeps a session-level advisory lock on a connection
+    of its own for its whole life: if it dies, the connection closes and another process takes over.
+    """
+
+    def __init__(self, key: int, retry_interval: float):
+        self._key = key
+        self._retry_interval = retry_interval
+        self._connection: AsyncConnection | None = None
+        self._task: asyncio.Task | None = None
+        self.owner = False
+
+    async def acquire(self) -> bool:
+        connection = None
+        try:
+            connection = await engine.connect()
+            acquired = await connection.scalar(select(func.pg_try_advisory_lock(self._key)))
+            # the lock outlives the transaction, the connection must not stay idle in one
+            await connection.commit()
+        except (SQLAlchemyError, OSError) as e:
+            logger.error(f"Error taking the owner lock: {e}")
+            acquired = False
+        if acquired:
+            self._connection, self.owner = connection, True
+            logger.info("This process is the owner: partitions, catalog sync and scheduler run here")
+        elif connection is not None:
+            await connection.close()
+        return self.owner
+
+    def watch(self, on_acquired: Callable[[], Awaitable[None]]) -> None:
+        """Retries to become the owner in the background, calls `on_acquired` once it does."""
+
+        async def retry():
+            while not await self.acquire():
+                await asyncio.sleep(self._retry_interval)
+            await on_acquired()
+
+        if not self.owner and self._task is None:
+            self._task = asyncio.create_task(retry())
+
+    async def release(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection, self.owner = None, False
+
+
+owner_lock = OwnerLock(OWNER_LOCK, settings.OWNER_RETRY_INTERVAL)
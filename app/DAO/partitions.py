@@ -0,0 +1,51 @@
+from datetime import date
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import settings
+from app.DAO.database import async_session_maker
+
+BOOKING_COLUMNS = ("id, restaurant_id, user_id, table_id, time_slot_id, date, start_time, end_time, status, "
+                   "created_at, updated_at")
+
+
+def month_start(day: date, shift: int = 0) -> date:
+    month_index = day.year * 12 + day.month - 1 + shift
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+async def ensure_booking_partitions(months_ahead: int = settings.PARTITION_MONTHS_AHEAD):
+    """
+    Creates the monthly partitions of `bookings` from the current month up to `months_ahead` months.
+    Rows that already landed in the default partition for such a month are moved into the new one.
+    """
+    today = date.today()
+    created = []
+    try:
+        async with async_session_maker() as session:
+            for shift in range(months_ahead + 1):
+                start, end = month_start(today, shift), month_start(today, shift + 1)
+                name = f"bookings_{start:%Y_%m}"
+                if await session.scalar(text("SELECT to_regclass(:name)"), {"name": name}):
+                    continue
+                # moving rows between partitions doesn't change the booking stats
+                await session.execute(text("SET LOCAL app.booking_stats_skip = 'on'"))
+                await session.execute(text(f"CREATE TABLE {name} (LIKE bookings INCLUDING DEFAULTS INCLUDING GENERATED)"))
+                await session.execute(
+                    text(f"WITH moved AS (DELETE FROM bookings_default WHERE date >= :start AND date < :end "
+                         f"RETURNING {BOOKING_COLUMNS}) "
+                         f"INSERT INTO {name} ({BOOKING_COLUMNS}) SELECT {BOOKING_COLUMNS} FROM moved"),
+                    {"start": start, "end": end}
+                )
+                await session.execute(
+                    text(f"ALTER TABLE bookings ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+                )
+                created.append(name)
+            await session.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Error creating booking partitions: {e}")
+        return
+    if created:
+        logger.info(f"Booking partitions created: {', '.join(created)}")
+    else:
+        logger.info("Booking partitions are up to date")
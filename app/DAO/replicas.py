@@ -0,0 +1,124 @@
+import asyncio
+import itertools
+import time
+from typing import Dict, List
+from loguru import logger
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.DAO.database import async_session_maker
+
+# Replication delay of a standby. A replica that replayed everything it received is not lagging,
+# even if the last replayed transaction is old
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine: AsyncEngine = create_async_engine(url=url)
+        self.session_maker = async_sessionmaker(self.engine, class_=AsyncSession)
+        self.healthy = False
+        self.lag = 0.0
+
+    @property
+    def load(self) -> int:
+        return self.engine.pool.checkedout()
+
+
+class ReplicaRouter:
+    """
+    Picks the session maker for read-only sessions: a healthy replica with a small enough lag,
+    or the primary. Users who have just written are kept on the primary (read-your-writes).
+    """
+
+    def __init__(self, urls: List[str], max_lag: float, sticky_seconds: float, strategy: str):
+        self._replicas = [Replica(url) for url in urls]
+        self._max_lag = max_lag
+        self._sticky_seconds = sticky_seconds
+        self._strategy = strategy
+        self._round_robin = itertools.count()
+        self._sticky: Dict[int, float] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._replicas)
+
+    def mark_write(self, user_id: int) -> None:
+        now = time.monotonic()
+        if len(self._sticky) > 10_000:
+            self._sticky = {uid: until for uid, until in self._sticky.items() if until > now}
+        self._sticky[user_id] = now + self._sticky_seconds
+
+    def _is_sticky(self, user_id: int | None) -> bool:
+        until = self._sticky.get(user_id) if user_id is not None else None
+        if until is None:
+            return False
+        if until < time.monotonic():
+            self._sticky.pop(user_id, None)
+            return False
+        return True
+
+    def session_maker_for(self, user_id: int | None = None) -> async_sessionmaker:
+        if not self._replicas or self._is_sticky(user_id):
+            return async_session_maker
+        candidates = [r for r in self._replicas if r.healthy and r.lag <= self._max_lag]
+        if not candidates:
+            return async_session_maker
+        if self._strategy == "least_loaded":
+            lowest = min(r.load for r in candidates)
+            candidates = [r for r in candidates if r.load == lowest]
+        return candidates[next(self._round_robin) % len(candidates)].session_maker
+
+    async def check(self) -> None:
+        for replica in self._replicas:
+            try:
+                async with replica.engine.connect() as connection:
+                    replica.lag = float(await connection.scalar(LAG_QUERY))
+                replica.healthy = True
+            except (SQLAlchemyError, OSError) as e:
+                if replica.healthy:
+                    logger.error(f"Replica {replica.engine.url.host} is unavailable: {e}")
+                replica.healthy = False
+
+    async def _monitor(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(settings.REPLICA_CHECK_INTERVAL)
+
+    def start(self) -> None:
+        if self._replicas and self._task is None:
+            self._task = asyncio.create_task(self._monitor())
+            logger.info(f"Read replicas routing is enabled: {len(self._replicas)} replicas")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for replica in self._replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> List[dict]:
+        return [{"host": r.engine.url.host, "healthy": r.healthy, "lag": r.lag, "load": r.load}
+                for r in self._replicas]
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush_writes(session: Session, flush_context) -> None:
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement_writes(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+replica_router = ReplicaRouter(settings.DB_REPLICA_URLS, settings.REPLICA_MAX_LAG,
+                               settings.REPLICA_STICKY_SECONDS, settings.REPLICA_STRATEGY)
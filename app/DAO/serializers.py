@@ -0,0 +1,105 @@
+import json
+import uuid
+from datetime import datetime, time
+from decimal import Decimal
+from operator import attrgetter
+from typing import Any, Callable, Dict, Sequence, Tuple, Type
+from loguru import logger
+from sqlalchemy import inspect
+
+Serializer = Callable[[Any, bool], Dict[str, Any]]
+
+
+def _isoformat(value):
+    return None if value is None else value.isoformat()
+
+
+def _hhmm(value):
+    return None if value is None else value.strftime("%H:%M")
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def _str(value):
+    return None if value is None else str(value)
+
+
+def _convert(value):
+    """Fallback for the columns whose python type is unknown, checks the value itself."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, time):
+        return value.strftime("%H:%M")
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+CONVERTERS = {datetime: _isoformat, time: _hhmm, Decimal: _float, uuid.UUID: _str}
+
+
+def _converter_for(column) -> Callable | None:
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return _convert
+    for type_, converter in CONVERTERS.items():
+        if issubclass(python_type, type_):
+            return converter
+    # date, int, str and other values are returned as they are
+    return None
+
+
+def compile_serializer(cls: Type, keys: Sequence[str] | None = None) -> Serializer:
+    """
+    Builds a function converting instances of the mapped class (or rows with the same attributes)
+    into dicts of all its columns, or of `keys` in that order.
+    The columns and their converters are resolved once, the function only reads attributes.
+    """
+    columns = inspect(cls).columns
+    names = tuple(keys) if keys is not None else tuple(column.key for column in columns)
+    converters = tuple((index, converter) for index, name in enumerate(names)
+                       if (converter := _converter_for(columns[name])) is not None)
+    read = attrgetter(*names)
+    single = len(names) == 1
+
+    def serialize(obj, exclude_none: bool = False) -> Dict[str, Any]:
+        values = read(obj)
+        if single:
+            values = (values,)
+        if converters:
+            values = list(values)
+            for index, converter in converters:
+                values[index] = converter(values[index])
+        result = dict(zip(names, values))
+        if exclude_none:
+            return {key: value for key, value in result.items() if value is not None}
+        return result
+
+    return serialize
+
+
+_serializers: Dict[Tuple[Type, Tuple[str, ...] | None], Serializer] = {}
+
+
+def serializer_for(cls: Type, keys: Sequence[str] | None = None) -> Serializer:
+    cache_key = (cls, tuple(keys) if keys is not None else None)
+    serializer = _serializers.get(cache_key)
+    if serializer is None:
+        serializer = _serializers[cache_key] = compile_serializer(cls, keys)
+    return serializer
+
+
+def to_json_bytes(obj, exclude_none: bool = False, model: Type | None = None,
+                  keys: Sequence[str] | None = None) -> bytes:
+    """
+    Serializes a model instance straight to JSON bytes. A row selected from a model's columns
+    is serialized with the serializer of that `model`.
+    """
+    data = serializer_for(model or type(obj), keys)(obj, exclude_none)
+    return json.dumps(data, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+
@@ -0,0 +1,78 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from pydantic import BaseModel
+
+
+def freeze(value: Any) -> Hashable:
+    """Turns the call arguments into a hashable key part (filters models, lists, dicts)."""
+    if isinstance(value, BaseModel):
+        return type(value).__name__, freeze(value.model_dump(exclude_unset=True))
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent DAO reads: while a query is in flight, the same call
+    (same method, arguments and database) waits for its result instead of running another query.
+    Nothing is cached, the result is shared only with the calls that arrived during the flight,
+    possibly from other sessions: the opted-in methods return immutable rows, never ORM instances.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights: Dict[Tuple, asyncio.Future] = {}
+        self._calls: Dict[str, int] = {}
+        self._coalesced: Dict[str, int] = {}
+
+    def coalesce(self, method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Opts a DAO read method in. The DAO's session bind is a part of the key, replicas don't mix."""
+        name = method.__qualname__
+
+        @functools.wraps(method)
+        async def wrapper(dao, *args, **kwargs):
+            if not self.enabled:
+                return await method(dao, *args, **kwargs)
+            key = (name, dao._session.bind, freeze(args), freeze(kwargs))
+            self._calls[name] = self._calls.get(name, 0) + 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._coalesced[name] = self._coalesced.get(name, 0) + 1
+                try:
+                    return await asyncio.shield(flight)
+                except asyncio.CancelledError:
+                    if not flight.cancelled() or asyncio.current_task().cancelling():
+                        raise
+                    # the leader was cancelled, not this call: run the query on our own
+                    return await method(dao, *args, **kwargs)
+            flight = self._flights[key] = asyncio.get_running_loop().create_future()
+            try:
+                result = await method(dao, *args, **kwargs)
+            except asyncio.CancelledError:
+                flight.cancel()
+                raise
+            except Exception as e:
+                flight.set_exception(e)
+                # retrieved here, so that a flight without followers doesn't log "never retrieved"
+                flight.exception()
+                raise
+            else:
+                flight.set_result(result)
+                return result
+            finally:
+                del self._flights[key]
+
+        return wrapper
+
+    def stats(self) -> Dict[str, Any]:
+        calls = sum(self._calls.values())
+        coalesced = sum(self._coalesced.values())
+        return {"enabled": self.enabled, "in_flight": len(self._flights), "calls": calls, "coalesced": coalesced,
+                "coalescing_ratio": coalesced / calls if calls else 0.0,
+                "methods": {name: {"calls": count, "coalesced": self._coalesced.get(name, 0)}
+                            for name, count in self._calls.items()}}
+
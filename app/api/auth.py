@@ -0,0 +1,11 @@
+import secrets
+from fastapi import Header, HTTPException, status
+from app.config import settings
+
+
+async def verify_admin_token(x_admin_token: str | None = Header(default=None)) -> None:
+    """Admin-only API endpoints require the X-Admin-Token header equal to ADMIN_API_TOKEN."""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin API is disabled")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token")
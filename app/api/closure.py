@@ -0,0 +1,42 @@
+from datetime import date
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, model_validator
+from app.api.auth import verify_admin_token
+from app.bot.closure import closure_jobs, run_closure
+from app.bot.create_bot import bots
+from app.config import DEFAULT_RESTAURANT_ID
+
+router = APIRouter(prefix="/closures", dependencies=[Depends(verify_admin_token)])
+
+
+class SClosure(BaseModel):
+    restaurant_id: int = DEFAULT_RESTAURANT_ID
+    date_from: date
+    date_to: date
+    table_ids: List[int] | None = None
+
+    @model_validator(mode="after")
+    def check_period(self):
+        if self.date_to < self.date_from:
+            raise ValueError("date_to is before date_from")
+        return self
+
+
+@router.post("")
+async def create_closure(closure: SClosure) -> dict:
+    """Cancels the active bookings of the period (and tables). The guests are notified in the background."""
+    bot = bots.get(closure.restaurant_id)
+    if bot is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    job = await run_closure(bot, closure.restaurant_id, closure.date_from, closure.date_to, closure.table_ids)
+    return job.to_dict()
+
+
+@router.get("/{job_id}")
+async def closure_progress(job_id: int) -> dict:
+    """Progress of notifying the guests of a closure."""
+    job = closure_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Closure not found")
+    return job.to_dict()
@@ -0,0 +1,98 @@
+import asyncio
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+from app.api.auth import verify_admin_token
+from app.bot.create_bot import dp
+from app.config import settings
+from app.profiling import profiler, memory_snapshots, dump_tasks
+
+# Profiles the process serving the request: with DISPATCH_WORKERS the updates are handled in the workers
+router = APIRouter(prefix="/debug", dependencies=[Depends(verify_admin_token)])
+
+
+@router.post("/profile/start")
+async def start_profile(kind: Literal["sampling", "cprofile"] = "sampling",
+                        seconds: float = Query(30, gt=0, le=settings.PROFILE_MAX_SECONDS),
+                        updates: int | None = Query(None, gt=0),
+                        interval: float = Query(0.005, ge=0.001, le=1)) -> dict:
+    """Profiles the event loop for `seconds`, or until `updates` updates are handled if that comes first."""
+    try:
+        profiler.start(kind, seconds, dp, updates, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.stats()
+
+
+@router.post("/profile/stop")
+async def stop_profile() -> dict:
+    profiler.stop()
+    return profiler.stats()
+
+
+@router.get("/profile")
+async def profile_status() -> dict:
+    return profiler.stats()
+
+
+@router.get("/profile/result")
+async def profile_result(output: Literal["text", "pstats"] = "text",
+                         sort: Literal["cumulative", "tottime", "ncalls"] = "cumulative",
+                         limit: int = Query(100, gt=0)) -> Response:
+    """
+    The report of the last finished profile: pstats text or folded stacks for a sampling profile,
+    or the raw pstats file of a cProfile one.
+    """
+    if not profiler.has_result:
+        raise HTTPException(status_code=404, detail="No finished profile")
+    if output == "pstats":
+        if profiler.kind != "cprofile":
+            raise HTTPException(status_code=400, detail="Only a cProfile profile has a pstats file")
+        return Response(profiler.dump(), media_type="application/octet-stream",
+                        headers={"Content-Disposition": 'attachment; filename="profile.pstats"'})
+    return PlainTextResponse(await asyncio.to_thread(profiler.text, sort, limit))
+
+
+@router.post("/memory/start")
+async def start_tracemalloc(frames: int = Query(10, ge=1, le=100)) -> dict:
+    """Starts tracing the allocations. The process is slower and bigger until /memory/stop."""
+    memory_snapshots.start(frames)
+    return {"snapshots": memory_snapshots.list()}
+
+
+@router.post("/memory/stop")
+async def stop_tracemalloc() -> dict:
+    memory_snapshots.stop()
+    return {"snapshots": []}
+
+
+@router.post("/memory/snapshots")
+async def take_snapshot() -> dict:
+    try:
+        return await asyncio.to_thread(memory_snapshots.take)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/memory/snapshots/{snapshot_id}")
+async def snapshot_top(snapshot_id: int, group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+                       limit: int = Query(30, gt=0)) -> list[str]:
+    if snapshot_id not in memory_snapshots.list():
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return await asyncio.to_thread(memory_snapshots.top, snapshot_id, group_by, limit)
+
+
+@router.get("/memory/diff")
+async def snapshot_diff(base: int, other: int, group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+                        limit: int = Query(30, gt=0)) -> list[str]:
+    """What grew between two snapshots, e.g. dialog state or caches kept across many updates."""
+    snapshots = memory_snapshots.list()
+    if base not in snapshots or other not in snapshots:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return await asyncio.to_thread(memory_snapshots.diff, base, other, group_by, limit)
+
+
+@router.get("/tasks")
+async def tasks(limit: int = Query(20, gt=0)) -> list[dict]:
+    """Stacks of all asyncio tasks, to see where the loop is stuck."""
+    return dump_tasks(limit)
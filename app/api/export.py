@@ -0,0 +1,76 @@
+import csv
+import io
+from datetime import date
+from operator import attrgetter
+from typing import AsyncIterator, List, Literal
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from app.api.auth import verify_admin_token
+from app.DAO.dao import BookingDAO
+from app.DAO.models import Booking
+from app.DAO.serializers import to_json_bytes
+from app.DAO.replicas import replica_router
+
+EXPORT_COLUMNS = ["id", "restaurant_id", "user_id", "table_id", "time_slot_id", "date", "start_time", "end_time", "status",
+                  "created_at"]
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+CHUNK_SIZE = 64 * 1024
+
+router = APIRouter(prefix="/export", dependencies=[Depends(verify_admin_token)])
+
+
+async def encode_rows(rows: AsyncIterator, export_format: str) -> AsyncIterator[bytes]:
+    """Encodes the rows one by one, yielding chunks of about CHUNK_SIZE bytes."""
+    if export_format == "csv":
+        async for chunk in _encode_csv(rows):
+            yield chunk
+        return
+    chunk = bytearray()
+    async for row in rows:
+        # the same serializer as Booking.to_dict, the rows have the attributes of a booking
+        chunk += to_json_bytes(row, model=Booking, keys=EXPORT_COLUMNS)
+        chunk += b"\n"
+        if len(chunk) >= CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+async def _encode_csv(rows: AsyncIterator) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    read = attrgetter(*EXPORT_COLUMNS)
+    async for row in rows:
+        writer.writerow(read(row))
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def export_bookings(export_format: str, date_from: date | None = None, date_to: date | None = None,
+                          statuses: List[str] | None = None,
+                          restaurant_id: int | None = None) -> AsyncIterator[bytes]:
+    """Streams encoded bookings. The session lives exactly as long as the stream."""
+    async with replica_router.session_maker_for()() as session:
+        rows = BookingDAO(session).stream_bookings(date_from, date_to, statuses, restaurant_id)
+        async for chunk in encode_rows(rows, export_format):
+            yield chunk
+
+
+@router.get("/bookings")
+async def export_bookings_endpoint(
+        export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+        date_from: date | None = None,
+        date_to: date | None = None,
+        status: List[str] | None = Query(None),
+        restaurant_id: int | None = None,
+) -> StreamingResponse:
+    filename = f"bookings.{export_format}"
+    return StreamingResponse(export_bookings(export_format, date_from, date_to, status, restaurant_id),
+                             media_type=MEDIA_TYPES[export_format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
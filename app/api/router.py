@@ -1,9 +1,9 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from faststream.rabbit.fastapi import RabbitRouter
 from loguru import logger
-from app.bot.create_bot import bot
-from app.config import settings, scheduler
-from app.DAO.dao import BookingDAO
+from app.bot.create_bot import bots
+from app.config import settings, get_scheduler, DEFAULT_RESTAURANT_ID
+from app.DAO.dao import BookingDAO, BookingStatsDAO
 from app.DAO.database import async_session_maker
 
 
@@ -12,20 +12,28 @@ router = RabbitRouter(url=settings.rabbitmq_url)
 async def disable_booking():
     async with async_session_maker() as session:
         await BookingDAO(session).complete_past_bookings()
+        await BookingStatsDAO(session).refresh(since=date.today() - timedelta(days=settings.STATS_REFRESH_DAYS))
+
+
+async def archive_bookings():
+    async with async_session_maker() as session:
+        before = date.today() - timedelta(days=settings.ARCHIVE_RETENTION_DAYS)
+        await BookingDAO(session).archive_finished_bookings(before)
 
 
 @router.subscriber("admin_msg")
-async def send_booking_msg(msg: str):
+async def send_booking_msg(msg: str, restaurant_id: int = DEFAULT_RESTAURANT_ID):
+    """Forwards the event to the admins with the bot of the restaurant it happened in."""
     for admin in settings.ADMIN_IDS:
-        await bot.send_message(admin, text=msg)
+        await bots[restaurant_id].send_message(admin, text=msg)
 
 
-async def send_user_msg(user_id: int, text: str):
-    await bot.send_message(user_id, text=text)
+async def send_user_msg(user_id: int, text: str, restaurant_id: int = DEFAULT_RESTAURANT_ID):
+    await bots[restaurant_id].send_message(user_id, text=text)
 
 @router.subscriber("noti_user")
-async def schedule_user_notifications(user_id: int):
-    """Schedule sending a series of user's messages at different time intervals."""
+async def schedule_user_notifications(user_id: int, restaurant_id: int = DEFAULT_RESTAURANT_ID):
+    """Schedule sending a series of user's messages at different time intervals by the restaurant's bot."""
     now = datetime.now()
 
     notifications = [
@@ -48,13 +56,14 @@ async def schedule_user_notifications(user_id: int):
         },
     ]
 
+    scheduler = get_scheduler()
     for i, notification in enumerate(notifications):
-        job_id = f"user_notification_{user_id}_{i}"
+        job_id = f"user_notification_{restaurant_id}_{user_id}_{i}"
         scheduler.add_job(
             send_user_msg,
             "date",
             run_date=notification["time"],
-            args=[user_id, notification["text"]],
+            args=[user_id, notification["text"], restaurant_id],
             id=job_id,
             replace_existing=True,
         )
@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+from fastapi import FastAPI, Request
+from loguru import logger
+
+from app.bot.replay import percentiles
+from app.bot.updates import peek_update_id, peek_update_type
+
+# The HTTP stack under test, with the cheap part of the webhook path and no database or Bot API behind it
+bench_app = FastAPI()
+
+
+@bench_app.post("/webhook")
+async def webhook(request: Request) -> None:
+    raw = await request.body()
+    peek_update_id(raw)
+    peek_update_type(raw)
+
+
+UPDATE = json.dumps({
+    "update_id": 1,
+    "message": {"message_id": 1, "date": 0, "text": "/start",
+                "from": {"id": 1, "is_bot": False, "first_name": "Guest"},
+                "chat": {"id": 1, "type": "private", "first_name": "Guest"}},
+}).encode()
+
+MODES = {
+    # what `python -m app.main` and docker-compose used to run
+    "reload": ["--reload", "--loop", "asyncio", "--http", "h11"],
+    # what `python -m app.serve` runs
+    "serve": ["--loop", "uvloop", "--http", "httptools", "--no-access-log"],
+}
+
+
+def _wait_for_port(port: int, timeout: float = 20) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"The server didn't start listening on {port}")
+
+
+async def load(port: int, connections: int, duration: float) -> list:
+    """Every connection posts the update in a loop for `duration` seconds. Returns the latencies."""
+    latencies = []
+    url = f"http://127.0.0.1:{port}/webhook"
+    deadline = time.perf_counter() + duration
+    connector = aiohttp.TCPConnector(limit=connections)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def client():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                async with session.post(url, data=UPDATE, headers={"Content-Type": "application/json"}) as response:
+                    await response.read()
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(client() for _ in range(connections)))
+    return latencies
+
+
+def run(mode: str, port: int, workers: int, connections: int, duration: float) -> None:
+    command = [sys.executable, "-m", "uvicorn", "app.bench_server:bench_app", "--port", str(port), *MODES[mode]]
+    if mode == "serve":
+        command += ["--workers", str(workers), "--backlog", "2048", "--timeout-keep-alive", "30"]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ.copy())
+    try:
+        _wait_for_port(port)
+        asyncio.run(load(port, connections, 1))  # warm up
+        latencies = asyncio.run(load(port, connections, duration))
+    finally:
+        server.terminate()
+        server.wait()
+    stats = percentiles(latencies)
+    logger.info(f"{mode:>6}: {len(latencies) / duration:8.0f} requests/s, " +
+                ", ".join(f"{name} {value:.1f} ms" for name, value in stats.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Requests/sec of the old launch mode against app.serve")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="workers of the serve mode, more need the shared state settings of app.serve")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per mode")
+    args = parser.parse_args()
+    for name in MODES:
+        run(name, args.port, args.workers, args.connections, args.duration)
@@ -1,6 +1,8 @@
+from functools import lru_cache
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+@lru_cache(maxsize=None)  # static markup, built once
 def main_admin_kb() -> InlineKeyboardMarkup:
     """
     Creates a keyboard for the main menu of the admin panel.
@@ -8,10 +10,16 @@ def main_admin_kb() -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     kb.add(InlineKeyboardButton(text="📊 Статистика по пользователям", callback_data="admin_users_stats"))
     kb.add(InlineKeyboardButton(text="📈 Статистика по броням", callback_data="admin_bookings_stats"))
+    kb.add(InlineKeyboardButton(text="📅 Брони по дням", callback_data="admin_stats_daily"))
+    kb.add(InlineKeyboardButton(text="🪑 Загрузка столиков", callback_data="admin_stats_tables"))
+    kb.add(InlineKeyboardButton(text="🚫 Отмены по дням недели", callback_data="admin_stats_weekdays"))
+    kb.add(InlineKeyboardButton(text="📤 Выгрузка броней", callback_data="admin_export"))
+    kb.add(InlineKeyboardButton(text="⛔ Закрыть даты / столики", callback_data="admin_closure"))
     kb.add(InlineKeyboardButton(text="🏠 На главную", callback_data="back_home"))
     kb.adjust(1)  # Располагаем кнопки в один столбец
     return kb.as_markup()
 
+@lru_cache(maxsize=None)  # static markup, built once
 def admin_back_kb() -> InlineKeyboardMarkup:
     """
     Сreates a keyboard to return to the admin panel.
@@ -22,3 +30,25 @@ def admin_back_kb() -> InlineKeyboardMarkup:
     kb.adjust(1)
     return kb.as_markup()
 
+@lru_cache(maxsize=None)  # static markup, built once
+def admin_export_kb() -> InlineKeyboardMarkup:
+    """
+    Creates a keyboard for choosing the format of the bookings export.
+    """
+    kb = InlineKeyboardBuilder()
+    kb.add(InlineKeyboardButton(text="📄 CSV", callback_data="admin_export_csv"))
+    kb.add(InlineKeyboardButton(text="🧾 NDJSON", callback_data="admin_export_ndjson"))
+    kb.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_panel"))
+    kb.adjust(2, 1)
+    return kb.as_markup()
+
+@lru_cache(maxsize=None)  # static markup, built once
+def admin_closure_kb() -> InlineKeyboardMarkup:
+    """
+    Creates a keyboard for confirming the closure.
+    """
+    kb = InlineKeyboardBuilder()
+    kb.add(InlineKeyboardButton(text="⛔ Отменить брони", callback_data="admin_closure_confirm"))
+    kb.add(InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_panel"))
+    kb.adjust(1)
+    return kb.as_markup()
@@ -1,14 +1,39 @@
+from datetime import date, timedelta
+from typing import AsyncIterator
 from aiogram import Router, F
-from aiogram.types import CallbackQuery
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, InputFile, Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.bot.admin.kbs import main_admin_kb, admin_back_kb
-from app.config import settings
-from app.DAO.dao import UserDAO, BookingDAO
+from app.api.export import export_bookings
+from app.bot.admin.kbs import main_admin_kb, admin_back_kb, admin_export_kb, admin_closure_kb
+from app.bot.closure import ClosureJob, run_closure
+from app.config import settings, admin_ids
+from app.DAO.dao import UserDAO, BookingDAO, BookingStatsDAO
 
 router = Router()
 
-@router.callback_query(F.data == "admin_panel", F.from_user.id.in_(settings.ADMIN_IDS))
+WEEKDAYS = {1: "Пн", 2: "Вт", 3: "Ср", 4: "Чт", 5: "Пт", 6: "Сб", 7: "Вс"}
+
+
+class StreamingInputFile(InputFile):
+    """Document uploaded to Telegram chunk by chunk while it is being generated."""
+
+    def __init__(self, chunks: AsyncIterator[bytes], filename: str):
+        super().__init__(filename=filename)
+        self._chunks = chunks
+
+    async def read(self, bot) -> AsyncIterator[bytes]:
+        async for chunk in self._chunks:
+            yield chunk
+
+
+def stats_period() -> tuple[date, date]:
+    until = date.today()
+    return until - timedelta(days=settings.STATS_DAYS - 1), until
+
+@router.callback_query(F.data == "admin_panel", F.from_user.id.in_(admin_ids))
 async def admin_start(call: CallbackQuery):
     """
     Handler to log into the admin panel. Only admins are allowed.
@@ -16,7 +41,7 @@ async def admin_start(call: CallbackQuery):
     await call.answer("Доступ в админ-панель разрешен!")
     await call.message.edit_text("Выберите действие:", reply_markup=main_admin_kb())
 
-@router.callback_query(F.data == "admin_users_stats", F.from_user.id.in_(settings.ADMIN_IDS))
+@router.callback_query(F.data == "admin_users_stats", F.from_user.id.in_(admin_ids))
 async def admin_users_stats(call: CallbackQuery, session_without_commit: AsyncSession):
     """
     Handler for collecting user statistics.
@@ -27,14 +52,14 @@ async def admin_users_stats(call: CallbackQuery, session_without_commit: AsyncSe
     await call.message.edit_text(f'Всего в базе данных {users_stats} пользователей.', reply_markup=admin_back_kb())
 
 
-@router.callback_query(F.data == "admin_bookings_stats", F.from_user.id.in_(settings.ADMIN_IDS))
-async def admin_bookings_stats(call: CallbackQuery, session_without_commit: AsyncSession):
+@router.callback_query(F.data == "admin_bookings_stats", F.from_user.id.in_(admin_ids))
+async def admin_bookings_stats(call: CallbackQuery, session_without_commit: AsyncSession, restaurant_id: int):
     """
     Handler for collecting booking statistics.
     Gets data about bookings, including the total number of completed, booked and cancelled.
     """
     await call.answer("Загружаю статистику...")
-    bookings_stats = await BookingDAO(session_without_commit).entries_count()
+    bookings_stats = await BookingDAO(session_without_commit).entries_count(restaurant_id)
     booked_count = bookings_stats.get("booked", 0)  # Количество активных бронирований
     completed_count = bookings_stats.get("completed", 0)  # Количество завершенных бронирований
     canceled_count = bookings_stats.get("canceled", 0)  # Количество отмененных бронирований
@@ -48,4 +73,161 @@ async def admin_bookings_stats(call: CallbackQuery, session_without_commit: Asyn
         f"🚫 <i>Отменено:</i> <b>{canceled_count}</b>"
     )
 
-    await call.message.edit_text(message, reply_markup=admin_back_kb())
\ No newline at end of file
+    await call.message.edit_text(message, reply_markup=admin_back_kb())
+
+
+@router.callback_query(F.data == "admin_stats_daily", F.from_user.id.in_(admin_ids))
+async def admin_stats_daily(call: CallbackQuery, session_without_commit: AsyncSession, restaurant_id: int):
+    """
+    Handler for the number of bookings per day for the last days.
+    Reads only the booking stats rollup.
+    """
+    await call.answer("Загружаю статистику по дням...")
+    since, until = stats_period()
+    daily = await BookingStatsDAO(session_without_commit).daily_counts(restaurant_id, since, until)
+    lines = [f"<b>📅 Брони за {settings.STATS_DAYS} дн.</b> (✅ / ☑️ / 🚫)\n"]
+    for day, counts in daily.items():
+        lines.append(f"{day:%d.%m}: {counts.get('booked', 0)} / {counts.get('completed', 0)} / "
+                     f"{counts.get('canceled', 0)}")
+    if not daily:
+        lines.append("Броней за период нет.")
+    await call.message.edit_text("\n".join(lines), reply_markup=admin_back_kb())
+
+
+@router.callback_query(F.data == "admin_stats_tables", F.from_user.id.in_(admin_ids))
+async def admin_stats_tables(call: CallbackQuery, session_without_commit: AsyncSession, restaurant_id: int):
+    """
+    Handler for the utilization of the tables for the last days.
+    Reads only the booking stats rollup.
+    """
+    await call.answer("Загружаю загрузку столиков...")
+    since, until = stats_period()
+    utilization = await BookingStatsDAO(session_without_commit).table_utilization(restaurant_id, since, until)
+    lines = [f"<b>🪑 Загрузка столиков за {settings.STATS_DAYS} дн.:</b>\n"]
+    lines += [f"Стол №{table_id}: <b>{share:.0%}</b>" for table_id, share in utilization.items()]
+    await call.message.edit_text("\n".join(lines), reply_markup=admin_back_kb())
+
+
+@router.callback_query(F.data == "admin_stats_weekdays", F.from_user.id.in_(admin_ids))
+async def admin_stats_weekdays(call: CallbackQuery, session_without_commit: AsyncSession, restaurant_id: int):
+    """
+    Handler for the cancellation rate by weekday for the last days.
+    Reads only the booking stats rollup.
+    """
+    await call.answer("Загружаю статистику отмен...")
+    since, until = stats_period()
+    rates = await BookingStatsDAO(session_without_commit).cancellation_by_weekday(restaurant_id, since, until)
+    lines = [f"<b>🚫 Доля отмен по дням недели за {settings.STATS_DAYS} дн.:</b>\n"]
+    lines += [f"{WEEKDAYS[day]}: <b>{rates[day]:.0%}</b>" for day in sorted(rates)]
+    if not rates:
+        lines.append("Броней за период нет.")
+    await call.message.edit_text("\n".join(lines), reply_markup=admin_back_kb())
+
+
+@router.callback_query(F.data == "admin_export", F.from_user.id.in_(admin_ids))
+async def admin_export(call: CallbackQuery):
+    """
+    Handler for the bookings export menu.
+    """
+    await call.answer()
+    text = (f"<b>📤 Выгрузка броней за {settings.STATS_DAYS} дн.</b>\n\n"
+            "Другой период и статусы: <code>/export 2025-01-01 2025-01-31 booked,canceled csv</code>")
+    await call.message.edit_text(text, reply_markup=admin_export_kb())
+
+
+async def send_export(message: Message, export_format: str, date_from: date | None, date_to: date | None,
+                      statuses: list[str] | None, restaurant_id: int):
+    chunks = export_bookings(export_format, date_from, date_to, statuses, restaurant_id)
+    await message.answer_document(StreamingInputFile(chunks, filename=f"bookings.{export_format}"),
+                                  caption=f"Брони {date_from or '…'} — {date_to or '…'}")
+
+
+@router.callback_query(F.data.in_({"admin_export_csv", "admin_export_ndjson"}), F.from_user.id.in_(admin_ids))
+async def admin_export_file(call: CallbackQuery, restaurant_id: int):
+    """
+    Handler for exporting the bookings of the last days as a document.
+    """
+    await call.answer("Готовлю выгрузку...")
+    since, until = stats_period()
+    await send_export(call.message, call.data.split("_")[-1], since, until, None, restaurant_id)
+
+
+@router.message(Command("export"), F.from_user.id.in_(admin_ids))
+async def admin_export_command(message: Message, command: CommandObject, restaurant_id: int):
+    """
+    Handler for /export [date_from] [date_to] [status,status] [csv|ndjson].
+    """
+    args = command.args.split() if command.args else []
+    export_format = args.pop() if args and args[-1] in ("csv", "ndjson") else "csv"
+    try:
+        date_from = date.fromisoformat(args[0]) if len(args) > 0 else None
+        date_to = date.fromisoformat(args[1]) if len(args) > 1 else None
+    except ValueError:
+        await message.answer("Даты указываются в формате ГГГГ-ММ-ДД")
+        return
+    statuses = args[2].split(",") if len(args) > 2 else None
+    await send_export(message, export_format, date_from, date_to, statuses, restaurant_id)
+
+
+@router.callback_query(F.data == "admin_closure", F.from_user.id.in_(admin_ids))
+async def admin_closure(call: CallbackQuery):
+    """
+    Handler for the closure menu.
+    """
+    await call.answer()
+    text = ("<b>⛔ Закрытие дат и столиков</b>\n\n"
+            "Все активные брони периода будут отменены, гости получат уведомление.\n\n"
+            "Весь ресторан: <code>/close 2025-01-01 2025-01-02</code>\n"
+            "Отдельные столики: <code>/close 2025-01-01 2025-01-01 3,5</code>")
+    await call.message.edit_text(text, reply_markup=admin_back_kb())
+
+
+@router.message(Command("close"), F.from_user.id.in_(admin_ids))
+async def admin_close_command(message: Message, command: CommandObject, state: FSMContext,
+                              session_without_commit: AsyncSession, restaurant_id: int):
+    """
+    Handler for /close date_from [date_to] [table,table]. Shows what would be canceled and asks to confirm.
+    """
+    args = command.args.split() if command.args else []
+    try:
+        date_from = date.fromisoformat(args[0])
+        date_to = date.fromisoformat(args[1]) if len(args) > 1 else date_from
+        table_ids = [int(table_id) for table_id in args[2].split(",")] if len(args) > 2 else None
+    except (IndexError, ValueError):
+        await message.answer("Формат: <code>/close ГГГГ-ММ-ДД [ГГГГ-ММ-ДД] [1,2,3]</code>")
+        return
+    count = await BookingDAO(session_without_commit).count_closure(restaurant_id, date_from, date_to, table_ids)
+    await state.update_data(closure={"date_from": date_from.isoformat(), "date_to": date_to.isoformat(),
+                                     "table_ids": table_ids})
+    tables_text = ", ".join(f"№{table_id}" for table_id in table_ids) if table_ids else "все"
+    await message.answer(f"<b>⛔ Закрытие {date_from:%d.%m.%Y} — {date_to:%d.%m.%Y}</b>\n"
+                         f"Столики: {tables_text}\n"
+                         f"Будет отменено броней: <b>{count}</b>", reply_markup=admin_closure_kb())
+
+
+@router.callback_query(F.data == "admin_closure_confirm", F.from_user.id.in_(admin_ids))
+async def admin_closure_confirm(call: CallbackQuery, state: FSMContext, restaurant_id: int):
+    """
+    Handler for confirming the closure: cancels the bookings and reports the notification progress.
+    """
+    closure = (await state.get_data()).get("closure")
+    if closure is None:
+        await call.answer("Параметры закрытия устарели, повторите команду /close", show_alert=True)
+        return
+    await state.update_data(closure=None)
+    await call.answer("Отменяю брони...")
+    message = call.message
+
+    async def report(job: ClosureJob):
+        status = "✅ Готово" if job.done else "⏳ Уведомляю гостей"
+        try:
+            await message.edit_text(f"<b>{status}</b>\n\nОтменено броней: <b>{job.canceled}</b>\n"
+                                    f"Гостей: {job.users}, уведомлено: {job.sent}, ошибок: {job.failed}",
+                                    reply_markup=admin_back_kb() if job.done else None)
+        except Exception:
+            # the same text again or the message is gone, the progress is reported next time
+            pass
+
+    job = await run_closure(call.bot, restaurant_id, date.fromisoformat(closure["date_from"]),
+                            date.fromisoformat(closure["date_to"]), closure["table_ids"], on_progress=report)
+    await report(job)
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import json
+import time
+import timeit
+from typing import List
+
+from loguru import logger
+
+from app.bot.http_session import PooledAiohttpSession
+from app.bot.updates import peek_update_type
+from app.config import settings
+
+# Benchmarks of the bot side: the webhook update parsing and the outbound Bot API calls (against the fake
+# Bot API of fake_api.py). They need neither the database nor the broker.
+
+
+def sample_corpus(size: int) -> List[bytes]:
+    """Updates shaped like the bot traffic: messages, button presses and membership updates nobody handles."""
+    user = {"id": 1000, "is_bot": False, "first_name": "Гость", "username": "guest", "language_code": "ru"}
+    chat = {"id": 1000, "first_name": "Гость", "username": "guest", "type": "private"}
+    kinds = [
+        lambda n: {"message": {"message_id": n, "from": user, "chat": chat, "date": 1760000000,
+                               "text": "Забронировать столик"}},
+        lambda n: {"callback_query": {"id": str(n), "from": user, "chat_instance": "1", "data": f"slot_{n % 12}",
+                                      "message": {"message_id": n, "from": {**user, "id": 1, "is_bot": True},
+                                                  "chat": chat, "date": 1760000000, "text": "Выберите время"}}},
+        lambda n: {"edited_message": {"message_id": n, "from": user, "chat": chat, "date": 1760000000,
+                                      "edit_date": 1760000001, "text": "Забронировать"}},
+        lambda n: {"my_chat_member": {"chat": chat, "from": user, "date": 1760000000,
+                                      "old_chat_member": {"status": "member", "user": user},
+                                      "new_chat_member": {"status": "kicked", "user": user,
+                                                          "until_date": 0}}},
+    ]
+    return [json.dumps({"update_id": n, **kinds[n % len(kinds)](n)}, ensure_ascii=False,
+                       separators=(",", ":")).encode() for n in range(size)]
+
+
+async def bench_updates(args: argparse.Namespace) -> None:
+    """
+    Parsing every update as /webhook did (json.loads, then Update.model_validate) against
+    Update.model_validate_json on the raw bytes, alone and after dropping the unhandled types by peeking.
+    """
+    from aiogram.types import Update
+
+    if args.capture:
+        from app.bot.capture import read_capture
+        corpus = [raw for _, _, raw in read_capture(args.capture)]
+    else:
+        corpus = sample_corpus(args.size)
+    handled = frozenset(args.handled.split(","))
+
+    def two_pass():
+        for raw in corpus:
+            Update.model_validate(json.loads(raw), context={"bot": None})
+
+    def from_bytes():
+        for raw in corpus:
+            Update.model_validate_json(raw, context={"bot": None})
+
+    def peek_then_bytes():
+        for raw in corpus:
+            if peek_update_type(raw) in handled:
+                Update.model_validate_json(raw, context={"bot": None})
+
+    skipped = sum(peek_update_type(raw) not in handled for raw in corpus)
+    logger.info(f"{len(corpus)} updates, {skipped} of types without handlers")
+    for name, parse in (("json.loads + model_validate", two_pass), ("model_validate_json", from_bytes),
+                        ("peek + model_validate_json", peek_then_bytes)):
+        seconds = min(timeit.repeat(parse, number=1, repeat=args.rounds))
+        logger.info(f"{name:>28}: {seconds * 1e6 / len(corpus):.1f} us per update")
+
+
+async def bench_http_session(args: argparse.Namespace) -> None:
+    """
+    Sends `args.messages` messages, `args.concurrency` at a time, through a session with each of the pool sizes
+    to an in-process FakeBotAPI, and logs the throughput and the latency percentiles.
+    """
+    from aiogram import Bot
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiogram.exceptions import TelegramRetryAfter
+    from app.bot.fake_api import FakeBotAPI
+    from app.bot.replay import percentiles
+
+    fake = FakeBotAPI(latency=args.latency, jitter=args.jitter, rate_limited=args.rate_limited)
+    runner = await fake.start(port=args.port)
+    try:
+        for pool_size in (int(size) for size in args.pool_sizes.split(",")):
+            session = PooledAiohttpSession(limit=pool_size, limit_per_host=pool_size,
+                                           keepalive_timeout=settings.BOT_HTTP_KEEPALIVE,
+                                           ttl_dns_cache=settings.BOT_HTTP_DNS_TTL,
+                                           api=TelegramAPIServer.from_base(f"http://127.0.0.1:{args.port}"))
+            bot = Bot("123456:BENCH", session=session)
+            latencies: List[float] = []
+            limited = 0
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def send(index: int):
+                nonlocal limited
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        await bot.send_message(index % 1000 + 1, "Бронирование подтверждено")
+                    except TelegramRetryAfter:
+                        limited += 1
+                        return
+                    latencies.append(time.perf_counter() - started)
+
+            run_started = time.perf_counter()
+            await asyncio.gather(*(send(index) for index in range(args.messages)))
+            elapsed = time.perf_counter() - run_started
+            await session.close()
+            logger.info(f"pool {pool_size:>4}: {len(latencies) / elapsed:7.0f} messages/s, {limited} rate limited, " +
+                        ", ".join(f"{name} {value:.1f} ms" for name, value in percentiles(latencies).items()))
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bot side benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    updates = commands.add_parser("updates", help="webhook update parsing")
+    updates.add_argument("--capture", help="a capture of app.bot.capture, a synthetic corpus by default")
+    updates.add_argument("--size", type=int, default=5000, help="updates of the synthetic corpus")
+    updates.add_argument("--handled", default="message,callback_query", help="update types having handlers")
+    updates.add_argument("--rounds", type=int, default=5)
+    updates.set_defaults(run=bench_updates)
+    http_session = commands.add_parser("http-session", help="outbound Bot API throughput per connection pool size")
+    http_session.add_argument("--pool-sizes", default="10,50,100,200", help="comma separated")
+    http_session.add_argument("--messages", type=int, default=5000)
+    http_session.add_argument("--concurrency", type=int, default=200, help="messages in flight")
+    http_session.add_argument("--latency", type=float, default=0.05, help="seconds per Bot API call")
+    http_session.add_argument("--jitter", type=float, default=0.02)
+    http_session.add_argument("--rate-limited", type=float, default=0.0, help="share of calls answered with 429")
+    http_session.add_argument("--port", type=int, default=8081)
+    http_session.set_defaults(run=bench_http_session)
+    arguments = parser.parse_args()
+    asyncio.run(arguments.run(arguments))
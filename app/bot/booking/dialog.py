@@ -1,11 +1,14 @@
 from aiogram_dialog import Dialog
 from app.bot.booking.windows import (get_capacity_window, get_table_window, get_date_window,
-                                     get_slots_window, get_confirmed_windows)
+                                     get_slots_window, get_confirmed_windows, get_search_window,
+                                     get_waitlist_window)
 
 booking_dialog = Dialog(
     get_capacity_window(),
     get_table_window(),
     get_date_window(),
     get_slots_window(),
-    get_confirmed_windows()
+    get_confirmed_windows(),
+    get_search_window(),
+    get_waitlist_window()
 )
\ No newline at end of file
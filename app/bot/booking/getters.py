@@ -1,31 +1,102 @@
+from datetime import date
 from aiogram_dialog import DialogManager
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.bot.render_cache import tables_render_cache, slots_render_cache
+from app.DAO.catalog import table_catalog
+from app.DAO.dao import BookingDAO, TableDAO, TimeSlotUserDAO
+from app.DAO.models import Table, TimeSlot
+
+# The dialog data is saved by the FSM storage, as JSON with FSM_STORAGE_URL: it keeps only ids, dicts
+# of plain values and ISO dates, the table and the slot are read again where they are shown or booked.
+
+
+def get_booking_date(dialog_manager: DialogManager) -> date:
+    return date.fromisoformat(dialog_manager.dialog_data["booking_date"])
+
+
+async def get_selected_table(dialog_manager: DialogManager, session: AsyncSession | None = None) -> Table | None:
+    table_id = dialog_manager.dialog_data.get("selected_table_id")
+    if table_id is None:
+        return None
+    session = session or dialog_manager.middleware_data.get("session_without_commit")
+    return await TableDAO(session).find_one_or_none_by_id(table_id)
+
+
+async def get_selected_slot(dialog_manager: DialogManager, session: AsyncSession | None = None) -> TimeSlot | None:
+    session = session or dialog_manager.middleware_data.get("session_without_commit")
+    return await TimeSlotUserDAO(session).find_one_or_none_by_id(dialog_manager.dialog_data["selected_slot_id"])
+
 
 
 async def get_all_tables(dialog_manager: DialogManager, **kwargs):
     """Getting all tables taking into account the chosen capacity."""
     tables = dialog_manager.dialog_data['tables']
     capacity = dialog_manager.dialog_data['capacity']
-    return {"tables": [table.to_dict() for table in tables],
-            "text_table": f'Found {len(tables)} tables for {capacity} people.'
-                          f' Сhoose the one you like by description'}
+    restaurant_id = dialog_manager.middleware_data["restaurant_id"]
+    # the version in the key changes once the catalog, re-read after its TTL, has changed
+    await table_catalog.ensure_loaded(dialog_manager.middleware_data["session_without_commit"], restaurant_id)
+    # the list depends only on the capacity while the catalog of the restaurant stays the same
+    return tables_render_cache.get_or_build(
+        restaurant_id,
+        (capacity, table_catalog.version(restaurant_id)),
+        lambda: {"tables": tables,
+                 "text_table": f'Found {len(tables)} tables for {capacity} people.'
+                               f' Сhoose the one you like by description'}
+    )
+
+async def get_full_days(dialog_manager: DialogManager, booking_month: date):
+    """Getting the days of the month without free slots for the chosen table (or capacity)."""
+    session = dialog_manager.middleware_data.get("session_without_commit")
+    if dialog_manager.dialog_data.get("auto_table"):
+        scope = {"capacity": dialog_manager.dialog_data["capacity"]}
+    else:
+        scope = {"table_id": dialog_manager.dialog_data["selected_table_id"]}
+    availability = await BookingDAO(session).get_month_availability(
+        booking_month.year, booking_month.month, dialog_manager.middleware_data["restaurant_id"], **scope
+    )
+    return {day for day, free in availability.items() if free <= 0}
+
+async def get_calendar_data(dialog_manager: DialogManager, **kwargs):
+    """Getting the fully booked days of the month shown in the calendar."""
+    booking_month = dialog_manager.find("cal").get_offset() or date.today()
+    return {"full_days": await get_full_days(dialog_manager, booking_month)}
 
 async def get_all_available_slots(dialog_manager: DialogManager, **kwargs):
     """Getting all available time slots for the chosen table and date."""
-    selected_table = dialog_manager.dialog_data["selected_table"]
     slots = dialog_manager.dialog_data["slots"]
-    text_slots = (
-        f'Found {len(slots)} for the table №{selected_table.id} '
-        f'{"free slots" if len(slots) != 1 else "free slot"}. '
-        'Choose a convenient time'
-    )
-    return {"slots": [slot.to_dict() for slot in slots], "text_slots": text_slots}
+    if dialog_manager.dialog_data.get("auto_table"):
+        target = f'any table for {dialog_manager.dialog_data["capacity"]} people'
+    else:
+        target = f'the table №{dialog_manager.dialog_data["selected_table_id"]}'
+
+    def build():
+        text_slots = (
+            f'Found {len(slots)} for {target} '
+            f'{"free slots" if len(slots) != 1 else "free slot"}. '
+            'Choose a convenient time'
+        )
+        return {"slots": slots, "text_slots": text_slots}
+
+    # identical for everyone who sees the same free slots of the same table
+    restaurant_id = dialog_manager.middleware_data["restaurant_id"]
+    await table_catalog.ensure_loaded(dialog_manager.middleware_data["session_without_commit"], restaurant_id)
+    key = (target, tuple(slot["id"] for slot in slots), table_catalog.version(restaurant_id))
+    return slots_render_cache.get_or_build(restaurant_id, key, build)
+
+
+async def get_search_results(dialog_manager: DialogManager, **kwargs):
+    """Getting the nearest free slots found for the chosen capacity."""
+    results = dialog_manager.dialog_data["search_results"]
+    capacity = dialog_manager.dialog_data["capacity"]
+    return {"results": results,
+            "text_search": f'Nearest free slots for {capacity} people. Choose the one you like'}
 
 
 async def get_confirmed_data(dialog_manager: DialogManager, **kwargs):
     """Getting data to confirm the booking."""
-    selected_table = dialog_manager.dialog_data['selected_table']
-    booking_date = dialog_manager.dialog_data['booking_date']
-    selected_slot = dialog_manager.dialog_data['selected_slot']
+    selected_table = await get_selected_table(dialog_manager)
+    booking_date = get_booking_date(dialog_manager)
+    selected_slot = await get_selected_slot(dialog_manager)
 
     confirmed_text = (
         "<b>📅 Подтверждение бронирования</b>\n\n"
@@ -35,8 +106,20 @@ async def get_confirmed_data(dialog_manager: DialogManager, **kwargs):
         f"  - 👥 Кол-во мест: {selected_table.capacity}\n"
         f"  - 📍 Номер столика: {selected_table.id}\n\n"
         f"<b>⏰ Время бронирования:</b>\n"
-        f"  - С <i>{selected_slot.start_time}</i> до <i>{selected_slot.end_time}</i>\n\n"
+        f"  - С <i>{selected_slot.start_time:%H:%M}</i> до <i>{selected_slot.end_time:%H:%M}</i>\n\n"
         "✅ Все ли верно?"
     )
 
-    return {"confirmed_text": confirmed_text}
\ No newline at end of file
+    return {"confirmed_text": confirmed_text}
+
+async def get_waitlist_data(dialog_manager: DialogManager, **kwargs):
+    """Getting data of the taken slot offered for the waitlist."""
+    booking_date = get_booking_date(dialog_manager)
+    selected_slot = await get_selected_slot(dialog_manager)
+    waitlist_text = (
+        "<b>😔 Этот слот уже занят</b>\n\n"
+        f"<b>📆 Дата:</b> {booking_date}\n"
+        f"<b>⏰ Время:</b> с <i>{selected_slot.start_time:%H:%M}</i> до <i>{selected_slot.end_time:%H:%M}</i>\n\n"
+        "Встаньте в лист ожидания: если место освободится, мы забронируем его для вас автоматически."
+    )
+    return {"waitlist_text": waitlist_text}
@@ -2,12 +2,16 @@ from datetime import date
 from aiogram.types import CallbackQuery
 from aiogram_dialog import DialogManager
 from aiogram_dialog.widgets.kbd import Button
+from app.bot.booking.getters import get_full_days, get_booking_date, get_selected_table, get_selected_slot
 from app.bot.booking.schemas import SCapacity, SNewBooking
+from app.bot.booking.state import BookingState
 from app.bot.user.kbs import main_user_kb
-from app.DAO.dao import BookingDAO, TimeSlotUserDAO, TableDAO
-from app.config import broker
+from app.DAO.dao import BookingDAO, TimeSlotUserDAO, TableDAO, WaitlistDAO
+from app.DAO.holds import slot_holds
+from app.config import broker, settings
 
 async def cancel_logic(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
+    await slot_holds.release(callback.from_user.id)
     await callback.answer("Сценарий бронирования отменен!")
     await callback.message.answer("Вы отменили сценарий бронирования.",
                                   reply_markup=main_user_kb(callback.from_user.id))
@@ -18,31 +22,96 @@ async def process_add_count_capacity(callback: CallbackQuery, button: Button, di
     session = dialog_manager.middleware_data.get("session_without_commit")
     selected_capacity = int(button.widget_id)
     dialog_manager.dialog_data["capacity"] = selected_capacity
-    dialog_manager.dialog_data['tables'] = await TableDAO(session).find_all(SCapacity(capacity=selected_capacity))
+    dialog_manager.dialog_data["auto_table"] = False
+    restaurant_id = dialog_manager.middleware_data["restaurant_id"]
+    tables = await TableDAO(session).find_all(SCapacity(capacity=selected_capacity, restaurant_id=restaurant_id,
+                                                        is_active=True))
+    dialog_manager.dialog_data['tables'] = [table.to_dict() for table in tables]
     await callback.answer(f"Выбрано {selected_capacity} гостей")
     await dialog_manager.next()
 
+async def on_search_nearest(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
+    """Handler for searching the nearest free slots for the chosen capacity across all tables."""
+    session = dialog_manager.middleware_data.get("session_without_commit")
+    capacity = dialog_manager.dialog_data["capacity"]
+    rows = await BookingDAO(session).find_nearest_available(capacity=capacity, days=settings.SEARCH_DAYS,
+                                                           restaurant_id=dialog_manager.middleware_data["restaurant_id"],
+                                                           limit=settings.SEARCH_LIMIT)
+    if not rows:
+        await callback.answer(f"Нет свободных мест на ближайшие {settings.SEARCH_DAYS} дн.!")
+        return
+    dialog_manager.dialog_data["search_rows"] = {
+        f"{table.id}_{slot.id}_{day.isoformat()}": {"table_id": table.id, "slot": slot.to_dict(),
+                                                     "date": day.isoformat()}
+        for table, slot, day in rows
+    }
+    dialog_manager.dialog_data["search_results"] = [
+        {"id": f"{table.id}_{slot.id}_{day.isoformat()}", "date": day.strftime("%d.%m"),
+         "start_time": f"{slot.start_time:%H:%M}", "end_time": f"{slot.end_time:%H:%M}",
+         "table_id": table.id, "capacity": table.capacity}
+        for table, slot, day in rows
+    ]
+    await callback.answer("Ищу ближайшее свободное время")
+    await dialog_manager.switch_to(BookingState.search)
+
+async def on_search_result_selected(callback: CallbackQuery, widget, dialog_manager: DialogManager, item_id: str):
+    """Handler for selecting one of the found slots. Goes straight to the confirmation."""
+    search_rows = dialog_manager.dialog_data["search_rows"]
+    selected = search_rows[item_id]
+    dialog_manager.dialog_data["selected_table_id"] = selected["table_id"]
+    dialog_manager.dialog_data["selected_slot_id"] = selected["slot"]["id"]
+    dialog_manager.dialog_data["booking_date"] = selected["date"]
+    dialog_manager.dialog_data["auto_table"] = False
+    # other found slots of the same table and date, so that "Back" shows a valid slots window
+    dialog_manager.dialog_data["slots"] = [row["slot"] for row in search_rows.values()
+                                           if (row["table_id"], row["date"]) == (selected["table_id"], selected["date"])]
+    await callback.answer(f"Выбран стол №{selected['table_id']} на {selected['date']}")
+    await dialog_manager.switch_to(BookingState.confirmation)
+
 async def on_table_selected(callback: CallbackQuery, widget, dialog_manager: DialogManager, item_id: str):
     """Handler for selecting the table."""
     session = dialog_manager.middleware_data.get("session_without_commit")
     table_id = int(item_id)
     selected_table = await TableDAO(session).find_one_or_none_by_id(table_id)
-    dialog_manager.dialog_data["selected_table"] = selected_table
+    dialog_manager.dialog_data["selected_table_id"] = table_id
+    dialog_manager.dialog_data["auto_table"] = False
     await callback.answer(f"Выбран стол №{table_id} на {selected_table.capacity} мест")
     await dialog_manager.next()
 
+async def on_any_table_selected(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
+    """Handler for the "any table" option: the smallest suitable free table is assigned automatically."""
+    dialog_manager.dialog_data["selected_table_id"] = None
+    dialog_manager.dialog_data["auto_table"] = True
+    await callback.answer("Подберем подходящий свободный столик")
+    await dialog_manager.next()
+
 async def process_date_selected(callback: CallbackQuery, widget, dialog_manager: DialogManager, selected_date: date):
     """Handler for selecting the date."""
-    dialog_manager.dialog_data["booking_date"] = selected_date
+    if selected_date in await get_full_days(dialog_manager, selected_date):
+        # known from the month availability, no need to query the slots
+        await callback.answer(f"На {selected_date} все места заняты, выберите другой день!")
+        return
+    dialog_manager.dialog_data["booking_date"] = selected_date.isoformat()
     session = dialog_manager.middleware_data.get("session_without_commit")
-    selected_table = dialog_manager.dialog_data["selected_table"]
-    slots = await BookingDAO(session).get_available_time_slots(table_id=selected_table.id, booking_date=selected_date)
+    if dialog_manager.dialog_data.get("auto_table"):
+        capacity = dialog_manager.dialog_data["capacity"]
+        slots = await BookingDAO(session).get_available_time_slots_for_capacity(
+            capacity=capacity, booking_date=selected_date,
+            restaurant_id=dialog_manager.middleware_data["restaurant_id"]
+        )
+        no_slots_text = f"Нет свободных столиков на {selected_date} для {capacity} гостей!"
+    else:
+        table_id = dialog_manager.dialog_data["selected_table_id"]
+        slots = await BookingDAO(session).get_available_time_slots(table_id=table_id,
+                                                                   booking_date=selected_date,
+                                                                   user_id=callback.from_user.id)
+        no_slots_text = f"Нет мест на {selected_date} для стола №{table_id}!"
     if slots:
         await callback.answer(f"Выбрана дата: {selected_date}")
-        dialog_manager.dialog_data["slots"] = slots
+        dialog_manager.dialog_data["slots"] = [slot.to_dict() for slot in slots]
         await dialog_manager.next()
     else:
-        await callback.answer(f"Нет мест на {selected_date} для стола №{selected_table.id}!")
+        await callback.answer(no_slots_text)
         await dialog_manager.back()
 
 
@@ -51,8 +120,25 @@ async def process_slots_selected(callback: CallbackQuery, widget, dialog_manager
     session = dialog_manager.middleware_data.get("session_without_commit")
     slot_id = int(item_id)
     selected_slot = await TimeSlotUserDAO(session).find_one_or_none_by_id(slot_id)
-    await callback.answer(f"Выбрано время с {selected_slot.start_time} до {selected_slot.end_time}")
-    dialog_manager.dialog_data['selected_slot'] = selected_slot
+    booking_date = get_booking_date(dialog_manager)
+    user_id = callback.from_user.id
+    dialog_manager.dialog_data['selected_slot_id'] = slot_id
+    if dialog_manager.dialog_data.get("auto_table"):
+        # preview of the assignment, the final table is picked again on confirmation
+        selected_table = await BookingDAO(session).find_best_table(capacity=dialog_manager.dialog_data["capacity"],
+                                                                   booking_date=booking_date,
+                                                                   time_slot_id=slot_id, user_id=user_id)
+        if selected_table is None:
+            await callback.answer("Места на этот слот уже заняты!")
+            await dialog_manager.switch_to(BookingState.waitlist)
+            return
+        dialog_manager.dialog_data["selected_table_id"] = selected_table.id
+    # the slot is kept for the guest while they confirm
+    table_id = dialog_manager.dialog_data["selected_table_id"]
+    if not await slot_holds.place(user_id, table_id, booking_date, slot_id):
+        await callback.answer("Этот слот сейчас бронирует другой гость, выберите другое время!")
+        return
+    await callback.answer(f"Выбрано время с {selected_slot.start_time:%H:%M} до {selected_slot.end_time:%H:%M}")
     await dialog_manager.next()
 
 async def on_confirmation(callback: CallbackQuery, widget, dialog_manager: DialogManager, **kwargs):
@@ -60,30 +146,67 @@ async def on_confirmation(callback: CallbackQuery, widget, dialog_manager: Dialo
     session = dialog_manager.middleware_data.get("session_with_commit")
 
     # Getting selected data
-    selected_table = dialog_manager.dialog_data['selected_table']
-    selected_slot = dialog_manager.dialog_data['selected_slot']
-    booking_date = dialog_manager.dialog_data['booking_date']
+    selected_table = await get_selected_table(dialog_manager, session)
+    selected_slot = await get_selected_slot(dialog_manager, session)
+    booking_date = get_booking_date(dialog_manager)
     user_id = callback.from_user.id
-    check = await BookingDAO(session).check_available_bookings(table_id=selected_table.id,
-                                                              time_slot_id=selected_slot.id,
-                                                              booking_date=booking_date)
+    if dialog_manager.dialog_data.get("auto_table"):
+        booking = await BookingDAO(session).assign_best_table(user_id=user_id,
+                                                              capacity=dialog_manager.dialog_data["capacity"],
+                                                              booking_date=booking_date,
+                                                              time_slot_id=selected_slot.id)
+        check = booking is not None
+        if check:
+            selected_table = await TableDAO(session).find_one_or_none_by_id(booking.table_id)
+    else:
+        check = await BookingDAO(session).check_available_bookings(table_id=selected_table.id,
+                                                                  time_slot_id=selected_slot.id,
+                                                                  booking_date=booking_date,
+                                                                  user_id=user_id)
+        if check:
+            add_model = SNewBooking(
+                restaurant_id=selected_table.restaurant_id, user_id=user_id, table_id=selected_table.id,
+                time_slot_id=selected_slot.id, date=booking_date,
+                start_time=selected_slot.start_time, end_time=selected_slot.end_time, status="booked"
+            )
+            await BookingDAO(session).add(add_model)
     if check:
-        await callback.answer("Приступаю к сохранению")
-        add_model = SNewBooking(
-            user_id=user_id, table_id=selected_table.id,
-            time_slot_id=selected_slot.id, date=booking_date, status="booked"
-        )
-        await BookingDAO(session).add(add_model)
+        await slot_holds.convert(user_id)
         await callback.answer(f"Бронирование успешно создано!")
 
         text = "Бронь успешно сохранена🔢🍴 Со списком своих броней можно ознакомиться в меню 'МОИ БРОНИ'"
         await callback.message.answer(text, reply_markup=main_user_kb(user_id))
 
         admin_text = (f"Внимание! Пользователь с ID {callback.from_user.id} забронировал столик №{selected_table.id} "
-                     f"на {booking_date}. Время брони с {selected_slot.start_time} до {selected_slot.end_time}")
-        await broker.publish(admin_text, "admin_msg")
-        await broker.publish(callback.from_user.id, "noti_user")
+                     f"на {booking_date}. Время брони с {selected_slot.start_time:%H:%M} до {selected_slot.end_time:%H:%M}")
+        await broker.publish({"msg": admin_text, "restaurant_id": dialog_manager.middleware_data["restaurant_id"]},
+                             "admin_msg")
+        await broker.publish({"user_id": callback.from_user.id,
+                              "restaurant_id": dialog_manager.middleware_data["restaurant_id"]}, "noti_user")
         await dialog_manager.done()
     else:
         await callback.answer("Места на этот слот уже заняты!")
-        await dialog_manager.back()
\ No newline at end of file
+        await dialog_manager.switch_to(BookingState.waitlist)
+
+
+async def on_join_waitlist(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
+    """Handler for joining the waitlist of the taken slot."""
+    session = dialog_manager.middleware_data.get("session_with_commit")
+    booking_date = get_booking_date(dialog_manager)
+    # in the "any table" mode any suitable table will do
+    table_id = None if dialog_manager.dialog_data.get("auto_table") else dialog_manager.dialog_data['selected_table_id']
+    user_id = callback.from_user.id
+    joined = await WaitlistDAO(session).join(restaurant_id=dialog_manager.middleware_data["restaurant_id"],
+                                             user_id=user_id, capacity=dialog_manager.dialog_data["capacity"],
+                                             booking_date=booking_date,
+                                             time_slot_id=dialog_manager.dialog_data['selected_slot_id'],
+                                             table_id=table_id)
+    if joined:
+        await callback.answer("Вы в листе ожидания!")
+        text = ("Вы добавлены в лист ожидания🕓 Как только место освободится, мы забронируем его для вас "
+                "и пришлем уведомление.")
+    else:
+        await callback.answer("Вы уже в листе ожидания на этот слот")
+        text = "Вы уже ждете этот слот, мы сообщим, как только он освободится."
+    await callback.message.answer(text, reply_markup=main_user_kb(user_id))
+    await dialog_manager.done()
\ No newline at end of file
@@ -1,13 +1,18 @@
 from pydantic import BaseModel
-from datetime import date
+from datetime import date, time
 
 class SCapacity(BaseModel):
     capacity: int
+    restaurant_id: int
+    is_active: bool = True
 
 
 class SNewBooking(BaseModel):
+    restaurant_id: int
     user_id: int
     table_id: int
     time_slot_id: int
     date: date
+    start_time: time
+    end_time: time
     status: str
\ No newline at end of file
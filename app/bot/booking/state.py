@@ -7,4 +7,6 @@ class BookingState(StatesGroup):
     booking_date = State()
     booking_time = State()
     confirmation = State()
-    success = State()
\ No newline at end of file
+    success = State()
+    search = State()
+    waitlist = State()
\ No newline at end of file
@@ -1,13 +1,46 @@
 from datetime import date, timedelta, timezone
-from aiogram_dialog import Window
-from aiogram_dialog.widgets.kbd import Button, Group, ScrollingGroup, Select, Calendar, CalendarConfig, Back, Cancel
-from aiogram_dialog.widgets.text import Const, Format
-from app.bot.booking.getters import get_all_tables, get_all_available_slots, get_confirmed_data
+from typing import Dict
+from aiogram_dialog import Window, DialogManager
+from aiogram_dialog.widgets.kbd import (Button, Group, ScrollingGroup, Select, Calendar, CalendarConfig, Back, Cancel,
+                                        SwitchTo)
+from aiogram_dialog.widgets.kbd.calendar_kbd import (CalendarDaysView, CalendarMonthView, CalendarYearsView,
+                                                     CalendarScope, CalendarScopeView)
+from aiogram_dialog.widgets.text import Const, Format, Text
+from app.bot.booking.getters import (get_all_tables, get_all_available_slots, get_confirmed_data, get_search_results,
+                                     get_calendar_data, get_waitlist_data)
 from app.bot.booking.handlers import (process_add_count_capacity, on_table_selected,
-                                      process_date_selected, process_slots_selected, on_confirmation, cancel_logic)
+                                      process_date_selected, process_slots_selected, on_confirmation, cancel_logic,
+                                      on_search_nearest, on_search_result_selected, on_any_table_selected,
+                                      on_join_waitlist)
 from app.bot.booking.state import BookingState
 
 
+class DayText(Text):
+    """Calendar day text, fully booked days are crossed out."""
+
+    def __init__(self, today: bool = False):
+        super().__init__()
+        self._today = today
+
+    async def _render_text(self, data: Dict, manager: DialogManager) -> str:
+        day = data["date"]
+        if day in data["data"].get("full_days", ()):
+            return "✖"
+        return f"[{day.day}]" if self._today else str(day.day)
+
+
+class AvailabilityCalendar(Calendar):
+    """Calendar marking the days without free slots."""
+
+    def _init_views(self) -> Dict[CalendarScope, CalendarScopeView]:
+        return {
+            CalendarScope.DAYS: CalendarDaysView(self._item_callback_data,
+                                                 date_text=DayText(), today_text=DayText(today=True)),
+            CalendarScope.MONTHS: CalendarMonthView(self._item_callback_data),
+            CalendarScope.YEARS: CalendarYearsView(self._item_callback_data),
+        }
+
+
 def get_capacity_window() -> Window:
     """Window for choosing the number of guests."""
     return Window(
@@ -40,6 +73,8 @@ def get_table_window() -> Window:
             width=1,
             height=1,
         ),
+        Button(Const("🎲 Любой свободный столик"), id="any_table", on_click=on_any_table_selected),
+        Button(Const("⚡ Ближайшее свободное время"), id="search_nearest", on_click=on_search_nearest),
         Group(
             Back(Const("Назад")),
             Cancel(Const("Отмена"), on_click=cancel_logic),
@@ -53,7 +88,7 @@ def get_date_window() -> Window:
     """Window for choosing the date."""
     return Window(
         Const("На какой день бронируем столик?"),
-        Calendar(
+        AvailabilityCalendar(
             id="cal",
             on_click=process_date_selected,
             config=CalendarConfig(
@@ -64,6 +99,7 @@ def get_date_window() -> Window:
         ),
         Back(Const("Назад")),
         Cancel(Const("Отмена"), on_click=cancel_logic),
+        getter=get_calendar_data,
         state=BookingState.booking_date,
     )
 
@@ -99,4 +135,45 @@ def get_confirmed_windows():
         ),
         state=BookingState.confirmation,
         getter=get_confirmed_data
-    )
\ No newline at end of file
+    )
+
+def get_search_window() -> Window:
+    """Window with the nearest free slots across all suitable tables."""
+    return Window(
+        Format("{text_search}"),
+        ScrollingGroup(
+            Select(
+                Format("{item[date]} {item[start_time]}-{item[end_time]}, стол №{item[table_id]} "
+                       "({item[capacity]} мест)"),
+                id="search_select",
+                item_id_getter=lambda item: item["id"],
+                items="results",
+                on_click=on_search_result_selected,
+            ),
+            id="search_scrolling",
+            width=1,
+            height=5,
+        ),
+        Group(
+            SwitchTo(Const("Назад"), id="search_back", state=BookingState.table),
+            Cancel(Const("Отмена"), on_click=cancel_logic),
+            width=2
+        ),
+        getter=get_search_results,
+        state=BookingState.search,
+    )
+
+
+def get_waitlist_window() -> Window:
+    """Window offering the waitlist for a taken slot."""
+    return Window(
+        Format("{waitlist_text}"),
+        Group(
+            Button(Const("🕓 Встать в лист ожидания"), id="join_waitlist", on_click=on_join_waitlist),
+            SwitchTo(Const("Назад"), id="waitlist_back", state=BookingState.booking_time),
+            Cancel(Const("Отмена"), on_click=cancel_logic),
+            width=1
+        ),
+        getter=get_waitlist_data,
+        state=BookingState.waitlist,
+    )
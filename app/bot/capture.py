@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from typing import Iterator, Tuple
+from loguru import logger
+
+# Objects holding a user or a chat; their ids are replaced, the personal fields dropped
+IDENTITY_KEYS = {"from", "chat", "user", "sender_chat", "new_chat_member", "old_chat_member"}
+PERSONAL_FIELDS = {"last_name", "username", "phone_number", "bio", "title"}
+
+
+class TrafficCapture:
+    """
+    Records the raw webhook updates with their arrival time to an append-only gzip file of JSON lines
+    {"t": unix time, "r": restaurant_id, "u": update}, for replays with app.bot.replay.
+    User and chat ids are replaced with keyed pseudonyms (the same user keeps the same pseudonym
+    within the capture), names and phones are dropped. Anonymizing and writing happen in the background,
+    the webhook only puts the bytes on a bounded queue and drops them when it is full.
+    """
+
+    def __init__(self, path: str, salt: str | None = None, queue_size: int = 10_000):
+        self.path = path
+        self._salt = salt.encode() if salt else secrets.token_bytes(16)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: asyncio.Task | None = None
+        self.recorded = 0
+        self.dropped = 0
+
+    def record(self, raw: bytes, restaurant_id: int) -> None:
+        try:
+            self._queue.put_nowait((time.time(), restaurant_id, raw))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _pseudonym(self, value: int) -> int:
+        digest = hmac.new(self._salt, str(abs(value)).encode(), hashlib.sha256).digest()
+        pseudonym = int.from_bytes(digest[:5], "big") + 1
+        return -pseudonym if value < 0 else pseudonym
+
+    def _anonymize(self, node):
+        if isinstance(node, list):
+            return [self._anonymize(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        result = {}
+        for key, value in node.items():
+            if key in PERSONAL_FIELDS:
+                continue
+            if key == "user_id" and isinstance(value, int):
+                value = self._pseudonym(value)
+            elif key in IDENTITY_KEYS and isinstance(value, dict) and isinstance(value.get("id"), int):
+                value = {**value, "id": self._pseudonym(value["id"])}
+                if "first_name" in value:
+                    value["first_name"] = "Guest"
+            result[key] = self._anonymize(value)
+        return result
+
+    def _line(self, arrived: float, restaurant_id: int, raw: bytes) -> bytes:
+        record = {"t": arrived, "r": restaurant_id, "u": self._anonymize(json.loads(raw))}
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+    def _append(self, lines: list) -> None:
+        # every batch is a separate gzip member, a crash loses at most the current batch
+        with gzip.open(self.path, "ab") as file:
+            file.write(b"".join(lines))
+
+    async def _writer(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            stop = batch[-1] is None
+            lines = []
+            for item in batch:
+                if item is None:
+                    continue
+                try:
+                    lines.append(self._line(*item))
+                except ValueError as e:
+                    logger.warning(f"Captured update is not valid JSON, skipped: {e}")
+            if lines:
+                await asyncio.to_thread(self._append, lines)
+                self.recorded += len(lines)
+            if stop:
+                return
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._writer())
+        logger.info(f"Traffic capture to {self.path} is started")
+
+    async def stop(self) -> None:
+        if self._task:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+            logger.info(f"Traffic capture stopped: {self.recorded} updates recorded, {self.dropped} dropped")
+
+    def stats(self) -> dict:
+        return {"path": self.path, "recorded": self.recorded, "dropped": self.dropped,
+                "queued": self._queue.qsize()}
+
+
+def read_capture(path: str) -> Iterator[Tuple[float, int, bytes]]:
+    """Yields (arrival time, restaurant_id, raw update) of a capture file."""
+    with gzip.open(path, "rb") as file:
+        for line in file:
+            record = json.loads(line)
+            yield record["t"], record["r"], json.dumps(record["u"], ensure_ascii=False).encode()
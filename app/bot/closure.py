@@ -0,0 +1,140 @@
+import asyncio
+import itertools
+import time
+from collections import defaultdict
+from datetime import date
+from typing import Awaitable, Callable, Dict, List
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter, TelegramBadRequest
+from loguru import logger
+from app.config import settings
+from app.DAO.dao import BookingDAO
+from app.DAO.database import async_session_maker
+
+ProgressCallback = Callable[["ClosureJob"], Awaitable[None]]
+
+
+class RateLimiter:
+    """Spaces the calls out to at most `rate` per second, shared by all the concurrent senders."""
+
+    def __init__(self, rate: float):
+        if rate <= 0:
+            raise ValueError(f"The rate must be positive, got {rate}")
+        self._interval = 1 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ClosureJob:
+    """Bookings canceled by a closure and the progress of notifying their guests."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, restaurant_id: int, date_from: date, date_to: date, table_ids: List[int] | None):
+        self.id = next(self._ids)
+        self.restaurant_id = restaurant_id
+        self.date_from = date_from
+        self.date_to = date_to
+        self.table_ids = table_ids
+        self.canceled = 0
+        self.users = 0
+        self.sent = 0
+        self.failed = 0
+        self.done = False
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "restaurant_id": self.restaurant_id, "date_from": self.date_from,
+                "date_to": self.date_to, "table_ids": self.table_ids, "canceled": self.canceled, "users": self.users,
+                "sent": self.sent, "failed": self.failed, "done": self.done}
+
+
+# finished jobs are kept for CLOSURE_JOB_TTL seconds
+closure_jobs: Dict[int, ClosureJob] = {}
+_tasks = set()
+
+
+def closure_text(bookings) -> str:
+    lines = ["😔 К сожалению, ресторан не сможет принять вас в выбранное время. Ваши брони отменены:\n"]
+    lines += [f"• {b.date:%d.%m.%Y} с {b.start_time:%H:%M} до {b.end_time:%H:%M}, столик №{b.table_id}"
+              for b in bookings]
+    lines.append("\nПриносим извинения! Вы можете выбрать другое время в меню 'ЗАБРОНИРОВАТЬ СТОЛИК'.")
+    return "\n".join(lines)
+
+
+async def _send(bot: Bot, limiter: RateLimiter, user_id: int, text: str) -> bool:
+    for _ in range(3):
+        await limiter.wait()
+        try:
+            await bot.send_message(user_id, text)
+            return True
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # blocked the bot or deleted the account, nothing to retry
+            logger.info(f"Guest {user_id} can't be notified about the closure: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Error notifying guest {user_id} about the closure: {e}")
+            return False
+    return False
+
+
+async def notify_guests(bot: Bot, job: ClosureJob, canceled, on_progress: ProgressCallback | None = None) -> None:
+    """
+    Sends one message per guest with all of their canceled bookings.
+    CLOSURE_NOTIFY_CONCURRENCY senders share one rate limit, progress is reported every few seconds.
+    """
+    by_user = defaultdict(list)
+    for booking in canceled:
+        by_user[booking.user_id].append(booking)
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in by_user.items():
+        queue.put_nowait(item)
+    limiter = RateLimiter(settings.CLOSURE_NOTIFY_RATE)
+
+    async def sender():
+        while not queue.empty():
+            user_id, bookings = queue.get_nowait()
+            if await _send(bot, limiter, user_id, closure_text(bookings)):
+                job.sent += 1
+            else:
+                job.failed += 1
+
+    senders = [asyncio.create_task(sender()) for _ in range(min(settings.CLOSURE_NOTIFY_CONCURRENCY, len(by_user)))]
+    while senders:
+        _, pending = await asyncio.wait(senders, timeout=settings.CLOSURE_PROGRESS_INTERVAL)
+        senders = list(pending)
+        if on_progress and senders:
+            await on_progress(job)
+    job.done = True
+    logger.info(f"Closure {job.id}: {job.sent} guests notified, {job.failed} failed")
+    if on_progress:
+        await on_progress(job)
+
+
+async def run_closure(bot: Bot, restaurant_id: int, date_from: date, date_to: date,
+                      table_ids: List[int] | None = None, on_progress: ProgressCallback | None = None) -> ClosureJob:
+    """
+    Cancels the bookings of the restaurant's closed dates (and tables) and starts notifying the guests
+    with the restaurant's bot in the background. Returns as soon as the bookings are canceled.
+    """
+    job = ClosureJob(restaurant_id, date_from, date_to, table_ids)
+    async with async_session_maker() as session:
+        canceled = await BookingDAO(session).cancel_range(restaurant_id, date_from, date_to, table_ids)
+    job.canceled = len(canceled)
+    job.users = len({booking.user_id for booking in canceled})
+    closure_jobs[job.id] = job
+    task = asyncio.create_task(notify_guests(bot, job, canceled, on_progress))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    task.add_done_callback(lambda _: asyncio.get_running_loop().call_later(settings.CLOSURE_JOB_TTL,
+                                                                           closure_jobs.pop, job.id, None))
+    return job
@@ -1,24 +1,77 @@
+import asyncio
+import hashlib
 import locale
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand, BotCommandScopeDefault
-from aiogram_dialog import setup_dialogs
 from loguru import logger
-from app.bot.booking.dialog import booking_dialog
 from app.bot.user.router import router as user_router
 from app.bot.admin.router import router as admin_router
-from app.config import settings
+from app.bot.flood_middleware import flood_control
+from app.bot.http_session import create_bot_session
+from app.bot.tenant_middleware import TenantMiddleware
+from app.config import settings, DEFAULT_RESTAURANT_ID
 from app.DAO.database_middleware import DatabaseMiddlewareWithoutCommit, DatabaseMiddlewareWithCommit
-from app.DAO.init_logic import init_db
 
-bot = Bot(token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher(storage=MemoryStorage())
+# every restaurant has its own bot, all of them share one HTTP session and one dispatcher
+bot_session = create_bot_session()
+bots = {restaurant_id: Bot(token=token, session=bot_session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+        for restaurant_id, token in settings.bot_tokens.items()}
+bot = bots[DEFAULT_RESTAURANT_ID]
+
+
+def create_storage() -> BaseStorage:
+    """The dialog state in Redis when FSM_STORAGE_URL is set (several processes), in memory otherwise."""
+    if not settings.FSM_STORAGE_URL:
+        return MemoryStorage()
+    from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+    # aiogram_dialog keeps its stacks under their own destiny, the key must tell them apart
+    return RedisStorage.from_url(settings.FSM_STORAGE_URL, key_builder=DefaultKeyBuilder(with_destiny=True))
+
+
+dp = Dispatcher(storage=create_storage())
+_dispatcher_ready = False
 
 async def set_commands():
+    """Sets the commands of every bot, skipping the bots that already have them."""
     commands = [BotCommand(command='start', description='Старт')]
-    await bot.set_my_commands(commands, BotCommandScopeDefault())
+
+    async def set_bot_commands(tenant_bot: Bot):
+        if await tenant_bot.get_my_commands(BotCommandScopeDefault()) != commands:
+            await tenant_bot.set_my_commands(commands, BotCommandScopeDefault())
+
+    await asyncio.gather(*(set_bot_commands(tenant_bot) for tenant_bot in bots.values()))
+
+
+async def set_webhooks(allowed_updates):
+    """
+    Points the bot of every restaurant to its webhook, skipping the bots already pointing there.
+    The pending updates are kept: what the guests sent during a restart is handled after it.
+    """
+    allowed_updates = sorted(allowed_updates)
+
+    async def set_webhook(restaurant_id: int, tenant_bot: Bot):
+        webhook_url = settings.hook_url_for(restaurant_id)
+        if settings.WEBHOOK_SECRET:
+            # Telegram doesn't return the secret, its fingerprint in the url tells that it has changed
+            webhook_url += f"?v={hashlib.sha256(settings.WEBHOOK_SECRET.encode()).hexdigest()[:12]}"
+        info = await tenant_bot.get_webhook_info()
+        if info.url == webhook_url and sorted(info.allowed_updates or []) == allowed_updates:
+            logger.info(f"Webhook is up to date: {settings.hook_url_for(restaurant_id)}")
+            return
+        await tenant_bot.set_webhook(
+            url=webhook_url,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=False,
+            secret_token=settings.WEBHOOK_SECRET
+        )
+        logger.success(f"Webhook is set: {settings.hook_url_for(restaurant_id)}")
+
+    await asyncio.gather(*(set_webhook(restaurant_id, tenant_bot) for restaurant_id, tenant_bot in bots.items()))
 
 
 def set_russian_locale():
@@ -33,23 +86,34 @@ def set_russian_locale():
             # Игнорируем ошибку, если локаль не поддерживается
             pass
 
-async def start_bot():
-    set_russian_locale()
-    if settings.INIT_DB:
-        await init_db()
+def setup_dispatcher():
+    """
+    Registers middlewares and routers on the dispatcher of the current process, once: app.serve sets it up
+    to register the webhooks, and the app it serves in the same process does it again on startup.
+    The dialog windows are the heaviest import of the bot, they are imported here and not with the module.
+    """
+    global _dispatcher_ready
+    if _dispatcher_ready:
+        return
+    _dispatcher_ready = True
+    from aiogram_dialog import setup_dialogs
+    from app.bot.booking.dialog import booking_dialog
+
     setup_dialogs(dp)
+    dp.update.outer_middleware.register(TenantMiddleware(bots))
+    # Outer, so that dropped updates never open a DB session
+    dp.update.outer_middleware.register(flood_control)
     dp.update.middleware.register(DatabaseMiddlewareWithoutCommit())
     dp.update.middleware.register(DatabaseMiddlewareWithCommit())
-    await set_commands()
     dp.include_router(booking_dialog)
     dp.include_router(user_router)
     dp.include_router(admin_router)
 
-    for admin_id in settings.ADMIN_IDS:
-        try:
-            await bot.send_message(admin_id, f'Я запущен🥳.')
-        except:
-            pass
+
+async def notify_admins_started():
+    """Sent once the app is ready, the pings don't delay the start."""
+    await asyncio.gather(*(bot.send_message(admin_id, f'Я запущен🥳.') for admin_id in settings.ADMIN_IDS),
+                         return_exceptions=True)
     logger.info("Бот успешно запущен.")
 
 
@@ -59,4 +123,5 @@ async def stop_bot():
             await bot.send_message(admin_id, 'Бот остановлен. Why?😔')
     except:
         pass
+    await dp.storage.close()
     logger.error("Бот остановлен!")
\ No newline at end of file
@@ -0,0 +1,86 @@
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+from loguru import logger
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import settings, DEFAULT_RESTAURANT_ID
+from app.DAO.database import async_session_maker
+from app.DAO.models import ProcessedUpdate
+
+
+class UpdateDeduplicator:
+    """
+    Remembers the last `size` (restaurant, update id) pairs: a ring buffer gives the eviction order, a set the lookups.
+    With `shared` on, ids unknown locally are also claimed in Postgres, so that
+    a delivery retried to another instance is dropped as well.
+    """
+
+    def __init__(self, size: int, shared: bool = False):
+        self._order: deque[Tuple[int, int]] = deque()
+        self._seen: set[Tuple[int, int]] = set()
+        self._size = size
+        self._shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.checked = 0
+
+    def _remember(self, key: Tuple[int, int]) -> None:
+        if len(self._order) >= self._size:
+            self._seen.discard(self._order.popleft())
+        self._order.append(key)
+        self._seen.add(key)
+
+    async def _claim_shared(self, restaurant_id: int, update_id: int) -> bool:
+        """Returns False if another instance has already claimed the update."""
+        try:
+            async with async_session_maker() as session:
+                claimed = await session.scalar(
+                    insert(ProcessedUpdate).values(restaurant_id=restaurant_id, update_id=update_id)
+                    .on_conflict_do_nothing().returning(ProcessedUpdate.update_id)
+                )
+                await session.commit()
+                return claimed is not None
+        except SQLAlchemyError as e:
+            # better a rare double delivery than a lost update
+            logger.error(f"Ошибка при проверке обновления {update_id} в БД: {e}")
+            return True
+
+    async def is_duplicate(self, update_id: int, restaurant_id: int = DEFAULT_RESTAURANT_ID) -> bool:
+        """
+        Checks the update id received by the restaurant's bot and remembers it.
+        Returns True for an already accepted update.
+        """
+        self.checked += 1
+        key = (restaurant_id, update_id)
+        if key in self._seen:
+            self.hits += 1
+            return True
+        self._remember(key)
+        if self._shared and not await self._claim_shared(restaurant_id, update_id):
+            self.shared_hits += 1
+            return True
+        return False
+
+    async def cleanup(self, retention_hours: int = settings.DEDUP_RETENTION_HOURS) -> None:
+        """Drops the shared ids older than the retention, Telegram doesn't retry for that long."""
+        if not self._shared:
+            return
+        try:
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    delete(ProcessedUpdate)
+                    .where(ProcessedUpdate.created_at < datetime.now() - timedelta(hours=retention_hours))
+                )
+                await session.commit()
+                logger.info(f"Удалено {result.rowcount} записей обработанных обновлений")
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при очистке обработанных обновлений: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"checked": self.checked, "hits": self.hits, "shared_hits": self.shared_hits,
+                "tracked": len(self._seen)}
+
+
+update_deduplicator = UpdateDeduplicator(settings.DEDUP_SIZE, shared=settings.DEDUP_SHARED)
@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from aiohttp import web
+
+# Methods returning a Message. The webhook and the commands are kept per token, anything else gets `true`
+MESSAGE_METHODS = {"sendmessage", "editmessagetext", "editmessagereplymarkup", "senddocument", "sendphoto"}
+
+
+class FakeBotAPI:
+    """
+    In-process stub of the Telegram Bot API for load tests of the outbound calls.
+    Every request waits `latency` (+ up to `jitter`) seconds, a `rate_limited` share
+    of the requests is answered with 429 and retry_after.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, rate_limited: float = 0.0,
+                 retry_after: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+        self.requests = 0
+        self.limited = 0
+        self._message_ids = itertools.count(1)
+        self.webhooks: dict = {}
+        self.commands: dict = {}
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/bot{token}/{method}", self.handle)
+        return app
+
+    def _message(self, params) -> dict:
+        chat_id = int(params.get("chat_id") or 0)
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text", ""),
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if self.rate_limited and random.random() < self.rate_limited:
+            self.limited += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        method = request.match_info["method"].lower()
+        token = request.match_info["token"]
+        params = await request.post()
+        if method == "getme":
+            result = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        elif method in MESSAGE_METHODS:
+            result = self._message(params)
+        elif method == "setwebhook":
+            self.webhooks[token] = {"url": params.get("url", ""),
+                                    "allowed_updates": json.loads(params.get("allowed_updates") or "null")}
+            result = True
+        elif method == "deletewebhook":
+            self.webhooks.pop(token, None)
+            result = True
+        elif method == "getwebhookinfo":
+            webhook = self.webhooks.get(token, {"url": "", "allowed_updates": None})
+            result = {"url": webhook["url"], "has_custom_certificate": False, "pending_update_count": 0}
+            if webhook["allowed_updates"] is not None:
+                result["allowed_updates"] = webhook["allowed_updates"]
+        elif method == "setmycommands":
+            self.commands[token, params.get("scope"), params.get("language_code")] = json.loads(params["commands"])
+            result = True
+        elif method == "getmycommands":
+            result = self.commands.get((token, params.get("scope"), params.get("language_code")), [])
+        elif method == "deletemycommands":
+            self.commands.pop((token, params.get("scope"), params.get("language_code")), None)
+            result = True
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> web.AppRunner:
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limited", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeBotAPI(latency=args.latency, jitter=args.jitter, rate_limited=args.rate_limited)
+    web.run_app(fake.app(), host="127.0.0.1", port=args.port)
@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from loguru import logger
+from app.config import settings
+
+# Cost of a press, by callback data prefix or dialog widget id. Everything else costs 1 token
+CALLBACK_COSTS = {
+    "my_booking_all": 3,
+    "my_bookings": 2,
+    "admin_bookings_stats": 3,
+    "admin_users_stats": 2,
+    "admin_stats_": 3,
+    "admin_export_": 10,
+    "cal": 2,
+    "search_nearest": 3,
+}
+# aiogram_dialog packs widget callbacks as "<intent id>\x1d<widget id>:<data>"
+DIALOG_CALLBACK_SEP = "\x1d"
+
+
+def callback_cost(data: str | None) -> float:
+    if not data:
+        return 1
+    key = data.rsplit(DIALOG_CALLBACK_SEP, 1)[-1]
+    for prefix, cost in CALLBACK_COSTS.items():
+        if key.startswith(prefix):
+            return cost
+    return 1
+
+
+class FloodControlMiddleware(BaseMiddleware):
+    """
+    Outer update middleware limiting every user with a token bucket.
+    Users idle longer than `ttl` are evicted, the table never grows past `max_users`.
+    """
+
+    def __init__(self, rate: float, burst: float, ttl: float, max_users: int):
+        self._rate = rate
+        self._burst = burst
+        self._ttl = ttl
+        self._max_users = max_users
+        self._buckets: OrderedDict[int, list] = OrderedDict()  # user_id -> [tokens, last refill]
+        self.rejected = 0
+
+    def _evict(self, now: float) -> None:
+        while self._buckets:
+            _, (_, last) = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self._max_users and now - last < self._ttl:
+                break
+            self._buckets.popitem(last=False)
+
+    def allow(self, user_id: int, cost: float) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = [self._burst, now]
+        else:
+            self._buckets.move_to_end(user_id)
+            bucket[0] = min(self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+            bucket[1] = now
+        self._evict(now)
+        if bucket[0] < cost:
+            return False
+        bucket[0] -= cost
+        return True
+
+    async def __call__(
+            self,
+            handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+            event: Update,
+            data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+        callback = event.callback_query
+        if self.allow(user.id, callback_cost(callback.data) if callback else 1):
+            return await handler(event, data)
+        self.rejected += 1
+        logger.info(f"Flood control: update of user {user.id} dropped")
+        if callback:
+            await callback.answer("Слишком много нажатий, подождите немного ⏳")
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {"users": len(self._buckets), "rejected": self.rejected}
+
+
+flood_control = FloodControlMiddleware(rate=settings.FLOOD_RATE, burst=settings.FLOOD_BURST,
+                                       ttl=settings.FLOOD_TTL, max_users=settings.FLOOD_MAX_USERS)
@@ -0,0 +1,45 @@
+import ssl
+from typing import Any
+
+import certifi
+from aiohttp import ClientSession, TCPConnector
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from aiogram import __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from app.config import settings
+
+
+class PooledAiohttpSession(AiohttpSession):
+    """
+    AiohttpSession whose aiohttp session is built with a TCPConnector configured in full:
+    aiogram itself only takes the total `limit` of connections.
+    """
+
+    def __init__(self, limit: int, limit_per_host: int, keepalive_timeout: float, ttl_dns_cache: int,
+                 **kwargs: Any):
+        super().__init__(limit=limit, **kwargs)
+        self._connector_options = {"limit": limit, "limit_per_host": limit_per_host,
+                                   "keepalive_timeout": keepalive_timeout, "ttl_dns_cache": ttl_dns_cache}
+
+    async def create_session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(ssl=ssl.create_default_context(cafile=certifi.where()),
+                                     **self._connector_options)
+            self._session = ClientSession(connector=connector,
+                                          headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"})
+        return self._session
+
+
+def create_bot_session() -> AiohttpSession:
+    """
+    Builds the HTTP session of the Bot from the settings: connection pool size,
+    keep-alive, DNS cache and request timeout of the outbound Bot API calls.
+    BOT_API_URL points the bot to a local Bot API server (or the fake one, see fake_api.py).
+    """
+    api = TelegramAPIServer.from_base(settings.BOT_API_URL) if settings.BOT_API_URL else PRODUCTION
+    return PooledAiohttpSession(limit=settings.BOT_HTTP_POOL_SIZE, limit_per_host=settings.BOT_HTTP_POOL_SIZE,
+                                keepalive_timeout=settings.BOT_HTTP_KEEPALIVE, ttl_dns_cache=settings.BOT_HTTP_DNS_TTL,
+                                api=api, timeout=settings.BOT_HTTP_TIMEOUT)
+
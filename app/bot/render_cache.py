@@ -0,0 +1,40 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+from app.config import settings
+
+
+class RenderCache:
+    """
+    Bounded LRU cache of rendered window data, with hit-rate stats.
+    Every restaurant has its own LRU of `maxsize` entries, a busy venue doesn't evict the others.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self._maxsize = maxsize
+        self._data: Dict[int, OrderedDict[Hashable, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, restaurant_id: int, key: Hashable, build: Callable[[], Any]) -> Any:
+        data = self._data.setdefault(restaurant_id, OrderedDict())
+        value = data.get(key)
+        if value is not None:
+            data.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = data[key] = build()
+        if len(data) > self._maxsize:
+            data.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"name": self.name, "size": sum(len(data) for data in self._data.values()),
+                "restaurants": len(self._data), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+
+tables_render_cache = RenderCache("tables", settings.RENDER_CACHE_SIZE)
+slots_render_cache = RenderCache("slots", settings.RENDER_CACHE_SIZE)
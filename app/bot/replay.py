@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if len(latencies) < 2:
+        value = latencies[0] * 1000 if latencies else 0.0
+        return {"p50": value, "p90": value, "p99": value, "max": value}
+    cuts = statistics.quantiles(latencies, n=100)
+    return {"p50": cuts[49] * 1000, "p90": cuts[89] * 1000, "p99": cuts[98] * 1000, "max": max(latencies) * 1000}
+
+
+async def replay(path: str, speed: float, concurrency: int, api_port: int, api_latency: float,
+                 flood_control: bool = False) -> None:
+    """
+    Feeds a capture of app.bot.capture into the dispatcher of this process, preserving the gaps
+    between the updates divided by `speed` (0 - as fast as possible, at most `concurrency` at once).
+    The bots talk to an in-process FakeBotAPI; the database and the broker are the ones of the settings,
+    use a disposable local Postgres: the replayed bookings are real.
+    The flood control is off unless asked for, a sped up replay would trip it.
+    """
+    from loguru import logger
+    from app.bot.capture import read_capture
+    from app.bot.fake_api import FakeBotAPI
+
+    records = list(read_capture(path))
+    if not records:
+        logger.warning(f"Capture {path} is empty")
+        return
+    runner = await FakeBotAPI(latency=api_latency).start(port=api_port)
+    # before the settings are loaded, so that the bots are built against the fake API
+    os.environ["BOT_API_URL"] = f"http://127.0.0.1:{api_port}"
+    if not flood_control:
+        os.environ["FLOOD_RATE"] = os.environ["FLOOD_BURST"] = str(10 ** 9)
+
+    from aiogram.types import Update
+    from app.bot.create_bot import bots, bot, bot_session, dp, setup_dispatcher, set_russian_locale
+    from app.bot.updates import peek_update_type
+    from app.config import broker
+    from app.DAO.holds import slot_holds
+
+    set_russian_locale()
+    setup_dispatcher()
+    await broker.start()
+    slot_holds.start()
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    failed = 0
+    limit = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    async def handle(restaurant_id: int, raw: bytes):
+        nonlocal failed
+        async with limit:
+            started = time.perf_counter()
+            try:
+                tenant_bot = bots.get(restaurant_id, bot)
+                await dp.feed_update(tenant_bot, Update.model_validate_json(raw, context={"bot": tenant_bot}))
+            except Exception as e:
+                failed += 1
+                logger.error(f"Replayed update failed: {e}")
+            latencies[peek_update_type(raw) or "unknown"].append(time.perf_counter() - started)
+
+    first_arrival = records[0][0]
+    replay_started = time.perf_counter()
+    for arrived, restaurant_id, raw in records:
+        if speed > 0:
+            delay = (arrived - first_arrival) / speed - (time.perf_counter() - replay_started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(handle(restaurant_id, raw)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - replay_started
+
+    await slot_holds.stop()
+    await broker.close()
+    await bot_session.close()
+    await runner.cleanup()
+
+    captured = records[-1][0] - first_arrival
+    logger.info(f"Replayed {len(records)} updates ({captured:.1f}s captured) in {elapsed:.2f}s: "
+                f"{len(records) / elapsed:.1f} updates/s, {failed} failed")
+    every = [latency for values in latencies.values() for latency in values]
+    for update_type, values in [("all", every), *sorted(latencies.items())]:
+        stats = percentiles(values)
+        logger.info(f"{update_type:>16}: {len(values):>6} updates, " +
+                    ", ".join(f"{name} {value:.1f} ms" for name, value in stats.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a captured webhook traffic against this build")
+    parser.add_argument("capture", help="a .jsonl.gz file recorded with CAPTURE_PATH")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 - real time, N - N times faster, 0 - max")
+    parser.add_argument("--concurrency", type=int, default=100, help="updates handled at once")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds per fake Bot API call")
+    parser.add_argument("--flood-control", action="store_true", help="keep the flood control on")
+    args = parser.parse_args()
+    asyncio.run(replay(args.capture, args.speed, args.concurrency, args.api_port, args.api_latency,
+                       args.flood_control))
@@ -0,0 +1,22 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import Update
+
+
+class TenantMiddleware(BaseMiddleware):
+    """
+    Outer update middleware resolving the restaurant from the bot that received the update.
+    Handlers get it as `restaurant_id`.
+    """
+
+    def __init__(self, bots: Dict[int, Bot]):
+        self._restaurants = {bot.id: restaurant_id for restaurant_id, bot in bots.items()}
+
+    async def __call__(
+            self,
+            handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+            event: Update,
+            data: Dict[str, Any]
+    ) -> Any:
+        data["restaurant_id"] = self._restaurants[data["bot"].id]
+        return await handler(event, data)
@@ -0,0 +1,36 @@
+import re
+
+# Telegram puts the update type right after update_id: {"update_id":1,"message":{...}}
+UPDATE_TYPE_RE = re.compile(rb'^\s*\{\s*"update_id"\s*:\s*\d+\s*,\s*"(\w+)"')
+UPDATE_ID_RE = re.compile(rb'"update_id"\s*:\s*(\d+)')
+# Telegram puts "id" first in chat and user objects; the first chat of an update is its own
+# (or the one of the message of a callback query), nested replies come after it
+CHAT_ID_RE = re.compile(rb'"chat"\s*:\s*\{\s*"id"\s*:\s*(-?\d+)')
+FROM_ID_RE = re.compile(rb'"(?:from|user)"\s*:\s*\{\s*"id"\s*:\s*(\d+)')
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def peek_update_type(raw: bytes) -> str | None:
+    """
+    Reads the update type from the head of the raw payload without parsing it.
+    Returns None when the payload doesn't have the usual layout.
+    """
+    match = UPDATE_TYPE_RE.match(raw[:128])
+    return match.group(1).decode() if match else None
+
+
+def peek_chat_id(raw: bytes) -> int | None:
+    """
+    Reads the chat id (or the user id, if there is no chat) from the raw payload without parsing it.
+    Returns None when neither is found.
+    """
+    match = CHAT_ID_RE.search(raw) or FROM_ID_RE.search(raw)
+    return int(match.group(1)) if match else None
+
+
+def peek_update_id(raw: bytes) -> int | None:
+    """Reads update_id from the head of the raw payload without parsing it."""
+    match = UPDATE_ID_RE.search(raw, 0, 64)
+    return int(match.group(1)) if match else None
+
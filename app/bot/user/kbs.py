@@ -1,16 +1,23 @@
+from functools import lru_cache
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from app.config import settings
+from app.config import admin_ids
 
 
 def main_user_kb(user_id: int) -> InlineKeyboardMarkup:
+    return _main_user_kb(user_id in admin_ids)
+
+
+@lru_cache(maxsize=None)
+def _main_user_kb(is_admin: bool) -> InlineKeyboardMarkup:
+    """Built once per variant, the markup is shared between all users."""
     kb = InlineKeyboardBuilder()
 
     kb.add(InlineKeyboardButton(text="🍽️ Забронировать столик", callback_data="book_table"))
     kb.add(InlineKeyboardButton(text="📅 Мои брони", callback_data="my_bookings"))
     kb.add(InlineKeyboardButton(text="ℹ️ О нас", callback_data="about_us"))
 
-    if user_id in settings.ADMIN_IDS:
+    if is_admin:
         kb.add(InlineKeyboardButton(text="🔐 Админ-панель", callback_data="admin_panel"))
 
     kb.adjust(1)
@@ -18,22 +25,31 @@ def main_user_kb(user_id: int) -> InlineKeyboardMarkup:
 
 
 def user_booking_kb(user_id: int, book: bool = False) -> InlineKeyboardMarkup:
+    return _user_booking_kb(user_id in admin_ids, book)
+
+
+@lru_cache(maxsize=None)
+def _user_booking_kb(is_admin: bool, book: bool) -> InlineKeyboardMarkup:
+    """Built once per variant, the markup is shared between all users."""
     kb = InlineKeyboardBuilder()
     if book:
         kb.add(InlineKeyboardButton(text="🎫 Мои брони", callback_data="my_booking_all"))
     kb.add(InlineKeyboardButton(text="🍽️ Забронировать столик", callback_data="book_table"))
     kb.add(InlineKeyboardButton(text="🏠 На главную", callback_data="back_home"))
-    if user_id in settings.ADMIN_IDS:
+    if is_admin:
         kb.add(InlineKeyboardButton(text="🔐 Админ-панель", callback_data="admin_panel"))
     kb.adjust(1)
     return kb.as_markup()
 
-
-def cancel_book_kb(book_id: int, cancel: bool = False, home_page: bool = False) -> InlineKeyboardMarkup:
+def cancel_book_kb(book_id: int, cancel: bool = False, home_page: bool = False,
+                   archived: bool = False, next_offset: int | None = None) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     if cancel:
         kb.add(InlineKeyboardButton(text="Отменить бронь", callback_data=f"cancel_book_{book_id}"))
-    kb.add(InlineKeyboardButton(text="Удалить запись", callback_data=f"dell_book_{book_id}"))
+    if not archived:
+        kb.add(InlineKeyboardButton(text="Удалить запись", callback_data=f"dell_book_{book_id}"))
+    if next_offset is not None:
+        kb.add(InlineKeyboardButton(text="⬇️ Показать еще", callback_data=f"my_booking_all_{next_offset}"))
     if home_page:
         kb.add(InlineKeyboardButton(text="🏠 На главную", callback_data="back_home"))
     kb.adjust(1)
@@ -1,3 +1,4 @@
+from functools import partial
 from aiogram import F
 from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
@@ -9,8 +10,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.bot.booking.state import BookingState
 from app.bot.user.kbs import main_user_kb, user_booking_kb, cancel_book_kb
 from app.bot.user.schemas import SUser
+from app.bot.waitlist import promote_waitlist
 from app.DAO.dao import UserDAO, BookingDAO
-from app.config import broker
+from app.DAO.database_middleware import after_commit
+from app.DAO.models import BookingArchive
+from app.config import broker, settings
 
 router = Router()
 
@@ -49,9 +53,11 @@ async def cmd_about(call: CallbackQuery):
 
 
 @router.callback_query(F.data == "my_bookings")
-async def show_my_bookings(call: CallbackQuery, session_without_commit: AsyncSession):
+async def show_my_bookings(call: CallbackQuery, session_without_commit: AsyncSession, restaurant_id: int):
     await call.answer("Мои брони")
-    user_filter = create_model('UserIDModel', user_id=(int, ...))(user_id=call.from_user.id)
+    user_filter = create_model('UserIDModel', user_id=(int, ...), restaurant_id=(int, ...))(
+        user_id=call.from_user.id, restaurant_id=restaurant_id
+    )
     my_bookings = await BookingDAO(session_without_commit).find_all(user_filter)
     count_booking = len(my_bookings)
     if count_booking:
@@ -64,21 +70,30 @@ async def show_my_bookings(call: CallbackQuery, session_without_commit: AsyncSes
                 f"Не проблема!  Вы можете забронировать столик прямо сейчас, нажав на кнопку ниже. 😉👇")
     await call.message.edit_text(text, reply_markup=user_booking_kb(call.from_user.id, book))
 
-@router.callback_query(F.data == "my_booking_all")
-async def show_all_my_bookings(call: CallbackQuery, session_without_commit: AsyncSession):
+@router.callback_query(F.data.startswith("my_booking_all"))
+async def show_all_my_bookings(call: CallbackQuery, session_without_commit: AsyncSession, restaurant_id: int):
     await call.answer("Все мои брони")
-    user_bookings = await BookingDAO(session_without_commit).get_bookings_with_details(call.from_user.id)
+    # "my_booking_all_<offset>" comes from the "show more" button of the previous page
+    offset = int(call.data.split("_")[-1]) if call.data != "my_booking_all" else 0
+    page_size = settings.BOOKINGS_PAGE_SIZE
+    user_bookings = await BookingDAO(session_without_commit).get_bookings_with_details(call.from_user.id,
+                                                                                     restaurant_id=restaurant_id,
+                                                                                     limit=page_size,
+                                                                                     offset=offset)
 
     if not user_bookings:
-        await call.message.edit_text("😔 У вас пока нет активных бронирований.", reply_markup=None)
+        if offset:
+            await call.message.answer("Больше броней нет.", reply_markup=main_user_kb(call.from_user.id))
+        else:
+            await call.message.edit_text("😔 У вас пока нет активных бронирований.", reply_markup=None)
         return
 
     for i, book in enumerate(user_bookings):
         # Format date for  convenient usage
         booking_date = book.date.strftime("%d.%m.%Y")  # Day.Month.Year
-        start_time = book.time_slot.start_time
-        end_time = book.time_slot.end_time
-        booking_number = i + 1
+        start_time = book.start_time.strftime("%H:%M")
+        end_time = book.end_time.strftime("%H:%M")
+        booking_number = offset + i + 1
         status = book.status
         cancel = False
         home_page = False
@@ -95,26 +110,37 @@ async def show_all_my_bookings(call: CallbackQuery, session_without_commit: Asyn
                         f"🪑 <b>Столик:</b> №{book.table.id}, Вместимость: {book.table.capacity}\n"
                         f"ℹ️ <b>Описание:</b> {book.table.description}\n"
                         f"📌 <b>Статус:</b> {status_text}\n\n")
-        if booking_number == len(user_bookings):
+        next_offset = None
+        if i == len(user_bookings) - 1:
             home_page = True
-        await call.message.answer(message_text, reply_markup=cancel_book_kb(book.id, cancel, home_page))
+            if len(user_bookings) == page_size:
+                next_offset = offset + page_size
+        archived = isinstance(book, BookingArchive)
+        await call.message.answer(message_text, reply_markup=cancel_book_kb(book.id, cancel, home_page,
+                                                                           archived, next_offset))
 
 @router.callback_query(F.data.startswith("cancel_book_"))
-async def cancel_booking(call: CallbackQuery, session_with_commit: AsyncSession):
+async def cancel_booking(call: CallbackQuery, session_with_commit: AsyncSession, restaurant_id: int):
     book_id = int(call.data.split("_")[-1])
     booking_dao = BookingDAO(session_with_commit)
-    await booking_dao.cancel_reservation(book_id)
+    freed = await booking_dao.cancel_reservation(book_id, restaurant_id)
+    await promote_waitlist(session_with_commit, call.bot, freed)
     await call.answer("Бронь отменена!", show_alert=True)
-    await broker.publish(f"Пользователь отменил запись о брони с ID {book_id}", "admin_msg")
+    after_commit(session_with_commit,
+                 partial(broker.publish, {"msg": f"Пользователь отменил запись о брони с ID {book_id}",
+                                          "restaurant_id": restaurant_id}, "admin_msg"))
     await call.message.edit_reply_markup(reply_markup=cancel_book_kb(book_id))
 
 
 @router.callback_query(F.data.startswith("dell_book_"))
-async def delete_booking(call: CallbackQuery, session_with_commit: AsyncSession):
+async def delete_booking(call: CallbackQuery, session_with_commit: AsyncSession, restaurant_id: int):
     book_id = int(call.data.split("_")[-1])
-    await BookingDAO(session_with_commit).cancel_reservation(book_id)
+    freed = await BookingDAO(session_with_commit).delete_booking(book_id, restaurant_id)
+    await promote_waitlist(session_with_commit, call.bot, freed)
     await call.answer("Запись о брони удалена!", show_alert=True)
-    await broker.publish(f"Пользователь удалил запись о брони с ID {book_id}", "admin_msg")
+    after_commit(session_with_commit,
+                 partial(broker.publish, {"msg": f"Пользователь удалил запись о брони с ID {book_id}",
+                                          "restaurant_id": restaurant_id}, "admin_msg"))
     await call.message.delete()
 
 
@@ -0,0 +1,62 @@
+from datetime import datetime
+from functools import partial
+from typing import Dict, Iterable
+from aiogram import Bot
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import broker
+from app.DAO.dao import WaitlistDAO
+from app.DAO.database_middleware import after_commit
+
+
+class PromotionStats:
+    """Promotions done since the start and the time the promoted guests have waited."""
+
+    def __init__(self):
+        self.promoted = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe(self, waited: float) -> None:
+        self.promoted += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def stats(self) -> Dict[str, float]:
+        return {"promoted": self.promoted,
+                "wait_seconds_avg": self.wait_seconds_total / self.promoted if self.promoted else 0,
+                "wait_seconds_max": self.wait_seconds_max}
+
+
+promotion_stats = PromotionStats()
+
+
+async def _notify_promoted(bot: Bot, user_id: int, text: str, admin_text: str, restaurant_id: int,
+                           waited: float) -> None:
+    promotion_stats.observe(waited)
+    try:
+        await bot.send_message(user_id, text)
+    except Exception as e:
+        logger.error(f"Не удалось уведомить пользователя {user_id} о брони из листа ожидания: {e}")
+    await broker.publish({"msg": admin_text, "restaurant_id": restaurant_id}, "admin_msg")
+
+
+async def promote_waitlist(session: AsyncSession, bot: Bot, freed: Iterable) -> None:
+    """
+    Offers the slots freed by a cancellation or a deletion to the waitlist, in the same transaction.
+    The promoted guest gets the booking right away, and a message about it once the transaction is committed.
+    """
+    for table_id, booking_date, time_slot_id in freed:
+        promoted = await WaitlistDAO(session).promote(table_id, booking_date, time_slot_id)
+        if promoted is None:
+            continue
+        entry, booking = promoted
+        text = (f"🎉 Освободилось место, которого вы ждали! Столик №{booking.table_id} забронирован на "
+                f"{booking.date:%d.%m.%Y} с {booking.start_time:%H:%M} до {booking.end_time:%H:%M}. "
+                "Бронь можно посмотреть или отменить в меню 'МОИ БРОНИ'")
+        admin_text = (f"Пользователь с ID {entry.user_id} получил столик №{booking.table_id} "
+                      f"на {booking.date} из листа ожидания")
+        waited = (datetime.now() - entry.created_at).total_seconds()
+        # the objects expire with the commit, the callback only gets plain values
+        after_commit(session, partial(_notify_promoted, bot, entry.user_id, text, admin_text, booking.restaurant_id,
+                                      waited))
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import multiprocessing
+import time
+from typing import Dict, List
+
+from loguru import logger
+
+from app.bot.updates import peek_chat_id
+
+# Slots of the per-worker counters stored in shared memory
+RECEIVED, PROCESSED, FAILED, IN_FLIGHT, BUSY_MS = range(5)
+STATS_FIELDS = ("received", "processed", "failed", "in_flight", "busy_ms")
+
+
+def extract_chat_id(update: dict) -> int:
+    """
+    Finds the chat id (or the user id, if there is no chat) of an update
+    without building the aiogram model.
+    """
+    for key, payload in update.items():
+        if not isinstance(payload, dict):
+            continue
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+        user = payload.get("from") or payload.get("user")
+        if user and "id" in user:
+            return user["id"]
+    return 0
+
+
+def _run_worker(index: int, queue: multiprocessing.Queue, stats) -> None:
+    """Entry point of a worker process: its own event loop, Bot and Dispatcher."""
+    asyncio.run(_worker_loop(index, queue, stats))
+
+
+async def _worker_loop(index: int, queue: multiprocessing.Queue, stats) -> None:
+    # Heavy imports happen in the child process only
+    from aiogram.types import Update
+    from app.bot.create_bot import bots, bot_session, dp, setup_dispatcher, set_russian_locale
+    from app.config import broker
+    from app.DAO.replicas import replica_router
+    from app.DAO.holds import slot_holds
+
+    set_russian_locale()
+    setup_dispatcher()
+    await broker.start()
+    replica_router.start()
+    slot_holds.start()
+    logger.info(f"Dispatch worker {index} is started")
+    tasks = set()
+
+    async def handle(restaurant_id: int, raw: bytes):
+        started = time.perf_counter()
+        try:
+            bot = bots[restaurant_id]
+            update = Update.model_validate_json(raw, context={"bot": bot})
+            await dp.feed_update(bot, update)
+            with stats.get_lock():
+                stats[PROCESSED] += 1
+        except Exception as e:
+            logger.error(f"Worker {index} failed to process the update: {e}")
+            with stats.get_lock():
+                stats[FAILED] += 1
+        finally:
+            with stats.get_lock():
+                stats[IN_FLIGHT] -= 1
+                stats[BUSY_MS] += int((time.perf_counter() - started) * 1000)
+
+    try:
+        while True:
+            item = await asyncio.to_thread(queue.get)
+            if item is None:
+                break
+            task = asyncio.create_task(handle(*item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await broker.close()
+        await replica_router.stop()
+        await slot_holds.stop()
+        await bot_session.close()
+        logger.info(f"Dispatch worker {index} is stopped")
+
+
+class ShardedDispatcher:
+    """
+    Spreads webhook updates over N worker processes by chat id,
+    so that one user's dialog is always handled by the same worker.
+    Every worker has its own availability cache, render caches and table catalog, they are not
+    invalidated across workers: a worker may show a slot booked through another one until its
+    AVAILABILITY_CACHE_TTL runs out (the booking itself is still rejected by the database).
+    Holds are shared only with HOLDS_SHARED.
+    """
+
+    def __init__(self, workers: int):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._size = workers
+        self._queues: List[multiprocessing.Queue] = []
+        self._stats = []
+        self._processes = []
+
+    def start(self) -> None:
+        for index in range(self._size):
+            queue = self._ctx.Queue()
+            stats = self._ctx.Array("q", len(STATS_FIELDS))
+            process = self._ctx.Process(target=_run_worker, args=(index, queue, stats),
+                                        name=f"dispatch-worker-{index}", daemon=True)
+            process.start()
+            self._queues.append(queue)
+            self._stats.append(stats)
+            self._processes.append(process)
+        logger.info(f"Started {self._size} dispatch workers")
+
+    async def stop(self, timeout: float = 10) -> None:
+        """
+        Lets the workers finish their queues, `timeout` seconds for all of them together.
+        The joins run in a thread, the event loop keeps closing the other services meanwhile.
+        """
+        for queue in self._queues:
+            queue.put(None)
+        deadline = time.monotonic() + timeout
+
+        def join() -> None:
+            for process in self._processes:
+                process.join(max(0.0, deadline - time.monotonic()))
+                if process.is_alive():
+                    process.terminate()
+
+        await asyncio.to_thread(join)
+        logger.info("Dispatch workers are stopped")
+
+    def shard_for(self, chat_id: int) -> int:
+        return hash(chat_id) % self._size
+
+    def submit(self, raw: bytes, restaurant_id: int) -> int:
+        """
+        Routes the raw update body received by the restaurant's bot to the worker owning its chat.
+        Returns the worker index.
+        """
+        # the front process only scans for the chat id, the parsing is left to the worker
+        chat_id = peek_chat_id(raw)
+        if chat_id is None:
+            chat_id = extract_chat_id(json.loads(raw))
+        index = self.shard_for(chat_id)
+        stats = self._stats[index]
+        with stats.get_lock():
+            stats[RECEIVED] += 1
+            stats[IN_FLIGHT] += 1
+        self._queues[index].put((restaurant_id, raw))
+        return index
+
+    def metrics(self) -> List[Dict[str, int]]:
+        result = []
+        for index, (process, stats) in enumerate(zip(self._processes, self._stats)):
+            with stats.get_lock():
+                values = dict(zip(STATS_FIELDS, stats[:]))
+            values.update(worker=index, pid=process.pid, alive=process.is_alive())
+            result.append(values)
+        return result
@@ -1,32 +1,95 @@
 import os
-from typing import List
+from functools import cache
+from typing import Dict, List
 from urllib.parse import quote
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from faststream.rabbit import RabbitBroker
 from loguru import logger
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+DEFAULT_RESTAURANT_ID = 1
+
+
 class Settings(BaseSettings):
-    BOT_TOKEN: str
+    BOT_TOKEN: str  # the bot of the first restaurant
+    BOT_TOKENS: Dict[int, str] = {}  # bots of the other restaurants served by this deployment, {restaurant_id: token}
+    BOT_API_URL: str | None = None  # e.g. http://127.0.0.1:8081 for a local or fake Bot API server
+    BOT_HTTP_POOL_SIZE: int = 100  # connections to the Bot API
+    BOT_HTTP_KEEPALIVE: float = 30  # seconds an idle connection is kept open
+    BOT_HTTP_DNS_TTL: int = 3600  # seconds
+    BOT_HTTP_TIMEOUT: float = 30  # seconds per request
     ADMIN_IDS: List[int]
     INIT_DB: bool
     FORMAT_LOG: str = "{time:YYYY-MM-DD at HH:mm:ss} | {level} | {message}"
     LOG_ROTATION: str = "10 MB"
     DB_URL: str
+    DB_REPLICA_URLS: List[str] = []  # read-only sessions are routed to these replicas when set
+    REPLICA_STRATEGY: str = "round_robin"  # or "least_loaded"
+    REPLICA_MAX_LAG: float = 5  # seconds, lagging replicas are skipped
+    REPLICA_CHECK_INTERVAL: float = 10  # seconds between replica health checks
+    REPLICA_STICKY_SECONDS: float = 10  # a user reads from the primary for this long after a write
     DB_PASSWORD: str
     STORE_URL: str
     TABLES_JSON: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DAO", "tables.json")
     SLOTS_JSON: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DAO", "slots.json")
 
     BASE_URL: str
+    WEBHOOK_SECRET: str | None = None  # checked against X-Telegram-Bot-Api-Secret-Token when set
     RABBITMQ_USERNAME: str
     RABBITMQ_PASSWORD: str
     RABBITMQ_HOST: str
     RABBITMQ_PORT: int
     VHOST: str
 
+    # 0 - updates are handled in the webhook process. The workers' caches are not invalidated across workers
+    DISPATCH_WORKERS: int = 0
+    SEARCH_DAYS: int = 7  # how many days ahead the "nearest free slot" search looks
+    SEARCH_LIMIT: int = 10
+    AVAILABILITY_CACHE_TTL: int = 60  # seconds
+    PARTITION_MONTHS_AHEAD: int = 3  # monthly partitions of bookings created in advance
+    ARCHIVE_RETENTION_DAYS: int = 180  # finished bookings older than this are moved to the archive
+    BOOKINGS_PAGE_SIZE: int = 5
+    STATS_DAYS: int = 30  # period of the admin time-series stats
+    STATS_REFRESH_DAYS: int = 2  # days of the rollup recalculated by the periodic sweep
+    ADMIN_API_TOKEN: str | None = None  # admin API endpoints are disabled without it
+    EXPORT_BATCH_SIZE: int = 1000  # rows fetched from the server-side cursor at once
+    RENDER_CACHE_SIZE: int = 1024  # entries per cache of rendered booking windows
+    CATALOG_TTL: float = 60  # seconds, the table catalog of a process is re-read to see the changes made elsewhere
+    SINGLE_FLIGHT: bool = True  # identical concurrent DAO reads share one query
+    FLOOD_RATE: float = 1  # tokens per second refilled to every user
+    FLOOD_BURST: float = 8  # bucket size, presses allowed in a row
+    FLOOD_TTL: float = 600  # seconds, idle users are forgotten
+    FLOOD_MAX_USERS: int = 100_000  # upper bound of the flood control state table
+    DEDUP_SIZE: int = 10_000  # last update ids remembered by every instance
+    DEDUP_SHARED: bool = False  # also claim update ids in Postgres (several bot instances)
+    DEDUP_RETENTION_HOURS: int = 24
+    HOLD_TTL: float = 120  # seconds a picked slot is kept for the guest confirming it
+    HOLD_TICK: float = 1  # resolution of the hold expiry
+    FSM_STORAGE_URL: str | None = None  # redis://..., dialog state shared by the processes, in memory when not set
+    HOLDS_SHARED: bool = False  # keep the holds in Postgres, needed with several instances or DISPATCH_WORKERS
+    CLOSURE_NOTIFY_RATE: float = Field(25, gt=0)  # messages per second, Telegram allows about 30
+    CLOSURE_NOTIFY_CONCURRENCY: int = Field(20, gt=0)
+    CLOSURE_PROGRESS_INTERVAL: float = 3  # seconds between the progress reports
+    CLOSURE_JOB_TTL: float = 3600  # seconds the progress of a finished closure can still be read
+    CAPTURE_PATH: str | None = None  # webhook updates are recorded to this .jsonl.gz file when set
+    CAPTURE_SALT: str | None = None  # key of the user id pseudonyms, random per process when not set
+
+    # production launcher, python -m app.serve
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    # Several workers are separate processes: the dialog state, the holds and the seen update ids must be shared,
+    # app.serve refuses to start them without FSM_STORAGE_URL, HOLDS_SHARED and DEDUP_SHARED. The partitions,
+    # init_db and the scheduler run in one elected owner process (app.DAO.owner) whatever the count.
+    SERVER_WORKERS: int = 1
+    SERVER_BACKLOG: int = 2048  # pending connections of the listening socket
+    SERVER_KEEPALIVE: int = 30  # seconds an idle HTTP connection is kept open
+    SERVER_ACCESS_LOG: bool = False
+    OWNER_RETRY_INTERVAL: float = 30  # seconds between the attempts of the other processes to take over the owner
+    SCHEDULER_WAKEUP_INTERVAL: float = 30  # seconds, the owner picks up the jobs stored by the other processes
+    SET_WEBHOOK_ON_STARTUP: bool = True  # the launcher registers the webhooks once and turns it off for the workers
+    PROFILE_MAX_SECONDS: float = 300  # longest profile allowed by /debug/profile/start
+
     @property
     def rabbitmq_url(self) -> str:
         return (
@@ -39,6 +102,15 @@ class Settings(BaseSettings):
         """Возвращает URL вебхука"""
         return f"{self.BASE_URL}/webhook"
 
+    @property
+    def bot_tokens(self) -> Dict[int, str]:
+        """Токены ботов всех ресторанов: {restaurant_id: token}"""
+        return {DEFAULT_RESTAURANT_ID: self.BOT_TOKEN, **self.BOT_TOKENS}
+
+    def hook_url_for(self, restaurant_id: int) -> str:
+        """Возвращает URL вебхука бота ресторана"""
+        return f"{self.BASE_URL}/webhook/{restaurant_id}"
+
     model_config = SettingsConfigDict(
         env_file=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env")
     )
@@ -46,6 +118,7 @@ class Settings(BaseSettings):
 
 # Инициализация конфигурации
 settings = Settings()
+admin_ids = frozenset(settings.ADMIN_IDS)
 
 # Настройка логирования
 log_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log.txt")
@@ -55,4 +128,10 @@ logger.add(log_file_path, format=settings.FORMAT_LOG, level="INFO", rotation=set
 broker = RabbitBroker(url=settings.rabbitmq_url)
 
 # Создание планировщика задач
-scheduler = AsyncIOScheduler(jobstores={'default': SQLAlchemyJobStore(url=settings.STORE_URL)})
\ No newline at end of file
+@cache
+def get_scheduler():
+    """The scheduler is created, and apscheduler imported, on the first use, off the import of the app"""
+    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    return AsyncIOScheduler(jobstores={'default': SQLAlchemyJobStore(url=settings.STORE_URL)})
\ No newline at end of file
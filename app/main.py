@@ -1,22 +1,62 @@
+import asyncio
+import importlib
+import secrets
 from contextlib import asynccontextmanager
 
 import uvicorn
 
-from app.bot.create_bot import dp, start_bot, bot, stop_bot
-from app.config import settings, broker, scheduler
+from app.bot.create_bot import (dp, bots, stop_bot, set_webhooks, set_commands, setup_dispatcher,
+                                set_russian_locale, notify_admins_started)
+from app.config import settings, broker, get_scheduler, DEFAULT_RESTAURANT_ID
 from aiogram.types import Update
-from fastapi import FastAPI, Request
+from fastapi import APIRouter, Depends, FastAPI, Request, HTTPException
 from loguru import logger
-from app.api.router import router as router_fast_stream, disable_booking
+from app.api.router import router as router_fast_stream, disable_booking, archive_bookings
+from app.api.export import router as export_router
+from app.api.closure import router as closure_router
+from app.api.debug import router as debug_router
+from app.api.auth import verify_admin_token
+from app.DAO.partitions import ensure_booking_partitions
+from app.DAO.replicas import replica_router
+from app.bot.render_cache import tables_render_cache, slots_render_cache
+from app.bot.flood_middleware import flood_control
+from app.bot.workers import ShardedDispatcher
+from app.bot.updates import peek_update_type, peek_update_id, SECRET_HEADER
+from app.bot.dedup import update_deduplicator
+from app.bot.capture import TrafficCapture
+from app.bot.waitlist import promotion_stats
+from app.DAO.dao import WaitlistDAO, single_flight
+from app.DAO.holds import slot_holds
+from app.DAO.init_logic import init_db
+from app.DAO.owner import owner_lock
+from app.startup import StartupTimer
+from app.profiling import profiler
 
+sharded_dispatcher = ShardedDispatcher(settings.DISPATCH_WORKERS) if settings.DISPATCH_WORKERS else None
+traffic_capture = TrafficCapture(settings.CAPTURE_PATH, settings.CAPTURE_SALT) if settings.CAPTURE_PATH else None
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    logger.info("Bot is  starting...")
-    await start_bot()
-    await broker.start()
-    scheduler.start()
+# imported in threads while the startup waits on the network, setup_dispatcher then finds them loaded
+HEAVY_MODULES = ("aiogram_dialog", "app.bot.booking.dialog", "apscheduler.schedulers.asyncio",
+                 "apscheduler.jobstores.sqlalchemy")
+
+
+async def import_heavy_modules():
+    await asyncio.gather(*(asyncio.to_thread(importlib.import_module, name) for name in HEAVY_MODULES))
+
+
+async def owner_steps():
+    """The once-per-deployment work, done by the owner process only: the other ones skip it."""
+    if not await owner_lock.acquire():
+        return
+    steps = [ensure_booking_partitions()]
+    if settings.INIT_DB:
+        steps.append(init_db())
+    await asyncio.gather(*steps)
+
+
+def add_periodic_jobs():
+    scheduler = get_scheduler()
     scheduler.add_job(
         disable_booking,
         trigger="interval",
@@ -24,32 +64,220 @@ async def lifespan(app: FastAPI):
         id="disable_booking_task",
         replace_existing=True
     )
-    webhook_url = settings.hook_url
-    await bot.set_webhook(
-        url=webhook_url,
-        allowed_updates=dp.resolve_used_update_types(),
-        drop_pending_updates=True
+    scheduler.add_job(
+        ensure_booking_partitions,
+        trigger="interval",
+        days=1,
+        id="booking_partitions_task",
+        replace_existing=True
+    )
+    scheduler.add_job(
+        archive_bookings,
+        trigger="cron",
+        hour=4,
+        id="archive_bookings_task",
+        replace_existing=True
     )
-    logger.success(f"Webhook is set: {webhook_url}")
+    if settings.DEDUP_SHARED:
+        scheduler.add_job(
+            update_deduplicator.cleanup,
+            trigger="interval",
+            hours=1,
+            id="processed_updates_cleanup_task",
+            replace_existing=True
+        )
+
+
+async def wake_scheduler():
+    """The jobs other processes add go to the shared job store, the owner looks for them periodically."""
+    while True:
+        await asyncio.sleep(settings.SCHEDULER_WAKEUP_INTERVAL)
+        get_scheduler().wakeup()
+
+
+async def take_over():
+    """A process that became the owner after the start takes over the once-per-deployment work."""
+    await ensure_booking_partitions()
+    add_periodic_jobs()
+    get_scheduler().resume()
+    app.state.scheduler_wakeup = asyncio.create_task(wake_scheduler())
+
+
+def start_scheduler():
+    """
+    Only the owner runs the jobs. The others start paused: the jobs they add (the guest reminders)
+    are stored for the owner to run, and they resume if they take over.
+    """
+    scheduler = get_scheduler()
+    if owner_lock.owner:
+        scheduler.start()
+        add_periodic_jobs()
+        app.state.scheduler_wakeup = asyncio.create_task(wake_scheduler())
+    else:
+        scheduler.start(paused=True)
+        owner_lock.watch(take_over)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Bot is  starting...")
+    timer = StartupTimer()
+    app.state.scheduler_wakeup = None
+    with timer.step("locale"):
+        set_russian_locale()
+    # the network round trips, the module imports and the owner's database work run together
+    await asyncio.gather(timer.run("commands", set_commands()),
+                         timer.run("broker", broker.start()),
+                         timer.run("imports", import_heavy_modules()),
+                         timer.run("owner", owner_steps()))
+    with timer.step("dispatcher"):
+        setup_dispatcher()
+    app.state.update_types = frozenset(dp.resolve_used_update_types())
+    webhooks = None
+    if settings.SET_WEBHOOK_ON_STARTUP:
+        webhooks = asyncio.create_task(timer.run("webhooks", set_webhooks(app.state.update_types)))
+    with timer.step("scheduler"):
+        start_scheduler()
+    with timer.step("services"):
+        replica_router.start()
+        slot_holds.start()
+        if sharded_dispatcher:
+            sharded_dispatcher.start()
+        if traffic_capture:
+            traffic_capture.start()
+    if webhooks:
+        await webhooks
+    timer.log()
+    app.state.admin_ping = asyncio.create_task(notify_admins_started())
     yield
     logger.info("Bot is stopping...")
     await stop_bot()
+    if sharded_dispatcher:
+        await sharded_dispatcher.stop()
+    if traffic_capture:
+        await traffic_capture.stop()
+    profiler.stop()
     await broker.close()
-    scheduler.shutdown()
+    await replica_router.stop()
+    await slot_holds.stop()
+    if app.state.scheduler_wakeup:
+        app.state.scheduler_wakeup.cancel()
+    get_scheduler().shutdown()
+    await owner_lock.release()
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(router_fast_stream)
+app.include_router(export_router)
+app.include_router(closure_router)
+app.include_router(debug_router)
 @app.post("/webhook")
 async def webhook(request: Request) -> None:
-    logger.info("Получен запрос с вебхука.")
+    """Webhook of the default restaurant, registered before the deployment served several of them."""
+    await handle_webhook(request, DEFAULT_RESTAURANT_ID)
+
+
+@app.post("/webhook/{restaurant_id}")
+async def restaurant_webhook(request: Request, restaurant_id: int) -> None:
+    if restaurant_id not in bots:
+        raise HTTPException(status_code=404)
+    await handle_webhook(request, restaurant_id)
+
+
+async def handle_webhook(request: Request, restaurant_id: int) -> None:
+    logger.info(f"Получен запрос с вебхука ресторана {restaurant_id}.")
+    # the secret is checked before the body is read, junk requests cost nothing
+    if settings.WEBHOOK_SECRET and not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""),
+                                                              settings.WEBHOOK_SECRET):
+        logger.warning("Запрос к вебхуку с неверным секретом отклонен.")
+        raise HTTPException(status_code=403)
     try:
-        update_data = await request.json()
-        update = Update.model_validate(update_data, context={"bot": bot})
+        raw = await request.body()
+        if traffic_capture:
+            traffic_capture.record(raw, restaurant_id)
+        # Telegram retries slow deliveries: a repeated update is acknowledged and dropped
+        update_id = peek_update_id(raw)
+        if update_id is not None and await update_deduplicator.is_duplicate(update_id, restaurant_id):
+            logger.info(f"Обновление {update_id} уже получено, повтор пропущен.")
+            return
+        update_type = peek_update_type(raw)
+        if update_type is not None and update_type not in request.app.state.update_types:
+            logger.info(f"Обновление типа {update_type} пропущено: для него нет обработчиков.")
+            return
+        if sharded_dispatcher:
+            worker = sharded_dispatcher.submit(raw, restaurant_id)
+            logger.info(f"Обновление передано обработчику №{worker}.")
+            return
+        # validated straight from bytes, without building an intermediate dict
+        bot = bots[restaurant_id]
+        update = Update.model_validate_json(raw, context={"bot": bot})
         await dp.feed_update(bot, update)
         logger.info("Обновление успешно обработано.")
     except Exception as e:
         logger.error(f"Ошибка при обработке обновления с вебхука: {e}")
 
 
+# internal state and counters, for the admins only like /debug
+stats_router = APIRouter(dependencies=[Depends(verify_admin_token)])
+
+
+@stats_router.get("/workers/metrics")
+async def workers_metrics() -> list[dict]:
+    """Load counters of the dispatch workers (empty when sharding is off)."""
+    return sharded_dispatcher.metrics() if sharded_dispatcher else []
+
+
+@stats_router.get("/capture/stats")
+async def capture_stats() -> dict:
+    """Updates recorded by the traffic capture (empty when it is off)."""
+    return traffic_capture.stats() if traffic_capture else {}
+
+
+@stats_router.get("/replicas/stats")
+async def replicas_stats() -> list[dict]:
+    """Health, lag and checked out connections of the read replicas."""
+    return replica_router.stats()
+
+
+@stats_router.get("/render-cache/stats")
+async def render_cache_stats() -> list[dict]:
+    """Size and hit rate of the booking window render caches."""
+    return [tables_render_cache.stats(), slots_render_cache.stats()]
+
+
+@stats_router.get("/dedup/stats")
+async def dedup_stats() -> dict:
+    """Checked update ids and the duplicates dropped locally and via Postgres."""
+    return update_deduplicator.stats()
+
+
+@stats_router.get("/waitlist/stats")
+async def waitlist_stats(restaurant_id: int | None = None) -> dict:
+    """Waitlist depth (of the restaurant, if given) and the time the promoted guests have waited."""
+    async with replica_router.session_maker_for()() as session:
+        depth = await WaitlistDAO(session).depth(restaurant_id)
+    return {"depth": depth, **promotion_stats.stats()}
+
+
+@stats_router.get("/holds/stats")
+async def holds_stats() -> dict:
+    """Active slot holds and the share of holds converted into bookings."""
+    return slot_holds.stats()
+
+
+@stats_router.get("/single-flight/stats")
+async def single_flight_stats() -> dict:
+    """Reads coalesced into an in-flight query, per DAO method."""
+    return single_flight.stats()
+
+
+@stats_router.get("/flood/stats")
+async def flood_stats() -> dict:
+    """Tracked users and updates dropped by the flood control."""
+    return flood_control.stats()
+
+
+app.include_router(stats_router)
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", port=8000, host="localhost", reload=True)
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""waitlist restaurant
+
+Revision ID: 2f6d9b0c8e47
+Revises: 7c5e2a9f1d38
+Create Date: 2026-10-19 00:21:37.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f6d9b0c8e47'
+down_revision: Union[str, None] = '7c5e2a9f1d38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('waitlist', sa.Column('restaurant_id', sa.Integer(), server_default=sa.text('1'), nullable=False))
+    # the waiting guests belong to the restaurant of their time slot
+    op.execute("UPDATE waitlist SET restaurant_id = time_slots.restaurant_id FROM time_slots "
+               "WHERE time_slots.id = waitlist.time_slot_id")
+    op.create_foreign_key('fk_waitlist_restaurant_id', 'waitlist', 'restaurants', ['restaurant_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_waitlist_restaurant_id', 'waitlist', type_='foreignkey')
+    op.drop_column('waitlist', 'restaurant_id')
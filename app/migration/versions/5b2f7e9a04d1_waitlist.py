@@ -0,0 +1,47 @@
+"""waitlist
+
+Revision ID: 5b2f7e9a04d1
+Revises: a6e3d8f21c94
+Create Date: 2026-10-18 19:48:37.214905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2f7e9a04d1'
+down_revision: Union[str, None] = 'a6e3d8f21c94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('waitlist',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('table_id', sa.Integer(), nullable=True),
+    sa.Column('capacity', sa.Integer(), nullable=False),
+    sa.Column('time_slot_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('booking_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['table_id'], ['tables.id'], ),
+    sa.ForeignKeyConstraint(['time_slot_id'], ['time_slots.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_waitlist_waiting', 'waitlist', ['date', 'time_slot_id', 'created_at'], unique=False,
+                    postgresql_where=sa.text("status = 'waiting'"))
+    op.create_index('uq_waitlist_user_slot', 'waitlist', ['user_id', 'date', 'time_slot_id'], unique=True,
+                    postgresql_where=sa.text("status = 'waiting'"))
+
+
+def downgrade() -> None:
+    op.drop_index('uq_waitlist_user_slot', table_name='waitlist', postgresql_where=sa.text("status = 'waiting'"))
+    op.drop_index('ix_waitlist_waiting', table_name='waitlist', postgresql_where=sa.text("status = 'waiting'"))
+    op.drop_table('waitlist')
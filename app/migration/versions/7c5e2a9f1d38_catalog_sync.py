@@ -0,0 +1,37 @@
+"""catalog sync
+
+Revision ID: 7c5e2a9f1d38
+Revises: d3a8f6c2b915
+Create Date: 2026-10-18 22:04:13.518207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c5e2a9f1d38'
+down_revision: Union[str, None] = 'd3a8f6c2b915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('catalog_sources',
+    sa.Column('restaurant_id', sa.Integer(), nullable=False),
+    sa.Column('source_hash', sa.String(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id'], ),
+    sa.PrimaryKeyConstraint('restaurant_id')
+    )
+    op.add_column('tables', sa.Column('is_active', sa.Boolean(), server_default=sa.text('true'), nullable=False))
+    op.add_column('time_slots', sa.Column('is_active', sa.Boolean(), server_default=sa.text('true'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('time_slots', 'is_active')
+    op.drop_column('tables', 'is_active')
+    op.drop_table('catalog_sources')
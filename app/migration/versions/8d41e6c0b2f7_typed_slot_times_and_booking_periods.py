@@ -0,0 +1,97 @@
+"""typed slot times and booking periods
+
+Revision ID: 8d41e6c0b2f7
+Revises: 3b9c1f2a7d10
+Create Date: 2026-10-18 12:40:05.731904
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41e6c0b2f7'
+down_revision: Union[str, None] = '3b9c1f2a7d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger(f"alembic.{revision}")
+
+BOOKING_PERIOD_SQL = (
+    "tsrange(date + start_time, date + end_time + "
+    "CASE WHEN end_time <= start_time THEN interval '1 day' ELSE interval '0' END)"
+)
+
+
+def upgrade() -> None:
+    # btree_gist is needed to mix "table_id WITH =" into a GiST exclusion constraint
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    for column in ('start_time', 'end_time'):
+        op.alter_column('time_slots', column,
+                        existing_type=sa.String(length=5),
+                        type_=sa.Time(),
+                        existing_nullable=False,
+                        postgresql_using=f'{column}::time')
+
+    op.add_column('bookings', sa.Column('start_time', sa.Time(), nullable=True))
+    op.add_column('bookings', sa.Column('end_time', sa.Time(), nullable=True))
+    # data migration: existing bookings take the times of their slots
+    op.execute(
+        "UPDATE bookings b SET start_time = s.start_time, end_time = s.end_time "
+        "FROM time_slots s WHERE s.id = b.time_slot_id"
+    )
+    op.alter_column('bookings', 'start_time', existing_type=sa.Time(), nullable=False)
+    op.alter_column('bookings', 'end_time', existing_type=sa.Time(), nullable=False)
+    op.add_column('bookings', sa.Column('during', postgresql.TSRANGE(),
+                                        sa.Computed(BOOKING_PERIOD_SQL, persisted=True), nullable=False))
+
+    # double bookings made before the constraint existed: the oldest one is kept, the others are canceled
+    # and recorded in booking_conflicts, so that the staff can contact their guests
+    op.create_table('booking_conflicts',
+    sa.Column('booking_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('conflicting_booking_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('table_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('booking_id')
+    )
+    op.execute(
+        "INSERT INTO booking_conflicts (booking_id, conflicting_booking_id, user_id, table_id, date, "
+        "start_time, end_time) "
+        "SELECT b.id, older.id, b.user_id, b.table_id, b.date, b.start_time, b.end_time FROM bookings b "
+        "CROSS JOIN LATERAL (SELECT min(o.id) AS id FROM bookings o WHERE o.table_id = b.table_id "
+        "AND o.status = 'booked' AND o.during && b.during AND o.id < b.id) older "
+        "WHERE b.status = 'booked' AND older.id IS NOT NULL"
+    )
+    canceled = op.get_bind().execute(sa.text(
+        "UPDATE bookings SET status = 'canceled' WHERE id IN (SELECT booking_id FROM booking_conflicts) "
+        "RETURNING id"
+    )).scalars().all()
+    if canceled:
+        logger.warning(f"{len(canceled)} overlapping bookings canceled and recorded in booking_conflicts: "
+                       f"{sorted(canceled)}")
+    op.create_exclude_constraint('ex_bookings_table_during', 'bookings',
+                                 ('table_id', '='), ('during', '&&'),
+                                 where=sa.text("status = 'booked'"), using='gist')
+
+
+def downgrade() -> None:
+    op.drop_constraint('ex_bookings_table_during', 'bookings', type_='exclude')
+    # the recorded bookings stay canceled
+    op.drop_table('booking_conflicts')
+    op.drop_column('bookings', 'during')
+    op.drop_column('bookings', 'end_time')
+    op.drop_column('bookings', 'start_time')
+    for column in ('start_time', 'end_time'):
+        op.alter_column('time_slots', column,
+                        existing_type=sa.Time(),
+                        type_=sa.String(length=5),
+                        existing_nullable=False,
+                        postgresql_using=f"to_char({column}, 'HH24:MI')")
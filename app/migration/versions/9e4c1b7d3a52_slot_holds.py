@@ -0,0 +1,38 @@
+"""slot holds
+
+Revision ID: 9e4c1b7d3a52
+Revises: 5b2f7e9a04d1
+Create Date: 2026-10-18 20:31:05.688412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4c1b7d3a52'
+down_revision: Union[str, None] = '5b2f7e9a04d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # short-lived rows, unlogged: losing the holds on a crash is fine
+    op.execute("""
+        CREATE UNLOGGED TABLE slot_holds (
+            table_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            time_slot_id INTEGER NOT NULL,
+            user_id BIGINT NOT NULL,
+            expires_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+            updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL,
+            PRIMARY KEY (table_id, date, time_slot_id)
+        )
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('slot_holds')
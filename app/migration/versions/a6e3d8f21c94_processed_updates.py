@@ -0,0 +1,33 @@
+"""processed updates
+
+Revision ID: a6e3d8f21c94
+Revises: f19b0e7c4a63
+Create Date: 2026-10-18 19:02:11.527340
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e3d8f21c94'
+down_revision: Union[str, None] = 'f19b0e7c4a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('processed_updates',
+    sa.Column('update_id', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('update_id')
+    )
+    op.create_index('ix_processed_updates_created_at', 'processed_updates', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_processed_updates_created_at', table_name='processed_updates')
+    op.drop_table('processed_updates')
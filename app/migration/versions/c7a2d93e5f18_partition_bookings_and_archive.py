@@ -0,0 +1,118 @@
+"""partition bookings by month and add the archive
+
+Revision ID: c7a2d93e5f18
+Revises: 8d41e6c0b2f7
+Create Date: 2026-10-18 15:02:11.406582
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a2d93e5f18'
+down_revision: Union[str, None] = '8d41e6c0b2f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BOOKING_PERIOD_SQL = (
+    "tsrange(date + start_time, date + end_time + "
+    "CASE WHEN end_time <= start_time THEN interval '1 day' ELSE interval '0' END)"
+)
+COLUMNS = "id, user_id, table_id, time_slot_id, date, start_time, end_time, status, created_at, updated_at"
+PARTITIONED = "PARTITION BY RANGE (date)"
+MONTHS_AHEAD = 3
+
+
+def create_bookings_table(partition_by: str = "") -> None:
+    op.execute(f"""
+        CREATE TABLE bookings (
+            id integer NOT NULL DEFAULT nextval('bookings_id_seq'),
+            user_id bigint NOT NULL REFERENCES users (id),
+            table_id integer NOT NULL REFERENCES tables (id),
+            time_slot_id integer NOT NULL REFERENCES time_slots (id),
+            date date NOT NULL,
+            start_time time NOT NULL,
+            end_time time NOT NULL,
+            during tsrange GENERATED ALWAYS AS ({BOOKING_PERIOD_SQL}) STORED,
+            status varchar NOT NULL,
+            created_at timestamp NOT NULL DEFAULT now(),
+            updated_at timestamp NOT NULL DEFAULT now(),
+            CONSTRAINT bookings_pkey PRIMARY KEY ({"id, date" if partition_by else "id"}),
+            CONSTRAINT ex_bookings_table_during EXCLUDE USING gist
+                (table_id WITH =, {"date WITH =, " if partition_by else ""}during WITH &&) WHERE (status = 'booked')
+        ) {partition_by}
+    """)
+    op.create_index('ix_bookings_table_date_slot', 'bookings', ['table_id', 'date', 'time_slot_id'], unique=False)
+    op.create_index('ix_bookings_user_date', 'bookings', ['user_id', 'date'], unique=False)
+
+
+def upgrade() -> None:
+    # the old table goes away, the id sequence has to survive it
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY NONE")
+    op.rename_table('bookings', 'bookings_unpartitioned')
+    op.drop_constraint('ex_bookings_table_during', 'bookings_unpartitioned', type_='exclude')
+    op.execute("ALTER TABLE bookings_unpartitioned DROP CONSTRAINT bookings_pkey")
+    op.drop_index('ix_bookings_table_date_slot', table_name='bookings_unpartitioned')
+
+    create_bookings_table(PARTITIONED)
+    op.execute("CREATE TABLE bookings_default PARTITION OF bookings DEFAULT")
+    # monthly partitions from the oldest booking up to a few months ahead
+    op.execute(f"""
+        DO $$
+        DECLARE month date;
+        BEGIN
+            FOR month IN SELECT generate_series(
+                date_trunc('month', LEAST((SELECT min(date) FROM bookings_unpartitioned), current_date)),
+                date_trunc('month', current_date) + interval '{MONTHS_AHEAD} months',
+                interval '1 month')::date
+            LOOP
+                EXECUTE format('CREATE TABLE %I PARTITION OF bookings FOR VALUES FROM (%L) TO (%L)',
+                               'bookings_' || to_char(month, 'YYYY_MM'), month, month + interval '1 month');
+            END LOOP;
+        END $$;
+    """)
+    op.execute(f"INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_unpartitioned")
+    op.drop_table('bookings_unpartitioned')
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id")
+
+    op.create_table('bookings_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('table_id', sa.Integer(), nullable=False),
+    sa.Column('time_slot_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('archived_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['table_id'], ['tables.id'], ),
+    sa.ForeignKeyConstraint(['time_slot_id'], ['time_slots.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    # the archive is append-only, rows are packed into full pages
+    postgresql_with={'fillfactor': 100}
+    )
+    op.create_index('ix_bookings_archive_user_date', 'bookings_archive', ['user_id', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY NONE")
+    op.rename_table('bookings', 'bookings_partitioned')
+    op.drop_constraint('ex_bookings_table_during', 'bookings_partitioned', type_='exclude')
+    op.execute("ALTER TABLE bookings_partitioned DROP CONSTRAINT bookings_pkey")
+    op.drop_index('ix_bookings_table_date_slot', table_name='bookings_partitioned')
+    op.drop_index('ix_bookings_user_date', table_name='bookings_partitioned')
+
+    create_bookings_table()
+    op.drop_index('ix_bookings_user_date', table_name='bookings')
+    op.execute(f"INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_partitioned")
+    op.execute(f"INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_archive")
+    op.drop_table('bookings_partitioned')
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id")
+    op.drop_index('ix_bookings_archive_user_date', table_name='bookings_archive')
+    op.drop_table('bookings_archive')
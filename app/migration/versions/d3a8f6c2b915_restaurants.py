@@ -0,0 +1,68 @@
+"""restaurants
+
+Revision ID: d3a8f6c2b915
+Revises: 9e4c1b7d3a52
+Create Date: 2026-10-18 21:26:40.371902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a8f6c2b915'
+down_revision: Union[str, None] = '9e4c1b7d3a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCOPED_TABLES = ['tables', 'time_slots', 'bookings', 'bookings_archive']
+
+
+def upgrade() -> None:
+    op.create_table('restaurants',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # everything created so far belongs to the first restaurant
+    op.execute("INSERT INTO restaurants (id, name) VALUES (1, 'BigLobsters')")
+    op.execute("SELECT setval(pg_get_serial_sequence('restaurants', 'id'), 1)")
+    for table in SCOPED_TABLES:
+        # bookings is partitioned, the column and the key are added to every partition
+        op.add_column(table, sa.Column('restaurant_id', sa.Integer(), server_default=sa.text('1'), nullable=False))
+        op.create_foreign_key(f'fk_{table}_restaurant_id', table, 'restaurants', ['restaurant_id'], ['id'])
+    op.create_index('ix_tables_restaurant_capacity', 'tables', ['restaurant_id', 'capacity'], unique=False)
+    op.create_index('ix_time_slots_restaurant_start', 'time_slots', ['restaurant_id', 'start_time'], unique=False)
+    op.drop_index('ix_bookings_user_date', table_name='bookings')
+    op.create_index('ix_bookings_restaurant_user_date', 'bookings', ['restaurant_id', 'user_id', 'date'],
+                    unique=False)
+    op.drop_index('ix_bookings_archive_user_date', table_name='bookings_archive')
+    op.create_index('ix_bookings_archive_restaurant_user_date', 'bookings_archive',
+                    ['restaurant_id', 'user_id', 'date'], unique=False)
+
+    op.add_column('processed_updates',
+                  sa.Column('restaurant_id', sa.Integer(), server_default=sa.text('1'), nullable=False))
+    op.drop_constraint('processed_updates_pkey', 'processed_updates', type_='primary')
+    op.create_primary_key('processed_updates_pkey', 'processed_updates', ['restaurant_id', 'update_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('processed_updates_pkey', 'processed_updates', type_='primary')
+    op.execute("DELETE FROM processed_updates WHERE restaurant_id <> 1")
+    op.create_primary_key('processed_updates_pkey', 'processed_updates', ['update_id'])
+    op.drop_column('processed_updates', 'restaurant_id')
+
+    op.drop_index('ix_bookings_archive_restaurant_user_date', table_name='bookings_archive')
+    op.create_index('ix_bookings_archive_user_date', 'bookings_archive', ['user_id', 'date'], unique=False)
+    op.drop_index('ix_bookings_restaurant_user_date', table_name='bookings')
+    op.create_index('ix_bookings_user_date', 'bookings', ['user_id', 'date'], unique=False)
+    op.drop_index('ix_time_slots_restaurant_start', table_name='time_slots')
+    op.drop_index('ix_tables_restaurant_capacity', table_name='tables')
+    for table in reversed(SCOPED_TABLES):
+        op.drop_constraint(f'fk_{table}_restaurant_id', table, type_='foreignkey')
+        op.drop_column(table, 'restaurant_id')
+    op.drop_table('restaurants')
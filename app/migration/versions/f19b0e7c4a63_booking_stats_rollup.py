@@ -0,0 +1,73 @@
+"""booking stats rollup
+
+Revision ID: f19b0e7c4a63
+Revises: c7a2d93e5f18
+Create Date: 2026-10-18 17:25:48.093117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19b0e7c4a63'
+down_revision: Union[str, None] = 'c7a2d93e5f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('booking_stats',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('table_id', sa.Integer(), nullable=False),
+    sa.Column('time_slot_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('date', 'table_id', 'time_slot_id', 'status')
+    )
+    # Rows moved between tables (archiving, partition maintenance) are not status changes:
+    # such sessions set app.booking_stats_skip = 'on' and the trigger leaves the rollup alone
+    op.execute("""
+        CREATE FUNCTION booking_stats_apply() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('app.booking_stats_skip', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE booking_stats SET count = count - 1, updated_at = now()
+                WHERE date = OLD.date AND table_id = OLD.table_id
+                  AND time_slot_id = OLD.time_slot_id AND status = OLD.status;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO booking_stats (date, table_id, time_slot_id, status, count)
+                VALUES (NEW.date, NEW.table_id, NEW.time_slot_id, NEW.status, 1)
+                ON CONFLICT (date, table_id, time_slot_id, status)
+                DO UPDATE SET count = booking_stats.count + 1, updated_at = now();
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER bookings_stats AFTER INSERT OR DELETE OR UPDATE OF date, table_id, time_slot_id, status
+        ON bookings FOR EACH ROW EXECUTE FUNCTION booking_stats_apply()
+    """)
+    # backfill from the whole history, archived bookings included
+    op.execute("""
+        INSERT INTO booking_stats (date, table_id, time_slot_id, status, count)
+        SELECT date, table_id, time_slot_id, status, count(*)
+        FROM (SELECT date, table_id, time_slot_id, status FROM bookings
+              UNION ALL
+              SELECT date, table_id, time_slot_id, status FROM bookings_archive) AS history
+        GROUP BY date, table_id, time_slot_id, status
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER bookings_stats ON bookings")
+    op.execute("DROP FUNCTION booking_stats_apply()")
+    op.drop_table('booking_stats')
@@ -0,0 +1,187 @@
+import asyncio
+import cProfile
+import io
+import itertools
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List
+from aiogram import Dispatcher
+from loguru import logger
+
+
+class StackSampler(threading.Thread):
+    """Samples the stack of the event loop thread every `interval` seconds, counting the folded stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="stack-sampler", daemon=True)
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stopped = threading.Event()
+        self.counts: Counter = Counter()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+    def folded(self) -> str:
+        """Folded stacks, the input of flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class Profiler:
+    """
+    One profile at a time of the event loop of this process: cProfile (every call, slows the loop down)
+    or stack sampling (cheap, statistical). Stops after `seconds` or after `updates` handled updates.
+    Nothing is hooked while no profile runs: the update counter is a middleware registered for the profile only.
+    """
+
+    def __init__(self):
+        self.kind: str | None = None
+        self.running = False
+        self.started_at: float | None = None
+        self.duration = 0.0
+        self.updates = 0
+        self._update_limit: int | None = None
+        self._dispatcher: Dispatcher | None = None
+        self._profile: cProfile.Profile | None = None
+        self._stats: pstats.Stats | None = None
+        self._sampler: StackSampler | None = None
+        self._timer: asyncio.TimerHandle | None = None
+
+    def start(self, kind: str, seconds: float, dispatcher: Dispatcher, updates: int | None = None,
+              interval: float = 0.005) -> None:
+        if self.running:
+            raise RuntimeError("A profile is already running")
+        self.kind, self.running, self.updates, self._update_limit = kind, True, 0, updates
+        self._profile = self._stats = self._sampler = None
+        if kind == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident(), interval)
+            self._sampler.start()
+        if updates:
+            self._dispatcher = dispatcher
+            dispatcher.update.outer_middleware.register(self._count_update)
+        self._timer = asyncio.get_running_loop().call_later(seconds, self.stop)
+        self.started_at = time.time()
+        logger.info(f"{kind} profile started for {seconds}s" + (f" or {updates} updates" if updates else ""))
+
+    async def _count_update(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        finally:
+            self.updates += 1
+            if self.running and self.updates >= self._update_limit:
+                self.stop()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        if self._profile:
+            self._profile.disable()
+            self._stats = pstats.Stats(self._profile)
+        if self._sampler:
+            self._sampler.stop()
+        if self._dispatcher:
+            self._dispatcher.update.outer_middleware.unregister(self._count_update)
+            self._dispatcher = None
+        self._timer.cancel()
+        self.running = False
+        self.duration = time.time() - self.started_at
+        logger.info(f"{self.kind} profile stopped after {self.duration:.1f}s, {self.updates} updates")
+
+    def stats(self) -> Dict[str, Any]:
+        duration = time.time() - self.started_at if self.running else self.duration
+        return {"kind": self.kind, "running": self.running, "started_at": self.started_at,
+                "duration": duration, "updates": self.updates,
+                "samples": sum(self._sampler.counts.values()) if self._sampler else None}
+
+    def text(self, sort: str = "cumulative", limit: int = 100) -> str:
+        """The pstats report of a cProfile profile, or the folded stacks of a sampling one."""
+        if self._sampler:
+            return self._sampler.folded()
+        self._stats.stream = io.StringIO()
+        self._stats.sort_stats(sort).print_stats(limit)
+        return self._stats.stream.getvalue()
+
+    def dump(self) -> bytes:
+        """A cProfile profile in the format of Profile.dump_stats, for pstats, snakeviz and the like."""
+        return marshal.dumps(self._stats.stats)
+
+    @property
+    def has_result(self) -> bool:
+        return not self.running and (self._stats is not None or self._sampler is not None)
+
+
+class MemorySnapshots:
+    """tracemalloc snapshots of this process, kept by id to be compared. Tracing is on only between start and stop."""
+
+    def __init__(self):
+        self._snapshots: Dict[int, tracemalloc.Snapshot] = {}
+        self._ids = itertools.count(1)
+
+    def start(self, frames: int) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info(f"tracemalloc started, {frames} frames per trace")
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self._snapshots.clear()
+        logger.info("tracemalloc stopped")
+
+    def take(self) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not started")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        snapshot_id = next(self._ids)
+        self._snapshots[snapshot_id] = snapshot
+        return {"id": snapshot_id, "size": sum(trace.size for trace in snapshot.traces),
+                "blocks": len(snapshot.traces)}
+
+    def list(self) -> List[int]:
+        return list(self._snapshots)
+
+    def top(self, snapshot_id: int, group_by: str = "lineno", limit: int = 30) -> List[str]:
+        return [str(stat) for stat in self._snapshots[snapshot_id].statistics(group_by)[:limit]]
+
+    def diff(self, base_id: int, other_id: int, group_by: str = "lineno", limit: int = 30) -> List[str]:
+        """The biggest growths from the base snapshot to the other one."""
+        stats = self._snapshots[other_id].compare_to(self._snapshots[base_id], group_by)
+        return [str(stat) for stat in stats[:limit]]
+
+
+def dump_tasks(limit: int = 20) -> List[Dict[str, Any]]:
+    """Name, coroutine and stack (up to `limit` frames) of every asyncio task of the running loop."""
+    tasks = []
+    for task in asyncio.all_tasks():
+        stack = io.StringIO()
+        task.print_stack(limit=limit, file=stack)
+        coro = task.get_coro()
+        tasks.append({"name": task.get_name(), "coro": getattr(coro, "__qualname__", repr(coro)),
+                      "done": task.done(), "stack": stack.getvalue()})
+    return sorted(tasks, key=lambda task: task["coro"])
+
+
+profiler = Profiler()
+memory_snapshots = MemorySnapshots()
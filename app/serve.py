@@ -0,0 +1,70 @@
+import asyncio
+import importlib.util
+import os
+
+import uvicorn
+from loguru import logger
+
+from app.config import settings
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+async def register_webhooks() -> None:
+    """Registers the webhooks once, before the workers start, instead of every worker racing to do it."""
+    from app.bot.create_bot import dp, bot_session, setup_dispatcher, set_webhooks
+
+    setup_dispatcher()
+    try:
+        await set_webhooks(dp.resolve_used_update_types())
+    finally:
+        await bot_session.close()
+
+
+def unshared_state() -> list[str]:
+    """The settings that several worker processes need and that are not set."""
+    required = {"FSM_STORAGE_URL": settings.FSM_STORAGE_URL, "HOLDS_SHARED": settings.HOLDS_SHARED,
+                "DEDUP_SHARED": settings.DEDUP_SHARED}
+    return [name for name, value in required.items() if not value]
+
+
+def main() -> None:
+    """
+    Production entry point: uvloop and httptools when installed, SERVER_WORKERS worker processes,
+    no file watcher. The webhooks are registered here and the workers skip it.
+    """
+    missing = unshared_state()
+    if settings.SERVER_WORKERS > 1 and missing:
+        # a guest's updates land on any worker, each would see its own dialog state, holds and seen updates
+        raise SystemExit(f"SERVER_WORKERS={settings.SERVER_WORKERS} needs the state shared by the workers, "
+                         f"set {', '.join(missing)}")
+    loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = "httptools" if _installed("httptools") else "h11"
+    if loop == "asyncio" or http == "h11":
+        logger.warning(f"uvloop or httptools is not installed, serving with {loop} and {http}")
+    if settings.SET_WEBHOOK_ON_STARTUP:
+        asyncio.run(register_webhooks())
+        # a single worker runs in this process with these settings,
+        # several are spawned with this environment and read their settings from it
+        settings.SET_WEBHOOK_ON_STARTUP = False
+        os.environ["SET_WEBHOOK_ON_STARTUP"] = "false"
+    logger.info(f"Serving on {settings.SERVER_HOST}:{settings.SERVER_PORT} with {settings.SERVER_WORKERS} "
+                f"workers, {loop}, {http}")
+    uvicorn.run(
+        "app.main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS,
+        loop=loop,
+        http=http,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE,
+        access_log=settings.SERVER_ACCESS_LOG,
+        reload=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import time
+from contextlib import contextmanager
+from typing import Awaitable, List, Tuple, TypeVar
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class StartupTimer:
+    """Measures the steps of the app start, the concurrent ones included, and logs the breakdown."""
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._steps: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._steps.append((name, time.perf_counter() - started))
+
+    async def run(self, name: str, awaitable: Awaitable[T]) -> T:
+        with self.step(name):
+            return await awaitable
+
+    def log(self) -> None:
+        total = time.perf_counter() - self._started
+        logger.info(f"Started in {total * 1000:.0f} ms: " +
+                    ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self._steps))
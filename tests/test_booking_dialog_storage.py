@@ -0,0 +1,136 @@
+import asyncio
+import json
+from datetime import date, time
+from functools import cache
+
+import pytest
+from aiogram import Dispatcher, Router
+from aiogram.filters import CommandStart
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+from aiogram.types import Message
+
+RESTAURANT_ID = 1
+TABLE = dict(id=7, restaurant_id=RESTAURANT_ID, capacity=4, description="у окна", is_active=True)
+SLOT = dict(id=3, restaurant_id=RESTAURANT_ID, start_time=time(19), end_time=time(21), is_active=True)
+
+
+class JsonMemoryStorage(MemoryStorage):
+    """Saves the state data through JSON as RedisStorage does: what json.dumps can't encode fails here too."""
+
+    async def set_data(self, key, data):
+        await super().set_data(key, json.loads(json.dumps(data)))
+
+
+@pytest.fixture
+def booked(monkeypatch):
+    """The DAO calls of the dialog answered in memory, the bookings made are collected."""
+    from app.bot.booking import handlers
+    from app.DAO.catalog import table_catalog
+    from app.DAO.dao import BookingDAO, SlotInfo, TableDAO, TableInfo, TimeSlotUserDAO
+
+    table, slot = TableInfo(**TABLE), SlotInfo(**SLOT)
+    bookings = []
+
+    async def find_all(self, filters=None):
+        return [table]
+
+    async def table_by_id(self, data_id):
+        return table if data_id == table.id else None
+
+    async def slot_by_id(self, data_id):
+        return slot if data_id == slot.id else None
+
+    async def month_availability(self, year, month, restaurant_id, **scope):
+        return {}
+
+    async def free_slots(self, table_id, booking_date, user_id=None):
+        return [slot]
+
+    async def nearest(self, capacity, days, restaurant_id, limit=None):
+        return [(table, slot, date.today())]
+
+    async def available(self, **kwargs):
+        return True
+
+    async def add(self, values):
+        bookings.append(values)
+
+    async def publish(*args, **kwargs):
+        pass
+
+    async def ensure_loaded(session, restaurant_id):
+        pass
+
+    monkeypatch.setattr(TableDAO, "find_all", find_all)
+    monkeypatch.setattr(TableDAO, "find_one_or_none_by_id", table_by_id)
+    monkeypatch.setattr(TimeSlotUserDAO, "find_one_or_none_by_id", slot_by_id)
+    monkeypatch.setattr(BookingDAO, "get_month_availability", month_availability)
+    monkeypatch.setattr(BookingDAO, "get_available_time_slots", free_slots)
+    monkeypatch.setattr(BookingDAO, "find_nearest_available", nearest)
+    monkeypatch.setattr(BookingDAO, "check_available_bookings", available)
+    monkeypatch.setattr(BookingDAO, "add", add)
+    monkeypatch.setattr(handlers.broker, "publish", publish)
+    monkeypatch.setattr(table_catalog, "ensure_loaded", ensure_loaded)
+    return bookings
+
+
+@cache
+def _dispatcher():
+    """The booking dialog on a dispatcher with the JSON storage, started by /start. A dialog joins one dispatcher."""
+    from aiogram_dialog import DialogManager, StartMode, setup_dialogs
+    from aiogram_dialog.test_tools import MockMessageManager
+    from aiogram_dialog.test_tools.bot_client import FakeBot
+    from app.bot.booking.dialog import booking_dialog
+    from app.bot.booking.state import BookingState
+
+    class SilentBot(FakeBot):
+        """Drops the plain messages the handlers send besides the dialog windows."""
+
+        async def __call__(self, method, request_timeout=None):
+            if isinstance(method, SendMessage):
+                return None
+            return await super().__call__(method, request_timeout)
+
+    async def tenant(handler, event, data):
+        data.update(restaurant_id=RESTAURANT_ID, session_without_commit=None, session_with_commit=None)
+        return await handler(event, data)
+
+    start = Router()
+
+    @start.message(CommandStart())
+    async def start_booking(message: Message, dialog_manager: DialogManager):
+        await dialog_manager.start(state=BookingState.count, mode=StartMode.RESET_STACK)
+
+    dp = Dispatcher(storage=JsonMemoryStorage())
+    dp.update.outer_middleware.register(tenant)
+    dp.include_routers(start, booking_dialog)
+    messages = MockMessageManager()
+    setup_dialogs(dp, message_manager=messages)
+    return dp, messages, SilentBot()
+
+
+async def _click_through(*buttons: str) -> None:
+    """Starts the dialog and presses the buttons whose whole text matches the patterns, each in the last window."""
+    from aiogram_dialog.test_tools import BotClient
+    from aiogram_dialog.test_tools.keyboard import InlineButtonTextLocator
+
+    dp, messages, bot = _dispatcher()
+    client = BotClient(dp, bot=bot)
+    await client.send("/start")
+    for button in buttons:
+        message = messages.last_message()
+        messages.reset_history()
+        await client.click(message, InlineButtonTextLocator(button))
+
+
+def test_picked_table_date_and_slot_survive_json_storage(booked):
+    """The table, the date and the slot picked step by step are saved as JSON and booked on confirmation."""
+    asyncio.run(_click_through("2", "Стол №7 .*", r"\[\d+\]", "19:00 до 21:00", "Все верно"))
+    assert [(b.table_id, b.time_slot_id, b.date, b.start_time) for b in booked] == [(7, 3, date.today(), time(19))]
+
+
+def test_nearest_search_result_survives_json_storage(booked):
+    """A slot picked among the nearest found ones goes through the JSON storage to the booking as well."""
+    asyncio.run(_click_through("2", ".*Ближайшее.*", ".*стол №7.*", "Все верно"))
+    assert [(b.table_id, b.time_slot_id, b.date, b.end_time) for b in booked] == [(7, 3, date.today(), time(21))]
@@ -0,0 +1,110 @@
+import asyncio
+import os
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.exc import IntegrityError
+
+pytestmark = pytest.mark.skipif(not os.environ.get("TEST_DB_URL"), reason="TEST_DB_URL is not set")
+
+GUESTS = (9_100_000_001, 9_100_000_002)
+BOOKING_DATE = date.today() + timedelta(days=1)
+
+
+async def _restaurant_with_one_table():
+    """A restaurant with one 4-seat table and one slot, committed so that separate transactions see it."""
+    from app.DAO.database import async_session_maker
+    from app.DAO.models import Table, TimeSlot, User
+
+    async with async_session_maker() as session:
+        restaurant_id = await session.scalar(text(
+            "INSERT INTO restaurants (id, name) SELECT coalesce(max(id), 0) + 1, 'race' FROM restaurants RETURNING id"))
+        table_id = await session.scalar(insert(Table).values(restaurant_id=restaurant_id, capacity=4)
+                                        .returning(Table.id))
+        slot_id = await session.scalar(insert(TimeSlot).values(restaurant_id=restaurant_id, start_time=time(19),
+                                                               end_time=time(21)).returning(TimeSlot.id))
+        await session.execute(insert(User), [{"id": guest} for guest in GUESTS])
+        await session.commit()
+    return restaurant_id, table_id, slot_id
+
+
+async def _cleanup(restaurant_id: int, table_id: int, slot_id: int):
+    from app.DAO.database import async_session_maker, engine
+    from app.DAO.models import Booking, BookingStats, Restaurant, Table, TimeSlot, User
+
+    async with async_session_maker() as session:
+        await session.execute(delete(Booking).where(Booking.restaurant_id == restaurant_id))
+        await session.execute(delete(BookingStats).where(BookingStats.table_id == table_id))
+        await session.execute(delete(Table).where(Table.id == table_id))
+        await session.execute(delete(TimeSlot).where(TimeSlot.id == slot_id))
+        await session.execute(delete(User).where(User.id.in_(GUESTS)))
+        await session.execute(delete(Restaurant).where(Restaurant.id == restaurant_id))
+        await session.commit()
+    await engine.dispose()
+
+
+async def _booked(restaurant_id: int) -> int:
+    from app.DAO.database import async_session_maker
+    from app.DAO.models import Booking
+
+    async with async_session_maker() as session:
+        result = await session.execute(select(Booking.id).where(Booking.restaurant_id == restaurant_id,
+                                                                Booking.status == "booked"))
+        return len(result.all())
+
+
+def test_same_table_and_slot_is_booked_once():
+    """Two guests confirm the same table and slot at once: the exclusion constraint lets one booking in."""
+    from app.bot.booking.schemas import SNewBooking
+    from app.DAO.dao import BookingDAO
+    from app.DAO.database import async_session_maker
+
+    async def book(guest: int, restaurant_id: int, table_id: int, slot_id: int) -> bool:
+        async with async_session_maker() as session:
+            try:
+                await BookingDAO(session).add(SNewBooking(
+                    restaurant_id=restaurant_id, user_id=guest, table_id=table_id, time_slot_id=slot_id,
+                    date=BOOKING_DATE, start_time=time(19), end_time=time(21), status="booked"))
+                await asyncio.sleep(0.2)  # both inserts are in flight before either commits
+                await session.commit()
+                return True
+            except IntegrityError:
+                return False
+
+    async def scenario():
+        restaurant_id, table_id, slot_id = await _restaurant_with_one_table()
+        try:
+            results = await asyncio.gather(*(book(guest, restaurant_id, table_id, slot_id) for guest in GUESTS))
+            return results, await _booked(restaurant_id)
+        finally:
+            await _cleanup(restaurant_id, table_id, slot_id)
+
+    results, booked = asyncio.run(scenario())
+    assert sorted(results) == [False, True]
+    assert booked == 1
+
+
+def test_concurrent_best_table_assignments_get_one_table():
+    """Two guests ask for any table at once while one table is left: one gets it, the other gets None."""
+    from app.DAO.dao import BookingDAO
+    from app.DAO.database import async_session_maker
+
+    async def assign(guest: int, slot_id: int):
+        async with async_session_maker() as session:
+            booking = await BookingDAO(session).assign_best_table(guest, 2, BOOKING_DATE, slot_id)
+            await asyncio.sleep(0.2)  # the other assignment waits on the advisory lock meanwhile
+            await session.commit()
+            return booking is not None
+
+    async def scenario():
+        restaurant_id, table_id, slot_id = await _restaurant_with_one_table()
+        try:
+            results = await asyncio.gather(*(assign(guest, slot_id) for guest in GUESTS))
+            return results, await _booked(restaurant_id)
+        finally:
+            await _cleanup(restaurant_id, table_id, slot_id)
+
+    results, booked = asyncio.run(scenario())
+    assert sorted(results) == [False, True]
+    assert booked == 1
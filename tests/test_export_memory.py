@@ -0,0 +1,45 @@
+import asyncio
+from collections import namedtuple
+import tracemalloc
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+
+async def _rows(count: int):
+    """Booking rows as stream_bookings yields them, made one at a time."""
+    from app.api.export import EXPORT_COLUMNS
+
+    row = namedtuple("Row", EXPORT_COLUMNS)
+    created = datetime(2026, 1, 1, 12, 0)
+    for index in range(count):
+        yield row(index, 1, 100000 + index % 5000, index % 40, index % 12,
+                  date(2026, 1, 1) + timedelta(days=index % 365), time(19), time(21), "completed", created)
+
+
+def _export_peak(count: int, export_format: str) -> tuple[int, int]:
+    """Peak traced memory while the export of `count` rows is consumed chunk by chunk, and the bytes produced."""
+    from app.api.export import encode_rows
+
+    async def consume() -> int:
+        size = 0
+        async for chunk in encode_rows(_rows(count), export_format):
+            size += len(chunk)
+        return size
+
+    tracemalloc.start()
+    try:
+        size = asyncio.run(consume())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, size
+
+
+@pytest.mark.parametrize("export_format", ["csv", "ndjson"])
+def test_export_memory_stays_flat(export_format):
+    """Ten times more rows must not need more memory: the rows are encoded and dropped chunk by chunk."""
+    small_peak, small_size = _export_peak(5_000, export_format)
+    large_peak, large_size = _export_peak(50_000, export_format)
+    assert large_size > 9 * small_size
+    assert large_peak < small_peak * 1.5 + 64 * 1024
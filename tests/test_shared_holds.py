@@ -0,0 +1,33 @@
+import asyncio
+import os
+from datetime import date, timedelta
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.environ.get("TEST_DB_URL"), reason="TEST_DB_URL is not set")
+
+GUEST = 9_100_000_003
+TABLE_ID, SLOT_ID = 9_100_001, 9_100_002  # slot_holds has no foreign keys, no rows are needed for them
+BOOKING_DATE = date.today() + timedelta(days=1)
+
+
+@pytest.mark.parametrize("finish", ["convert", "release"])
+def test_hold_is_dropped_by_another_process(finish):
+    """The slot is picked in one process and confirmed or canceled in another: the shared hold goes away."""
+    from app.DAO.database import engine
+    from app.DAO.holds import SlotHolds
+
+    async def scenario():
+        picked_in, finished_in = SlotHolds(60, 1, shared=True), SlotHolds(60, 1, shared=True)
+        try:
+            assert await picked_in.place(GUEST, TABLE_ID, BOOKING_DATE, SLOT_ID)
+            held_before = await finished_in.held_slots(TABLE_ID, BOOKING_DATE)
+            await getattr(finished_in, finish)(GUEST)
+            return held_before, await finished_in.held_slots(TABLE_ID, BOOKING_DATE), finished_in.stats()
+        finally:
+            await engine.dispose()
+
+    held_before, held_after, stats = asyncio.run(scenario())
+    assert held_before == {SLOT_ID}
+    assert held_after == set()
+    assert stats["converted" if finish == "convert" else "released"] == 1